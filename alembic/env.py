@@ -5,9 +5,20 @@ from sqlalchemy import pool
 
 from alembic import context
 
+from app.core.config import settings
+from app.core.database import Base
+import app.auth.models  # noqa: F401 - register every model on Base.metadata
+import app.products.models  # noqa: F401
+import app.cart.models  # noqa: F401
+import app.orders.models  # noqa: F401
+import app.notifications.models  # noqa: F401
+import app.idempotency.models  # noqa: F401
+import app.analytics.models  # noqa: F401
+
 # this is the Alembic Config object, which provides
 # access to the values within the .ini file in use.
 config = context.config
+config.set_main_option("sqlalchemy.url", settings.DATABASE_URL)
 
 # Interpret the config file for Python logging.
 # This line sets up loggers basically.
@@ -18,7 +29,16 @@ if config.config_file_name is not None:
 # for 'autogenerate' support
 # from myapp import mymodel
 # target_metadata = mymodel.Base.metadata
-target_metadata = None
+target_metadata = Base.metadata
+
+
+def include_name(name, type_, parent_names):
+    # the FTS5 search table and its shadow tables are managed by hand in the migrations
+    if type_ == "table" and name.startswith("products_fts"):
+        return False
+    if name in ("search_vector", "ix_products_search_vector"): # postgres search column and its GIN index
+        return False
+    return True
 
 # other values from the config, defined by the needs of env.py,
 # can be acquired:
@@ -42,6 +62,7 @@ def run_migrations_offline() -> None:
     context.configure(
         url=url,
         target_metadata=target_metadata,
+        include_name=include_name,
         literal_binds=True,
         dialect_opts={"paramstyle": "named"},
     )
@@ -65,7 +86,9 @@ def run_migrations_online() -> None:
 
     with connectable.connect() as connection:
         context.configure(
-            connection=connection, target_metadata=target_metadata
+            connection=connection,
+            target_metadata=target_metadata,
+            include_name=include_name,
         )
 
         with context.begin_transaction():
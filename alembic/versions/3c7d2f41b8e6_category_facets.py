@@ -0,0 +1,43 @@
+"""category facets
+
+Revision ID: 3c7d2f41b8e6
+Revises: 58a81e9070b9
+Create Date: 2026-10-18 16:30:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3c7d2f41b8e6'
+down_revision: Union[str, None] = '58a81e9070b9'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        "category_facets",
+        sa.Column("category", sa.String(), nullable=False),
+        sa.Column("product_count", sa.Integer(), nullable=False),
+        sa.Column("in_stock_count", sa.Integer(), nullable=False),
+        sa.Column("min_price", sa.Float(), nullable=True),
+        sa.Column("max_price", sa.Float(), nullable=True),
+        sa.Column("updated_at", sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint("category"),
+    )
+    # initial snapshot, from here on the product writes and checkout keep it current (app/products/facets.py)
+    op.execute(
+        "INSERT INTO category_facets (category, product_count, in_stock_count, min_price, max_price, updated_at) "
+        "SELECT category, count(*), coalesce(sum(CASE WHEN stock > 0 THEN 1 ELSE 0 END), 0), min(price), max(price), CURRENT_TIMESTAMP "
+        "FROM products WHERE category IS NOT NULL GROUP BY category"
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table("category_facets")
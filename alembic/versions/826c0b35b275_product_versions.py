@@ -0,0 +1,36 @@
+"""product versions
+
+Revision ID: 826c0b35b275
+Revises: 8a1417131ec4
+Create Date: 2026-10-18 14:45:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '826c0b35b275'
+down_revision: Union[str, None] = '8a1417131ec4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    columns = {column["name"] for column in sa.inspect(op.get_bind()).get_columns("products")}
+    if "version" not in columns:
+        op.add_column("products", sa.Column("version", sa.Integer(), nullable=False, server_default="1"))
+    if "updated_at" not in columns:
+        op.add_column("products", sa.Column("updated_at", sa.DateTime(), nullable=True))
+    # existing rows count as modified now, clients holding no validators lose nothing
+    op.execute("UPDATE products SET updated_at = CURRENT_TIMESTAMP WHERE updated_at IS NULL")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.batch_alter_table("products") as batch_op: #sqlite can't drop columns in place
+        batch_op.drop_column("updated_at")
+        batch_op.drop_column("version")
@@ -0,0 +1,57 @@
+"""order history snapshots
+
+Revision ID: 8a1417131ec4
+Revises: ac7a6f2e4f58
+Create Date: 2026-10-18 14:20:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8a1417131ec4'
+down_revision: Union[str, None] = 'ac7a6f2e4f58'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column("order_items", sa.Column("product_name", sa.String(), nullable=True))
+    op.add_column("order_items", sa.Column("product_image_url", sa.String(), nullable=True))
+    op.create_index("ix_orders_user_id_created_at", "orders", ["user_id", "created_at"])
+    op.create_table(
+        "order_summaries",
+        sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id"), nullable=False),
+        sa.Column("order_count", sa.Integer(), nullable=False),
+        sa.Column("total_spent", sa.Float(), nullable=False),
+        sa.Column("last_order_at", sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint("user_id"),
+    )
+
+    # backfill: items ordered before the snapshot take the product's current name/image,
+    # items whose product is already gone keep NULL (shown as "Product not found!!!")
+    op.execute(
+        "UPDATE order_items SET "
+        "product_name = (SELECT products.name FROM products WHERE products.id = order_items.product_id), "
+        "product_image_url = (SELECT products.image_url FROM products WHERE products.id = order_items.product_id) "
+        "WHERE product_name IS NULL AND product_id IS NOT NULL"
+    )
+    # summaries start from the orders placed so far
+    op.execute(
+        "INSERT INTO order_summaries (user_id, order_count, total_spent, last_order_at) "
+        "SELECT user_id, count(*), coalesce(sum(total_amount), 0), max(created_at) "
+        "FROM orders WHERE user_id IS NOT NULL GROUP BY user_id"
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table("order_summaries")
+    op.drop_index("ix_orders_user_id_created_at", table_name="orders")
+    with op.batch_alter_table("order_items") as batch_op: #sqlite can't drop columns in place
+        batch_op.drop_column("product_image_url")
+        batch_op.drop_column("product_name")
@@ -0,0 +1,35 @@
+"""cart user product index
+
+Revision ID: 9919a941e879
+Revises: 826c0b35b275
+Create Date: 2026-10-18 15:10:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9919a941e879'
+down_revision: Union[str, None] = '826c0b35b275'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # concurrent adds could leave two lines for one product, fold them into the oldest first
+    op.execute(
+        "UPDATE cart SET quantity = (SELECT sum(other.quantity) FROM cart other "
+        "WHERE other.user_id = cart.user_id AND other.product_id = cart.product_id) "
+        "WHERE id IN (SELECT min(id) FROM cart GROUP BY user_id, product_id HAVING count(*) > 1)"
+    )
+    op.execute("DELETE FROM cart WHERE id NOT IN (SELECT min(id) FROM cart GROUP BY user_id, product_id)")
+    op.create_index("ix_cart_user_id_product_id", "cart", ["user_id", "product_id"], unique=True, if_not_exists=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index("ix_cart_user_id_product_id", table_name="cart")
@@ -0,0 +1,33 @@
+"""product listing indexes
+
+Revision ID: b92e908d2b2c
+Revises: f2e9e2f8af12
+Create Date: 2026-10-18 12:50:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b92e908d2b2c'
+down_revision: Union[str, None] = 'f2e9e2f8af12'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # (sort column, id) pairs back the keyset cursors, (category, price) the filtered listing
+    op.create_index("ix_products_price_id", "products", ["price", "id"], if_not_exists=True)
+    op.create_index("ix_products_name_id", "products", ["name", "id"], if_not_exists=True)
+    op.create_index("ix_products_category_price", "products", ["category", "price"], if_not_exists=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index("ix_products_category_price", table_name="products")
+    op.drop_index("ix_products_name_id", table_name="products")
+    op.drop_index("ix_products_price_id", table_name="products")
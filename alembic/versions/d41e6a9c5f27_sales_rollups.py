@@ -0,0 +1,57 @@
+"""sales rollups
+
+Revision ID: d41e6a9c5f27
+Revises: 3c7d2f41b8e6
+Create Date: 2026-10-18 17:20:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd41e6a9c5f27'
+down_revision: Union[str, None] = '3c7d2f41b8e6'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # created empty, fill them from the existing orders with `python -m app.analytics.rebuild`
+    op.create_table(
+        "sales_daily",
+        sa.Column("day", sa.Date(), nullable=False),
+        sa.Column("order_count", sa.Integer(), nullable=False),
+        sa.Column("units", sa.Integer(), nullable=False),
+        sa.Column("revenue", sa.Float(), nullable=False),
+        sa.PrimaryKeyConstraint("day"),
+    )
+    op.create_table(
+        "sales_by_product",
+        sa.Column("product_id", sa.Integer(), nullable=False),
+        sa.Column("product_name", sa.String(), nullable=True),
+        sa.Column("units", sa.Integer(), nullable=False),
+        sa.Column("revenue", sa.Float(), nullable=False),
+        sa.PrimaryKeyConstraint("product_id"),
+    )
+    op.create_index("ix_sales_by_product_revenue", "sales_by_product", ["revenue"])
+    op.create_index("ix_sales_by_product_units", "sales_by_product", ["units"])
+    op.create_table(
+        "sales_by_category",
+        sa.Column("category", sa.String(), nullable=False),
+        sa.Column("units", sa.Integer(), nullable=False),
+        sa.Column("revenue", sa.Float(), nullable=False),
+        sa.PrimaryKeyConstraint("category"),
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table("sales_by_category")
+    op.drop_index("ix_sales_by_product_units", table_name="sales_by_product")
+    op.drop_index("ix_sales_by_product_revenue", table_name="sales_by_product")
+    op.drop_table("sales_by_product")
+    op.drop_table("sales_daily")
@@ -0,0 +1,53 @@
+"""product search index
+
+Revision ID: ebb544c5e0d6
+Revises: b92e908d2b2c
+Create Date: 2026-10-18 13:05:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'ebb544c5e0d6'
+down_revision: Union[str, None] = 'b92e908d2b2c'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    dialect = op.get_bind().dialect.name
+    if dialect == "sqlite":
+        # FTS5 copy of the searchable columns keyed by product id, the product routes keep it in sync
+        op.execute(
+            "CREATE VIRTUAL TABLE IF NOT EXISTS products_fts "
+            "USING fts5(name, description, category, tokenize='unicode61')"
+        )
+        op.execute("DELETE FROM products_fts")
+        op.execute(
+            "INSERT INTO products_fts (rowid, name, description, category) "
+            "SELECT id, name, coalesce(description, ''), coalesce(category, '') FROM products"
+        )
+    elif dialect == "postgresql":
+        # generated column, postgres keeps it current on every insert/update
+        op.execute(
+            "ALTER TABLE products ADD COLUMN search_vector tsvector GENERATED ALWAYS AS ("
+            "setweight(to_tsvector('simple', coalesce(name, '')), 'A') || "
+            "setweight(to_tsvector('simple', coalesce(description, '')), 'B') || "
+            "setweight(to_tsvector('simple', coalesce(category, '')), 'C')) STORED"
+        )
+        op.create_index("ix_products_search_vector", "products", ["search_vector"], postgresql_using="gin")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    dialect = op.get_bind().dialect.name
+    if dialect == "sqlite":
+        op.execute("DROP TABLE IF EXISTS products_fts")
+    elif dialect == "postgresql":
+        op.drop_index("ix_products_search_vector", table_name="products")
+        op.drop_column("products", "search_vector")
@@ -0,0 +1,111 @@
+"""initial schema
+
+Revision ID: f2e9e2f8af12
+Revises: 
+Create Date: 2026-10-18 12:45:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f2e9e2f8af12'
+down_revision: Union[str, None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # databases created by the old startup create_all already have these tables, only fill in what is missing
+    existing = set(sa.inspect(op.get_bind()).get_table_names())
+
+    if "users" not in existing:
+        op.create_table(
+            "users",
+            sa.Column("id", sa.Integer(), nullable=False),
+            sa.Column("name", sa.String(), nullable=False),
+            sa.Column("email", sa.String(), nullable=False),
+            sa.Column("hashed_password", sa.String(), nullable=False),
+            sa.Column("role", sa.Enum("admin", "user", name="userrole"), nullable=True),
+            sa.PrimaryKeyConstraint("id"),
+        )
+        op.create_index("ix_users_id", "users", ["id"])
+        op.create_index("ix_users_email", "users", ["email"], unique=True)
+
+    if "passwordResets" not in existing:
+        op.create_table(
+            "passwordResets",
+            sa.Column("id", sa.Integer(), nullable=False),
+            sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id"), nullable=True),
+            sa.Column("token", sa.String(), nullable=True),
+            sa.Column("expiration_time", sa.DateTime(), nullable=True),
+            sa.Column("used", sa.Boolean(), nullable=True),
+            sa.PrimaryKeyConstraint("id"),
+        )
+        op.create_index("ix_passwordResets_id", "passwordResets", ["id"])
+
+    if "products" not in existing:
+        op.create_table(
+            "products",
+            sa.Column("id", sa.Integer(), nullable=False),
+            sa.Column("name", sa.String(), nullable=False),
+            sa.Column("description", sa.String(), nullable=True),
+            sa.Column("price", sa.Float(), nullable=False),
+            sa.Column("stock", sa.Integer(), nullable=True),
+            sa.Column("category", sa.String(), nullable=True),
+            sa.Column("image_url", sa.String(), nullable=True),
+            sa.PrimaryKeyConstraint("id"),
+        )
+        op.create_index("ix_products_id", "products", ["id"])
+
+    if "cart" not in existing:
+        op.create_table(
+            "cart",
+            sa.Column("id", sa.Integer(), nullable=False),
+            sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id"), nullable=True),
+            sa.Column("product_id", sa.Integer(), sa.ForeignKey("products.id"), nullable=True),
+            sa.Column("quantity", sa.Integer(), nullable=True),
+            sa.Column("created_at", sa.DateTime(), nullable=True),
+            sa.PrimaryKeyConstraint("id"),
+        )
+        op.create_index("ix_cart_id", "cart", ["id"])
+
+    if "orders" not in existing:
+        op.create_table(
+            "orders",
+            sa.Column("id", sa.Integer(), nullable=False),
+            sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id"), nullable=True),
+            sa.Column("total_amount", sa.Float(), nullable=True),
+            sa.Column("status", sa.Enum("pending", "paid", "cancelled", name="orderstatus"), nullable=True),
+            sa.Column("created_at", sa.DateTime(), nullable=True),
+            sa.PrimaryKeyConstraint("id"),
+        )
+        op.create_index("ix_orders_id", "orders", ["id"])
+
+    if "order_items" not in existing:
+        op.create_table(
+            "order_items",
+            sa.Column("id", sa.Integer(), nullable=False),
+            sa.Column("order_id", sa.Integer(), sa.ForeignKey("orders.id"), nullable=True),
+            sa.Column("product_id", sa.Integer(), sa.ForeignKey("products.id", ondelete="SET NULL"), nullable=True),
+            sa.Column("quantity", sa.Integer(), nullable=True),
+            sa.Column("price_at_purchase", sa.Float(), nullable=True),
+            sa.PrimaryKeyConstraint("id"),
+        )
+        op.create_index("ix_order_items_id", "order_items", ["id"])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table("order_items")
+    op.drop_table("orders")
+    op.drop_table("cart")
+    op.drop_table("products")
+    op.drop_table("passwordResets")
+    op.drop_table("users")
+    sa.Enum(name="orderstatus").drop(op.get_bind(), checkfirst=True)
+    sa.Enum(name="userrole").drop(op.get_bind(), checkfirst=True)
@@ -0,0 +1,34 @@
+from sqlalchemy import Column, Integer, String, Float, Date, Index
+from app.core.database import Base
+
+# Sales rollups: checkout adds every order to them in its own transaction (app/analytics/utils.py),
+# `python -m app.analytics.rebuild` recomputes them from the orders table. The admin reports
+# read only these, so they cost the same with a thousand orders or a hundred million.
+
+class DailySales(Base):
+    __tablename__ = "sales_daily"
+
+    day = Column(Date, primary_key=True) #UTC, like orders.created_at
+    order_count = Column(Integer, nullable=False, default=0)
+    units = Column(Integer, nullable=False, default=0)
+    revenue = Column(Float, nullable=False, default=0)
+
+class ProductSales(Base):
+    __tablename__ = "sales_by_product"
+    __table_args__ = (
+        Index("ix_sales_by_product_revenue", "revenue"), #top-N reads the index backwards and stops after N
+        Index("ix_sales_by_product_units", "units"),
+    )
+
+    # no foreign key, sales of a deleted product stay in the report under its snapshot name
+    product_id = Column(Integer, primary_key=True)
+    product_name = Column(String, nullable=True)
+    units = Column(Integer, nullable=False, default=0)
+    revenue = Column(Float, nullable=False, default=0)
+
+class CategorySales(Base):
+    __tablename__ = "sales_by_category"
+
+    category = Column(String, primary_key=True)
+    units = Column(Integer, nullable=False, default=0)
+    revenue = Column(Float, nullable=False, default=0)
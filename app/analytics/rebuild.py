@@ -0,0 +1,45 @@
+"""Recomputes the sales rollups from the orders table.
+
+Run it once after the migration that adds them, or whenever they are in doubt:
+
+    python -m app.analytics.rebuild
+    python -m app.analytics.rebuild --chunk-size 10000
+
+Orders are read in id order, --chunk-size at a time with their items, and summed in memory
+(one entry per day, product and category, whatever the number of orders). The rollups are then
+replaced in one transaction, which first reads the orders placed while the chunks streamed, so
+reports never see a half built table. An order checked out during that final transaction can
+collide with it, the rebuild then fails and is simply run again.
+"""
+import argparse
+import asyncio
+from app.core.database import session_scope
+from app.core.logging_utils import logger
+from app.analytics.utils import SalesTotals, read_orders, clear_sales, insert_sales
+
+async def read_all(db, totals: SalesTotals, after_id: int, chunk_size: int):
+    read = 0
+    while True:
+        after_id, count = await read_orders(db, totals, after_id, chunk_size)
+        if not count:
+            return after_id, read
+        read += count
+        logger.info(f"Sales rebuild - {read} orders read")
+
+async def rebuild(chunk_size: int = 5000):
+    totals = SalesTotals()
+    async with session_scope() as db:
+        last_id, read = await read_all(db, totals, 0, chunk_size)
+        await db.rollback() #nothing written yet, don't keep a transaction open over the whole scan
+        await clear_sales(db)
+        # then the orders that arrived while we read, anything committed after the delete added itself
+        last_id, late = await read_all(db, totals, last_id, chunk_size)
+        await insert_sales(db, totals)
+        await db.commit()
+    logger.info(f"Sales rebuild - {read + late} orders, {len(totals.days)} days, {len(totals.products)} products, {len(totals.categories)} categories")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rebuild the sales rollups from the orders table")
+    parser.add_argument("--chunk-size", type=int, default=5000, help="orders read per query")
+    args = parser.parse_args()
+    asyncio.run(rebuild(args.chunk_size))
@@ -0,0 +1,44 @@
+from datetime import date, datetime, timedelta
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.database import get_db
+from app.auth.routes import require_admin
+from app.analytics import models, schemas
+
+# Sales reports, read from the rollups only: time depends on the days / N asked for, not on the number of orders
+router = APIRouter(prefix="/admin/analytics", tags=["Analytics"])
+
+@router.get("/revenue", response_model=list[schemas.DailySalesOut]) #per UTC day, days without sales are left out
+async def revenue_per_day(
+    db: AsyncSession = Depends(get_db),
+    admin=Depends(require_admin),
+    date_from: date | None = None, #default: the 30 days up to date_to
+    date_to: date | None = None, #inclusive, default today
+):
+    date_to = date_to or datetime.utcnow().date()
+    date_from = date_from or date_to - timedelta(days=29)
+    if date_from > date_to:
+        raise HTTPException(status_code=400, detail="date_from is after date_to")
+    rows = await db.scalars(
+        select(models.DailySales)
+        .filter(models.DailySales.day >= date_from, models.DailySales.day <= date_to)
+        .order_by(models.DailySales.day)
+    )
+    return rows.all()
+
+@router.get("/top-products", response_model=list[schemas.ProductSalesOut]) #best sellers of all time
+async def top_products(
+    db: AsyncSession = Depends(get_db),
+    admin=Depends(require_admin),
+    by: str = Query("revenue", enum=["revenue", "units"]),
+    limit: int = Query(10, ge=1, le=100),
+):
+    column = getattr(models.ProductSales, by)
+    rows = await db.scalars(select(models.ProductSales).order_by(column.desc()).limit(limit))
+    return rows.all()
+
+@router.get("/categories", response_model=list[schemas.CategorySalesOut]) #sales per category, best first
+async def category_sales(db: AsyncSession = Depends(get_db), admin=Depends(require_admin)):
+    rows = await db.scalars(select(models.CategorySales).order_by(models.CategorySales.revenue.desc()))
+    return rows.all()
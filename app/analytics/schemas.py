@@ -0,0 +1,19 @@
+from datetime import date
+from pydantic import BaseModel
+
+class DailySalesOut(BaseModel):
+    day: date
+    order_count: int
+    units: int
+    revenue: float
+
+class ProductSalesOut(BaseModel):
+    product_id: int
+    product_name: str | None = None
+    units: int
+    revenue: float
+
+class CategorySalesOut(BaseModel):
+    category: str
+    units: int
+    revenue: float
@@ -0,0 +1,113 @@
+from sqlalchemy import delete, insert, select, update
+from app.core.database import engine
+from app.analytics.models import DailySales, ProductSales, CategorySales
+from app.orders.models import Order, OrderItem, OrderStatus
+from app.products.models import Product
+
+DIALECT = engine.dialect.name
+daily = DailySales.__table__
+by_product = ProductSales.__table__
+by_category = CategorySales.__table__
+
+class SalesTotals:
+    """Increments for the three rollups, summed per day / product / category."""
+
+    def __init__(self):
+        self.days = {}
+        self.products = {}
+        self.categories = {}
+
+    def add_order(self, ordered_at, items):
+        # items: (product_id, product_name, category, quantity, price_at_purchase)
+        day = self.days.setdefault(ordered_at.date(), {"day": ordered_at.date(), "order_count": 0, "units": 0, "revenue": 0.0})
+        day["order_count"] += 1
+        for product_id, product_name, category, quantity, price in items:
+            quantity = quantity or 0
+            amount = quantity * (price or 0)
+            day["units"] += quantity
+            day["revenue"] += amount
+            if product_id is not None: #items of products deleted before the rebuild can't be attributed
+                row = self.products.setdefault(product_id, {"product_id": product_id, "product_name": product_name, "units": 0, "revenue": 0.0})
+                row["product_name"] = product_name or row["product_name"] #orders come oldest first, the latest name wins
+                row["units"] += quantity
+                row["revenue"] += amount
+            if category is not None:
+                row = self.categories.setdefault(category, {"category": category, "units": 0, "revenue": 0.0})
+                row["units"] += quantity
+                row["revenue"] += amount
+
+async def add_to(db, table, key, rows, counters, replace=()):
+    # adds the counters of rows onto the existing ones (inserting missing keys), replace columns are overwritten
+    if not rows:
+        return
+    if DIALECT in ("sqlite", "postgresql"):
+        if DIALECT == "sqlite":
+            from sqlalchemy.dialects.sqlite import insert as dialect_insert
+        else:
+            from sqlalchemy.dialects.postgresql import insert as dialect_insert
+        statement = dialect_insert(table)
+        statement = statement.on_conflict_do_update(
+            index_elements=[table.c[key]],
+            set_={
+                **{name: table.c[name] + statement.excluded[name] for name in counters},
+                **{name: statement.excluded[name] for name in replace},
+            },
+        )
+        await db.execute(statement, rows)
+        return
+    for row in rows:
+        updated = await db.execute(
+            update(table)
+            .filter(table.c[key] == row[key])
+            .values(**{name: table.c[name] + row[name] for name in counters}, **{name: row[name] for name in replace})
+        )
+        if not updated.rowcount:
+            await db.execute(insert(table).values(**row))
+
+async def add_sales(db, totals: SalesTotals):
+    await add_to(db, by_product, "product_id", list(totals.products.values()), ("units", "revenue"), replace=("product_name",))
+    await add_to(db, by_category, "category", list(totals.categories.values()), ("units", "revenue"))
+    # every checkout of the day shares this row, taken last so its lock is held the shortest
+    await add_to(db, daily, "day", list(totals.days.values()), ("order_count", "units", "revenue"))
+
+async def record_order(db, ordered_at, order_items, categories):
+    """Checkout: adds one order to the rollups, runs in the checkout transaction so they can't drift from the orders table."""
+    totals = SalesTotals()
+    totals.add_order(ordered_at, [
+        (row["product_id"], row["product_name"], categories.get(row["product_id"]), row["quantity"], row["price_at_purchase"])
+        for row in order_items
+    ])
+    await add_sales(db, totals)
+
+async def read_orders(db, totals: SalesTotals, after_id: int, chunk_size: int):
+    """Adds one chunk of orders with id > after_id, returns (last id read, orders read)."""
+    orders = (await db.execute(
+        select(Order.id, Order.created_at)
+        .filter(Order.id > after_id, Order.status != OrderStatus.cancelled)
+        .order_by(Order.id)
+        .limit(chunk_size)
+    )).all()
+    if not orders:
+        return after_id, 0
+    items = {}
+    # the category is the product's current one, checkout records the one it had at purchase
+    for order_id, *item in (await db.execute(
+        select(OrderItem.order_id, OrderItem.product_id, OrderItem.product_name, Product.category, OrderItem.quantity, OrderItem.price_at_purchase)
+        .outerjoin(Product, Product.id == OrderItem.product_id)
+        .filter(OrderItem.order_id.in_([order.id for order in orders]))
+        .order_by(OrderItem.id)
+    )).all():
+        items.setdefault(order_id, []).append(item)
+    for order in orders:
+        totals.add_order(order.created_at, items.get(order.id, []))
+    return orders[-1].id, len(orders)
+
+async def clear_sales(db):
+    await db.execute(delete(daily))
+    await db.execute(delete(by_product))
+    await db.execute(delete(by_category))
+
+async def insert_sales(db, totals: SalesTotals):
+    for table, rows in ((daily, totals.days), (by_product, totals.products), (by_category, totals.categories)):
+        if rows:
+            await db.execute(insert(table), list(rows.values()))
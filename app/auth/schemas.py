@@ -1,5 +1,6 @@
 from pydantic import BaseModel, EmailStr
 from enum import Enum
+from app.auth.models import UserRole
 
 class Role(str, Enum):
     admin = "admin"
@@ -24,6 +25,17 @@ class ShowUser(BaseModel):
     class Config:
         orm_mode = True
 
+# identity resolved from a token, cached between requests instead of the full User row
+class AuthenticatedUser(BaseModel):
+    id: int
+    name: str
+    email: str
+    role: UserRole
+
+    class Config:
+        from_attributes = True
+        frozen = True
+
 class Token(BaseModel):
     access_token: str
     token_type: str
@@ -1,19 +1,103 @@
-from passlib.context import CryptContext
-from jose import jwt
 from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor
+from fastapi import HTTPException
+import asyncio
+import time
+from app.core.cache import TTLCache, create_cache_backend
 from app.core.config import settings
+from app.core.metrics import metrics
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# passlib and jose (with its asn1/rsa backends) cost tens of ms to import, they load on first use instead of on every worker boot
+pwd_context = None
+
+class InvalidTokenError(Exception):
+    pass
+
+def get_pwd_context():
+    global pwd_context
+    if pwd_context is None:
+        from passlib.context import CryptContext
+        pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+    return pwd_context
+
+token_cache = TTLCache(maxsize=settings.AUTH_CACHE_MAX_SIZE, ttl=settings.AUTH_CACHE_TTL_SECONDS) # token -> already verified payload
+user_cache = create_cache_backend(maxsize=settings.AUTH_CACHE_MAX_SIZE, ttl=settings.AUTH_USER_CACHE_TTL_SECONDS) # user:{email} -> AuthenticatedUser dict, shared with redis
 
 def hash_password(password: str):
-    return pwd_context.hash(password) #this will hash and return the hashed password using bcrypt
+    return get_pwd_context().hash(password) #this will hash and return the hashed password using bcrypt
 
 def verify_password(plain_password: str, hashed_password: str):
-    return pwd_context.verify(plain_password, hashed_password) #this will check that the password matches the stored hash or not
+    return get_pwd_context().verify(plain_password, hashed_password) #this will check that the password matches the stored hash or not
+
+# bcrypt costs ~100-300ms of cpu, so it runs on its own bounded pool instead of the event loop or the shared threadpool
+hash_executor = None
+hash_pending = 0
+
+def get_hash_executor():
+    global hash_executor
+    if hash_executor is None:
+        if settings.PASSWORD_HASH_EXECUTOR == "process":
+            from concurrent.futures import ProcessPoolExecutor
+            hash_executor = ProcessPoolExecutor(max_workers=settings.PASSWORD_HASH_WORKERS)
+        else:
+            hash_executor = ThreadPoolExecutor(max_workers=settings.PASSWORD_HASH_WORKERS, thread_name_prefix="bcrypt")
+    return hash_executor
+
+def shutdown_hash_executor():
+    global hash_executor
+    if hash_executor is not None:
+        hash_executor.shutdown(wait=False, cancel_futures=True)
+        hash_executor = None
+
+def timed_call(fn, *args):
+    # runs inside the worker so the measured time is bcrypt alone, not the queue in front of it
+    started = time.perf_counter()
+    return fn(*args), time.perf_counter() - started
+
+async def run_hash_job(fn, *args):
+    global hash_pending
+    if hash_pending >= settings.PASSWORD_HASH_MAX_PENDING: #shed load early instead of queueing logins for seconds
+        raise HTTPException(status_code=503, detail="Server busy, please try again", headers={"Retry-After": "1"})
+    hash_pending += 1
+    try:
+        result, elapsed = await asyncio.get_running_loop().run_in_executor(get_hash_executor(), timed_call, fn, *args)
+    finally:
+        hash_pending -= 1
+    metrics.record_password_hash(fn.__name__, elapsed)
+    return result
+
+async def hash_password_async(password: str):
+    return await run_hash_job(hash_password, password)
+
+async def verify_password_async(plain_password: str, hashed_password: str):
+    return await run_hash_job(verify_password, plain_password, hashed_password)
 
 def create_access_token(data: dict, expires_delta: timedelta | None = None):
+    from jose import jwt
     to_encode = data.copy()
     expire = datetime.now() + (expires_delta or timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)) #this will only allows to use the token for 15 minutes
     to_encode.update({"exp": expire})
     encoded_jwt = jwt.encode(to_encode, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
     return encoded_jwt
+
+def decode_access_token(token: str):
+    payload = token_cache.get(token)
+    if payload is None:
+        from jose import JWTError, jwt
+        try:
+            payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
+        except JWTError as exc: #bad signature or expired
+            raise InvalidTokenError(str(exc)) from exc
+        ttl = settings.AUTH_CACHE_TTL_SECONDS
+        if "exp" in payload:
+            ttl = min(ttl, payload["exp"] - time.time()) #never keep a token cached past its own expiry
+        if ttl > 0:
+            token_cache.set(token, payload, ttl=ttl)
+    return payload
+
+async def invalidate_user(email: str):
+    # call whenever a user's row changes (signup, password reset, role change) so the next request reloads it
+    await user_cache.delete(f"user:{email}")
+
+def auth_cache_stats():
+    return {"tokens": token_cache.stats(), "users": user_cache.stats()}
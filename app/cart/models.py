@@ -1,9 +1,11 @@
-from sqlalchemy import Column, Integer, ForeignKey, DateTime
+from sqlalchemy import Column, Integer, ForeignKey, DateTime, Index
 from app.core.database import Base
 from datetime import datetime
 
 class CartItem(Base):
     __tablename__ = "cart"
+    # one line per product in a user's cart, also what every cart query (and the add upsert) seeks on
+    __table_args__ = (Index("ix_cart_user_id_product_id", "user_id", "product_id", unique=True),)
 
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"))
@@ -1,98 +1,121 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from app.core.database import SessionLocal
-from app.cart import models, schemas
+from fastapi import APIRouter, Depends, HTTPException, Header, Request
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.database import get_db
+from app.core import queries
+from app.cart import schemas
+from app.cart.store import cart_store
 from app.auth.routes import get_current_user
-from app.products.models import Product
+from app.products.cache import get_products
+from app.idempotency.utils import idempotent
 
 router = APIRouter(prefix="/cart", tags=["Cart"])
 
-def get_db(): #opens and closes db for each request
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
+# the lines themselves live in cart_store (CART_BACKEND), stock is always read from the products table
 
 @router.post("/", response_model=schemas.CartItemOut)
-def add_to_cart(item: schemas.CartItemCreate, db: Session = Depends(get_db), current_user=Depends(get_current_user)):
+async def add_to_cart(
+    item: schemas.CartItemCreate,
+    request: Request,
+    db: AsyncSession = Depends(get_db),
+    current_user=Depends(get_current_user),
+    idempotency_key: str | None = Header(None), #a retried add with the same key doesn't add the quantity twice
+):
+    return await idempotent(request, db, current_user.id, idempotency_key, lambda stage: add_line(db, item, current_user, stage), schemas.CartItemOut)
+
+async def add_line(db, item: schemas.CartItemCreate, current_user, stage):
 
     #no negative quantity
     if item.quantity <= 0:
         raise HTTPException(status_code=400, detail="Quantity must be greater than 0")
 
-    product = db.query(Product).filter(Product.id == item.product_id).first()
-    if not product:
+    stock = await db.scalar(queries.PRODUCT_STOCK, {"product_id": item.product_id})
+    if stock is None:
         raise HTTPException(status_code=404, detail="Product not found")
     #quantity of item to add should be greater than stock
-    if item.quantity > product.stock:
+    if item.quantity > stock:
         raise HTTPException(
             status_code=400,
-            detail=f"Only {product.stock} items available in stock"
+            detail=f"Only {stock} items available in stock"
         )
 
-    cart_item = db.query(models.CartItem).filter_by(user_id=current_user.id, product_id=item.product_id).first() #fetch item in cart
-
-    if cart_item:
-        new_quantity = cart_item.quantity + item.quantity
-        if new_quantity > product.stock:
-             raise HTTPException(
-                status_code=400,
-                detail=f"Only {product.stock} items available in stock. You already have {cart_item.quantity} in cart."
-            )
-        cart_item.quantity = new_quantity
-    else:
-        cart_item = models.CartItem(user_id=current_user.id, product_id=item.product_id, quantity=item.quantity)
-        db.add(cart_item)
-    db.commit()
-    db.refresh(cart_item)
+    cart_item = await cart_store.add(db, current_user.id, item.product_id, item.quantity, limit=stock) #merged into the existing line if any
+    if cart_item is None:
+        in_cart = await cart_store.line(db, current_user.id, item.product_id)
+        raise HTTPException(
+            status_code=400,
+            detail=f"Only {stock} items available in stock. You already have {in_cart['quantity'] if in_cart else 0} in cart."
+        )
+    await stage(cart_item)
+    await db.commit() #the sql line and the Idempotency-Key response together
     return cart_item
 
 @router.get("/", response_model=list[schemas.CartItemOut])
-def view_cart(db: Session = Depends(get_db), current_user=Depends(get_current_user)):
-    cart_items = db.query(models.CartItem).filter(models.CartItem.user_id == current_user.id).all()
+async def view_cart(db: AsyncSession = Depends(get_db), current_user=Depends(get_current_user)):
+    cart_items = await cart_store.lines(db, current_user.id)
 
+    products = await get_products(db, [item["product_id"] for item in cart_items]) #names only, served from the catalog cache
     for item in cart_items:
-        product = db.query(Product).filter(Product.id == item.product_id).first()
+        product = products.get(item["product_id"])
         if not product:
-            item.product_name = "This product has been removed by admin"
+            item["product_name"] = "This product has been removed by admin"
         else:
-            item.product_name = product.name
+            item["product_name"] = product["name"]
 
     return cart_items
 
 @router.put("/{product_id}", response_model=schemas.CartItemOut)
-def update_cart(product_id: int, item: schemas.CartItemCreate, db: Session = Depends(get_db), current_user=Depends(get_current_user)):
+async def update_cart(product_id: int, item: schemas.CartItemCreate, db: AsyncSession = Depends(get_db), current_user=Depends(get_current_user)):
     #quantity should not be negative
     if item.quantity <= 0:
         raise HTTPException(status_code=400, detail="Quantity must be greater than 0")
 
-    product = db.query(Product).filter(Product.id == product_id).first() #filter the product to find first if exists
+    stock = await db.scalar(queries.PRODUCT_STOCK, {"product_id": product_id}) #filter the product to find first if exists
 
-    if not product:
+    if stock is None:
         raise HTTPException(status_code=400, detail="Product not found!!")
 
-    if item.quantity > product.stock:
+    if item.quantity > stock:
         raise HTTPException(
             status_code=400,
-            detail=f"Only {product.stock} items available in stock"
+            detail=f"Only {stock} items available in stock"
         )
 
-    cart_item = db.query(models.CartItem).filter_by(user_id=current_user.id, product_id=product_id).first()
-
+    cart_item = await cart_store.update(db, current_user.id, product_id, item.quantity)
     if not cart_item:
         raise HTTPException(status_code=404, detail="Cart item not found")
-
-    cart_item.quantity = item.quantity
-    db.commit()
-    db.refresh(cart_item)
     return cart_item
 
+@router.patch("/", response_model=list[schemas.CartBatchResult])
+async def update_cart_batch(batch: schemas.CartBatchRequest, db: AsyncSession = Depends(get_db), current_user=Depends(get_current_user)):
+    # whole cart sync in one request: one stock query for every product, one commit for every line
+    product_ids = {item.product_id for item in batch.items}
+    stocks = dict((await db.execute(queries.PRODUCT_STOCKS, {"product_ids": list(product_ids)})).all())
+
+    results = []
+    quantities = {}
+    seen = set()
+    for item in batch.items:
+        result = {"product_id": item.product_id, "quantity": item.quantity, "status_code": 200}
+        stock = stocks.get(item.product_id)
+        if item.product_id in seen: #the first one counts
+            result.update(status_code=400, detail="Product is listed more than once")
+        elif stock is None:
+            result.update(status_code=404, detail="Product not found")
+        elif item.quantity > stock:
+            result.update(status_code=400, detail=f"Only {stock} items available in stock")
+        else:
+            quantities[item.product_id] = item.quantity
+        seen.add(item.product_id)
+        results.append(result)
+
+    lines = await cart_store.set_many(db, current_user.id, quantities) if quantities else {}
+    for result in results:
+        if result["status_code"] == 200:
+            result["item"] = lines[result["product_id"]]
+    return results
+
 @router.delete("/{product_id}")
-def remove_from_cart(product_id: int, db: Session = Depends(get_db), current_user=Depends(get_current_user)):
-    cart_item = db.query(models.CartItem).filter_by(user_id=current_user.id, product_id=product_id).first()
-    if not cart_item:
+async def remove_from_cart(product_id: int, db: AsyncSession = Depends(get_db), current_user=Depends(get_current_user)):
+    if not await cart_store.remove(db, current_user.id, product_id):
         raise HTTPException(status_code=404, detail="Cart item not found")
-    db.delete(cart_item)
-    db.commit()
     return {"message": "Item removed from cart"}
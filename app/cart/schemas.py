@@ -8,6 +8,11 @@ class CartItemCreate(BaseModel):
     product_id: int
     quantity: int = Field(..., gt=0, description="Quantity must be greater than 0") #gt is greater than and ... is no default value and it is required to use
 
+MAX_BATCH_ITEMS = 100
+
+class CartBatchRequest(BaseModel):
+    items: list[CartItemCreate] = Field(..., min_length=1, max_length=MAX_BATCH_ITEMS) #each line is set to its quantity, missing lines are created
+
 class CartItemOut(BaseModel):
     id: int
     product_id: int
@@ -15,3 +20,10 @@ class CartItemOut(BaseModel):
 
     class Config:
         orm_mode = True
+
+class CartBatchResult(BaseModel):
+    product_id: int
+    quantity: int
+    status_code: int #what PUT /cart/{product_id} would have answered for this line
+    detail: str | None = None
+    item: CartItemOut | None = None
@@ -0,0 +1,265 @@
+from fastapi import HTTPException
+from sqlalchemy import insert, update, delete
+from app.core.cache import TTLCache
+from app.core.config import settings
+from app.core.database import engine
+from app.core import queries
+from app.cart.models import CartItem
+
+# Where carts live, picked with CART_BACKEND:
+#   sql    - the cart table, one row per (user, product) (default)
+#   memory - one dict per user in this process, for a single worker
+#   redis  - one hash per user (field product id -> quantity), shared by every worker
+# memory and redis carts expire CART_TTL_SECONDS after their last change (abandoned carts),
+# checkout takes the whole cart out of the store and turns it into order rows in the same
+# SQL transaction, if the checkout fails the lines are put back.
+# Every store speaks the same async API and hands out plain {"id", "product_id", "quantity"} dicts,
+# hash stores have no row ids so a line's id is its product id.
+
+DIALECT = engine.dialect.name
+
+def cart_line(product_id, quantity, line_id=None):
+    return {"id": line_id or product_id, "product_id": int(product_id), "quantity": int(quantity)}
+
+class SQLCartStore:
+    columns = queries.CART_COLUMNS
+
+    async def lines(self, db, user_id: int):
+        rows = (await db.execute(queries.CART_LINES, {"user_id": user_id})).all()
+        return [row._asdict() for row in rows]
+
+    async def line(self, db, user_id: int, product_id: int):
+        row = (await db.execute(queries.CART_LINE, {"user_id": user_id, "product_id": product_id})).first()
+        return row._asdict() if row else None
+
+    async def add(self, db, user_id: int, product_id: int, quantity: int, limit: int):
+        """Adds to the line (or creates it), returns the line or None when it would go above limit.
+
+        Unlike the other writes this one is left for the caller to commit (add_line commits it with
+        the Idempotency-Key response).
+        """
+        if DIALECT in ("sqlite", "postgresql"):
+            if DIALECT == "sqlite":
+                from sqlalchemy.dialects.sqlite import insert as dialect_insert
+            else:
+                from sqlalchemy.dialects.postgresql import insert as dialect_insert
+            # one statement on ix_cart_user_id_product_id, the WHERE turns a line that would go over the stock into a no-op
+            statement = dialect_insert(CartItem).values(user_id=user_id, product_id=product_id, quantity=quantity)
+            statement = statement.on_conflict_do_update(
+                index_elements=[CartItem.user_id, CartItem.product_id],
+                set_={"quantity": CartItem.quantity + statement.excluded.quantity},
+                where=CartItem.quantity + statement.excluded.quantity <= limit,
+            ).returning(*self.columns)
+            row = (await db.execute(statement)).first()
+        else:
+            current = await self.line(db, user_id, product_id)
+            if current and current["quantity"] + quantity > limit:
+                return None
+            if current:
+                statement = update(CartItem).filter(CartItem.id == current["id"]).values(quantity=CartItem.quantity + quantity)
+            else:
+                statement = insert(CartItem).values(user_id=user_id, product_id=product_id, quantity=quantity)
+            row = (await db.execute(statement.returning(*self.columns))).first()
+        return row._asdict() if row else None
+
+    async def update(self, db, user_id: int, product_id: int, quantity: int):
+        row = (await db.execute(
+            update(CartItem).filter_by(user_id=user_id, product_id=product_id).values(quantity=quantity).returning(*self.columns)
+        )).first()
+        await db.commit()
+        return row._asdict() if row else None
+
+    async def set_many(self, db, user_id: int, quantities: dict):
+        """Sets every {product id: quantity} line (creating missing ones) in one commit, returns the lines by product id."""
+        if DIALECT in ("sqlite", "postgresql"):
+            if DIALECT == "sqlite":
+                from sqlalchemy.dialects.sqlite import insert as dialect_insert
+            else:
+                from sqlalchemy.dialects.postgresql import insert as dialect_insert
+            statement = dialect_insert(CartItem).values([
+                {"user_id": user_id, "product_id": product_id, "quantity": quantity} for product_id, quantity in quantities.items()
+            ])
+            statement = statement.on_conflict_do_update(
+                index_elements=[CartItem.user_id, CartItem.product_id],
+                set_={"quantity": statement.excluded.quantity},
+            ).returning(*self.columns)
+            rows = [row._asdict() for row in (await db.execute(statement)).all()]
+        else:
+            existing = {line["product_id"] for line in await self.lines(db, user_id)}
+            rows = []
+            for product_id, quantity in quantities.items():
+                if product_id in existing:
+                    statement = update(CartItem).filter_by(user_id=user_id, product_id=product_id).values(quantity=quantity)
+                else:
+                    statement = insert(CartItem).values(user_id=user_id, product_id=product_id, quantity=quantity)
+                rows.append((await db.execute(statement.returning(*self.columns))).first()._asdict())
+        await db.commit()
+        return {row["product_id"]: row for row in rows}
+
+    async def remove(self, db, user_id: int, product_id: int):
+        removed = await db.execute(delete(CartItem).filter_by(user_id=user_id, product_id=product_id))
+        await db.commit()
+        return removed.rowcount > 0
+
+    async def remove_product(self, db, product_id: int):
+        # part of the caller's transaction, the admin delete commits it
+        await db.execute(delete(CartItem).filter(CartItem.product_id == product_id))
+
+    async def take(self, db, user_id: int):
+        # checkout: the rows go away in the checkout transaction, a rollback brings them back
+        lines = await self.lines(db, user_id)
+        if lines:
+            emptied = await db.execute(delete(CartItem).filter(CartItem.id.in_([line["id"] for line in lines])))
+            if emptied.rowcount != len(lines): #the same cart was checked out concurrently
+                await db.rollback()
+                raise HTTPException(status_code=409, detail="Cart changed during checkout, please try again")
+        return lines
+
+    async def restore(self, user_id: int, lines):
+        pass #rolled back with the checkout transaction
+
+class MemoryCartStore:
+    def __init__(self, maxsize: int, ttl: float):
+        self.carts = TTLCache(maxsize=maxsize, ttl=ttl) #user id -> {product id: quantity}, least recently used carts go first when full
+
+    def _save(self, user_id: int, cart: dict):
+        if cart:
+            self.carts.set(user_id, cart) #every change restarts the TTL
+        else:
+            self.carts.delete(user_id)
+
+    async def lines(self, db, user_id: int):
+        return [cart_line(product_id, quantity) for product_id, quantity in self.carts.get(user_id, {}).items()]
+
+    async def line(self, db, user_id: int, product_id: int):
+        quantity = self.carts.get(user_id, {}).get(product_id)
+        return cart_line(product_id, quantity) if quantity is not None else None
+
+    async def add(self, db, user_id: int, product_id: int, quantity: int, limit: int):
+        cart = self.carts.get(user_id) or {}
+        if cart.get(product_id, 0) + quantity > limit:
+            return None
+        cart[product_id] = cart.get(product_id, 0) + quantity
+        self._save(user_id, cart)
+        return cart_line(product_id, cart[product_id])
+
+    async def update(self, db, user_id: int, product_id: int, quantity: int):
+        cart = self.carts.get(user_id)
+        if not cart or product_id not in cart:
+            return None
+        cart[product_id] = quantity
+        self._save(user_id, cart)
+        return cart_line(product_id, quantity)
+
+    async def set_many(self, db, user_id: int, quantities: dict):
+        cart = self.carts.get(user_id) or {}
+        cart.update(quantities)
+        self._save(user_id, cart)
+        return {product_id: cart_line(product_id, quantity) for product_id, quantity in quantities.items()}
+
+    async def remove(self, db, user_id: int, product_id: int):
+        cart = self.carts.get(user_id)
+        if not cart or product_id not in cart:
+            return False
+        del cart[product_id]
+        self._save(user_id, cart)
+        return True
+
+    async def remove_product(self, db, product_id: int):
+        for user_id, cart in self.carts.items():
+            if cart.pop(product_id, None) is not None and not cart:
+                self.carts.delete(user_id)
+
+    async def take(self, db, user_id: int):
+        lines = await self.lines(db, user_id)
+        self.carts.delete(user_id)
+        return lines
+
+    async def restore(self, user_id: int, lines):
+        cart = self.carts.get(user_id) or {}
+        for line in lines: #merged with anything added while the checkout ran
+            cart[line["product_id"]] = cart.get(line["product_id"], 0) + line["quantity"]
+        self._save(user_id, cart)
+
+class RedisCartStore:
+    def __init__(self, url: str, ttl: float, prefix: str = "ecommerce:", client=None):
+        if client is None:
+            import redis.asyncio as redis #only needed when this backend is configured
+            client = redis.from_url(url)
+        self.client = client
+        self.ttl = int(ttl)
+        self.prefix = prefix
+
+    def key(self, user_id: int):
+        return f"{self.prefix}cart:{user_id}"
+
+    async def lines(self, db, user_id: int):
+        return [cart_line(product_id, quantity) for product_id, quantity in (await self.client.hgetall(self.key(user_id))).items()]
+
+    async def line(self, db, user_id: int, product_id: int):
+        quantity = await self.client.hget(self.key(user_id), product_id)
+        return cart_line(product_id, quantity) if quantity is not None else None
+
+    async def add(self, db, user_id: int, product_id: int, quantity: int, limit: int):
+        key = self.key(user_id)
+        current = int(await self.client.hget(key, product_id) or 0)
+        if current + quantity > limit: #stock is checked again at checkout, a racing add can't oversell
+            return None
+        async with self.client.pipeline(transaction=True) as pipe:
+            pipe.hincrby(key, product_id, quantity)
+            pipe.expire(key, self.ttl) #every change restarts the TTL
+            total, _ = await pipe.execute()
+        return cart_line(product_id, total)
+
+    async def update(self, db, user_id: int, product_id: int, quantity: int):
+        key = self.key(user_id)
+        if not await self.client.hexists(key, product_id):
+            return None
+        async with self.client.pipeline(transaction=True) as pipe:
+            pipe.hset(key, product_id, quantity)
+            pipe.expire(key, self.ttl)
+            await pipe.execute()
+        return cart_line(product_id, quantity)
+
+    async def set_many(self, db, user_id: int, quantities: dict):
+        key = self.key(user_id)
+        async with self.client.pipeline(transaction=True) as pipe:
+            pipe.hset(key, mapping=quantities)
+            pipe.expire(key, self.ttl)
+            await pipe.execute()
+        return {product_id: cart_line(product_id, quantity) for product_id, quantity in quantities.items()}
+
+    async def remove(self, db, user_id: int, product_id: int):
+        return await self.client.hdel(self.key(user_id), product_id) > 0
+
+    async def remove_product(self, db, product_id: int):
+        # admin deletes are rare, walking every cart key is fine
+        async for key in self.client.scan_iter(match=f"{self.prefix}cart:*", count=1000):
+            await self.client.hdel(key, product_id)
+
+    async def take(self, db, user_id: int):
+        key = self.key(user_id)
+        async with self.client.pipeline(transaction=True) as pipe: #read and delete in one MULTI, concurrent checkouts can't both get the lines
+            pipe.hgetall(key)
+            pipe.delete(key)
+            cart, _ = await pipe.execute()
+        return [cart_line(product_id, quantity) for product_id, quantity in cart.items()]
+
+    async def restore(self, user_id: int, lines):
+        if not lines:
+            return
+        key = self.key(user_id)
+        async with self.client.pipeline(transaction=True) as pipe:
+            for line in lines: #merged with anything added while the checkout ran
+                pipe.hincrby(key, line["product_id"], line["quantity"])
+            pipe.expire(key, self.ttl)
+            await pipe.execute()
+
+def create_cart_store():
+    if settings.CART_BACKEND == "redis":
+        return RedisCartStore(settings.CART_URL, ttl=settings.CART_TTL_SECONDS)
+    if settings.CART_BACKEND == "memory":
+        return MemoryCartStore(maxsize=settings.CART_MEMORY_MAX_CARTS, ttl=settings.CART_TTL_SECONDS)
+    return SQLCartStore()
+
+cart_store = create_cart_store()
@@ -1,67 +1,143 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from app.core.database import SessionLocal
+from fastapi import APIRouter, Depends, HTTPException, Header, Request
+from sqlalchemy import select, update, insert, case
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
+from app.core.database import get_db
 from app.auth.routes import get_current_user
 from app.core.logging_utils import logger
-from app.cart.models import CartItem
+from app.cart.store import cart_store
 from app.products.models import Product
+from app.products.utils import load_products
+from app.products.cache import forget_stock
+from app.products.facets import sold_out
 from app.orders.models import Order, OrderItem
+from app.orders.utils import add_to_summary
+from app.analytics.utils import record_order
 from app.orders.schemas import OrderOut, CheckoutRequest,PaymentMethod
+from app.notifications.utils import queue_email
+from app.idempotency.utils import idempotent
 
 router = APIRouter(prefix="/checkout", tags=["Checkout"])
 
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
+def order_confirmation_body(name, order_id, order_items, total_amount, order_status):
+    lines = "\n".join(
+        f"    {row['quantity']} x {row['product_name']} - {row['price_at_purchase'] * row['quantity']:.2f}"
+        for row in order_items
+    )
+    return f"""
+    Hi {name},
 
-@router.post("/", response_model=OrderOut) #this returns the newly created order as OrderOut
-def checkout(data:CheckoutRequest, db: Session = Depends(get_db),current_user=Depends(get_current_user)):
-    cart_items = db.query(CartItem).filter(CartItem.user_id == current_user.id).all() #get all cart items
+    Thanks for your order #{order_id}!
 
-    if not cart_items:
-        raise HTTPException(status_code=400, detail="Cart is empty")
+{lines}
 
+    Total: {total_amount:.2f} ({order_status})
+
+    Thanks,
+    Team
+    """
+
+async def place_order(db, data: CheckoutRequest, current_user, cart_items):
+    """Reserves stock and writes the order for the cart lines, returns (order id, ordered quantities, total), the caller commits."""
     total_amount = 0
     order_items = []
+    quantities = {} #product id -> total quantity ordered, taken from stock in one conditional statement
 
+    products = await load_products(db, [item["product_id"] for item in cart_items]) #one query for the whole cart
+    product_names = {product_id: product.name for product_id, product in products.items()} #read now, commit/rollback expire them
     for item in cart_items:
-        product = db.query(Product).filter(Product.id == item.product_id).first()
-        if not product or product.stock < item.quantity:
+        product = products.get(item["product_id"])
+        if not product:
+            raise HTTPException(status_code=400, detail=f"Product {item['product_id']} is no longer available")
+        quantities[product.id] = quantities.get(product.id, 0) + item["quantity"]
+        if product.stock < quantities[product.id]: #early exit, the UPDATE below is what actually guarantees it
             raise HTTPException(status_code=400, detail=f"Insufficient stock for '{product.name}'")
 
-        product.stock -= item.quantity #update the stock
-        subtotal = product.price * item.quantity #update the price product's price * total number of items
+        subtotal = product.price * item["quantity"] #update the price product's price * total number of items
         total_amount += subtotal #total new amount to paid
 
-        order_item = OrderItem(
+        order_items.append(dict(
             product_id=product.id,
-            quantity=item.quantity,
-            price_at_purchase=product.price
-        )
-        order_item.product_name = product.name #optional but good ro add name
-        order_items.append(order_item)
+            quantity=item["quantity"],
+            price_at_purchase=product.price,
+            product_name=product.name, #snapshot, the order history never looks the product up again
+            product_image_url=product.image_url
+        ))
      #here we set the status based on payment
         order_status = "paid" if data.payment_method == PaymentMethod.online else "pending"
+    # Reserve stock atomically: stock = stock - qty only where stock >= qty, all rows in one statement.
+    # A concurrent checkout that got there first makes a row miss, then nothing of this order is kept.
+    ordered = case(quantities, value=Product.id)
+    reserved = (await db.execute(
+        update(Product)
+        .filter(Product.id.in_(quantities), Product.stock >= ordered)
+        .values(stock=Product.stock - ordered)
+        .returning(Product.id, Product.category, Product.stock) #stock after the update
+        .execution_options(synchronize_session=False)
+    )).all()
+    if len(reserved) != len(quantities):
+        await db.rollback()
+        reserved_ids = {row.id for row in reserved}
+        names = ", ".join(product_names[product_id] for product_id in quantities if product_id not in reserved_ids)
+        raise HTTPException(status_code=400, detail=f"Insufficient stock for '{names}'")
+    await sold_out(db, [row.category for row in reserved if row.stock == 0]) #they had stock before, now they're out
+
     # Create order
     new_order = Order(
         user_id=current_user.id,
         total_amount=total_amount,
-        status=order_status,
-        items=order_items
+        status=order_status
     )
 
     db.add(new_order)
-    db.query(CartItem).filter(CartItem.user_id == current_user.id).delete() #after add we empty the cart
-    db.commit()
-    db.refresh(new_order)
+    await db.flush() #gives us new_order.id for the items
+    order_id = new_order.id
+    await db.execute(insert(OrderItem), [{"order_id": order_id, **row} for row in order_items]) #one executemany for every line item
+    await add_to_summary(db, current_user.id, total_amount, new_order.created_at)
+    queue_email(
+        db,
+        kind="order_confirmation",
+        recipient=current_user.email,
+        subject=f"Order #{order_id} confirmed",
+        body=order_confirmation_body(current_user.name, order_id, order_items, total_amount, order_status)
+    )
+    await record_order(db, new_order.created_at, order_items, {row.id: row.category for row in reserved})
+    return order_id, quantities, total_amount
+
+async def run_checkout(db, data: CheckoutRequest, current_user, stage):
+    # the whole cart leaves the cart store first (sql: inside this transaction), so two checkouts can't both order it
+    cart_items = await cart_store.take(db, current_user.id)
 
+    if not cart_items:
+        raise HTTPException(status_code=400, detail="Cart is empty")
 
-    for item in new_order.items:
-        item.product_name = item.product.name if item.product else "Product Unavailable!!"
+    try:
+        order_id, quantities, total_amount = await place_order(db, data, current_user, cart_items)
+        # reload the order with its items, lazy loading is not available on the async session
+        new_order = await db.scalar(
+            select(Order)
+            .options(selectinload(Order.items))
+            .filter(Order.id == order_id)
+            .execution_options(populate_existing=True)
+        )
+        order = OrderOut.model_validate(new_order) #built before the commit expires the ORM objects
+        await stage(order)
+        await db.commit() #the order and the Idempotency-Key response together
+    except BaseException:
+        await cart_store.restore(current_user.id, cart_items) #nothing was ordered, the user keeps the cart
+        raise
+    await forget_stock(quantities.keys()) #cached product details must not show the old stock
 
     logger.info(f"Checkout - user: {current_user.email}, total: {total_amount}, payment: {data.payment_method}")
-    logger.info(f"Order created - order_id: {new_order.id}, user: {current_user.email}")
-    return new_order
+    logger.info(f"Order created - order_id: {order_id}, user: {current_user.email}")
+    return order
+
+@router.post("/", response_model=OrderOut) #this returns the newly created order as OrderOut
+async def checkout(
+    data: CheckoutRequest,
+    request: Request,
+    db: AsyncSession = Depends(get_db),
+    current_user=Depends(get_current_user),
+    idempotency_key: str | None = Header(None), #retries with the same key get the first order back instead of a second one
+):
+    return await idempotent(request, db, current_user.id, idempotency_key, lambda stage: run_checkout(db, data, current_user, stage), OrderOut)
@@ -0,0 +1,146 @@
+import json
+import time
+from collections import OrderedDict
+from threading import Lock
+from app.core.config import settings
+from app.core.logging_utils import logger
+
+class TTLCache:
+    """Bounded LRU map whose entries also expire after a time to live.
+
+    Counts hits, misses and evictions so callers can expose them as stats.
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 60.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._data = OrderedDict() # key -> (expires_at, value), oldest first
+        self._lock = Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None or entry[0] <= time.monotonic():
+                if entry is not None:
+                    del self._data[key] # expired
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key, value, ttl: float | None = None):
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._data[key] = (expires_at, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False) # drop the least recently used entry
+                self.evictions += 1
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def items(self):
+        # snapshot of the live entries, expired ones are skipped (not counted as hits)
+        now = time.monotonic()
+        with self._lock:
+            return [(key, value) for key, (expires_at, value) in self._data.items() if expires_at > now]
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+    def stats(self):
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+# Shared cache backends. Both speak the same small async API (get/set/delete/stats)
+# so features can switch between in-process and Redis with CACHE_BACKEND.
+
+class MemoryCacheBackend:
+    """In-process LRU + TTL store, each worker keeps its own copy."""
+
+    def __init__(self, maxsize: int = 10000, ttl: float = 60.0):
+        self._cache = TTLCache(maxsize=maxsize, ttl=ttl)
+
+    async def get(self, key):
+        return self._cache.get(key)
+
+    async def set(self, key, value, ttl: float | None = None):
+        self._cache.set(key, value, ttl)
+
+    async def delete(self, *keys):
+        for key in keys:
+            self._cache.delete(key)
+
+    def stats(self):
+        return {"backend": "memory", **self._cache.stats()}
+
+class RedisCacheBackend:
+    """Values stored as JSON in Redis (or anything speaking its protocol), shared by every worker.
+
+    Redis errors are logged and treated as misses so a cache outage never fails a request.
+    """
+
+    def __init__(self, url: str, ttl: float = 60.0, prefix: str = "ecommerce:", client=None):
+        if client is None:
+            import redis.asyncio as redis #only needed when this backend is configured
+            client = redis.from_url(url)
+        self.client = client
+        self.ttl = ttl
+        self.prefix = prefix
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+
+    async def get(self, key):
+        try:
+            raw = await self.client.get(self.prefix + key)
+        except Exception as exc:
+            self._failed("get", exc)
+            raw = None
+        if raw is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return json.loads(raw)
+
+    async def set(self, key, value, ttl: float | None = None):
+        try:
+            await self.client.set(self.prefix + key, json.dumps(value), px=int((self.ttl if ttl is None else ttl) * 1000))
+        except Exception as exc:
+            self._failed("set", exc)
+
+    async def delete(self, *keys):
+        if not keys:
+            return
+        try:
+            await self.client.delete(*(self.prefix + key for key in keys))
+        except Exception as exc:
+            self._failed("delete", exc)
+
+    def _failed(self, operation, exc):
+        self.errors += 1
+        logger.warning(f"Redis cache {operation} failed - {exc}")
+
+    def stats(self):
+        # evictions happen inside redis (maxmemory policy), see INFO stats there
+        return {"backend": "redis", "hits": self.hits, "misses": self.misses, "errors": self.errors}
+
+def create_cache_backend(maxsize: int, ttl: float):
+    if settings.CACHE_BACKEND == "redis":
+        return RedisCacheBackend(settings.CACHE_URL, ttl=ttl)
+    return MemoryCacheBackend(maxsize=maxsize, ttl=ttl)
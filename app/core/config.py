@@ -5,14 +5,64 @@ load_dotenv()
 
 class Settings:
     DATABASE_URL = os.getenv("DATABASE_URL")
+    DB_ASYNC = os.getenv("DB_ASYNC", "true").lower() == "true" # false falls back to the blocking engine run in the threadpool
+    ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL") # optional, derived from DATABASE_URL when empty
+    DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", 5)) # connections kept open per engine
+    DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", 10)) # extra connections allowed under burst
+    DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", 30)) # seconds to wait for a free connection
+    DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", 1800)) # reopen connections older than this (seconds)
+    DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "false").lower() == "true" # test connections on checkout
+    SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", 5000))
+    SQLITE_MMAP_SIZE = int(os.getenv("SQLITE_MMAP_SIZE", 256 * 1024 * 1024))
     SECRET_KEY = os.getenv("SECRET_KEY")
     ALGORITHM = os.getenv("ALGORITHM")
     ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", 30))
+    AUTH_CACHE_TTL_SECONDS = float(os.getenv("AUTH_CACHE_TTL_SECONDS", 60)) # how long a verified token is reused
+    AUTH_CACHE_MAX_SIZE = int(os.getenv("AUTH_CACHE_MAX_SIZE", 10000))
+    PASSWORD_HASH_EXECUTOR = os.getenv("PASSWORD_HASH_EXECUTOR", "thread") # "thread" (bcrypt releases the GIL) or "process"
+    PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", os.cpu_count() or 1))
+    PASSWORD_HASH_MAX_PENDING = int(os.getenv("PASSWORD_HASH_MAX_PENDING", 64)) # queued + running hashes before we answer 503
+    CACHE_BACKEND = os.getenv("CACHE_BACKEND", "memory") # "memory" (per worker) or "redis" (shared)
+    CACHE_URL = os.getenv("CACHE_URL", "redis://localhost:6379/0")
+    # cached user identity and role, what authorization checks. With redis invalidate_user (role change, password reset)
+    # reaches every worker at once; with memory the other workers keep the old copy until it expires, so it's capped at 10s
+    AUTH_USER_CACHE_TTL_SECONDS = float(os.getenv("AUTH_USER_CACHE_TTL_SECONDS", AUTH_CACHE_TTL_SECONDS if CACHE_BACKEND == "redis" else 10))
+    CATALOG_CACHE_TTL_SECONDS = float(os.getenv("CATALOG_CACHE_TTL_SECONDS", 60))
+    CATALOG_CACHE_MAX_SIZE = int(os.getenv("CATALOG_CACHE_MAX_SIZE", 10000))
+    HTTP_CACHE_MAX_AGE = int(os.getenv("HTTP_CACHE_MAX_AGE", 30)) # seconds clients/CDNs may reuse a catalog response without asking
+    HTTP_CACHE_STALE_WHILE_REVALIDATE = int(os.getenv("HTTP_CACHE_STALE_WHILE_REVALIDATE", 60)) # then serve it stale while one revalidation runs, 0 disables
+    HTTP_CACHE_STALE_IF_ERROR = int(os.getenv("HTTP_CACHE_STALE_IF_ERROR", 300)) # or while we answer 5xx, 0 disables
+    CART_BACKEND = os.getenv("CART_BACKEND", "sql") # "sql" (cart table), "memory" (single worker) or "redis" (hash per user)
+    CART_URL = os.getenv("CART_URL", os.getenv("CACHE_URL", "redis://localhost:6379/0"))
+    CART_TTL_SECONDS = float(os.getenv("CART_TTL_SECONDS", 7 * 24 * 3600)) # memory/redis carts untouched this long are dropped
+    CART_MEMORY_MAX_CARTS = int(os.getenv("CART_MEMORY_MAX_CARTS", 100000))
+    IDEMPOTENCY_TTL_SECONDS = float(os.getenv("IDEMPOTENCY_TTL_SECONDS", 24 * 3600)) # how long a finished request is replayed for its Idempotency-Key
+    IDEMPOTENCY_LOCK_SECONDS = float(os.getenv("IDEMPOTENCY_LOCK_SECONDS", 60)) # a key whose request never finished (crashed worker) is free again after this
+    IDEMPOTENCY_CACHE_MAX_SIZE = int(os.getenv("IDEMPOTENCY_CACHE_MAX_SIZE", 10000)) # finished responses kept in memory in front of the table
+    RATE_LIMIT_ENABLED = os.getenv("RATE_LIMIT_ENABLED", "true").lower() == "true"
+    RATE_LIMIT_BACKEND = os.getenv("RATE_LIMIT_BACKEND", "memory") # "memory" (per worker) or "redis" (shared)
+    RATE_LIMIT_URL = os.getenv("RATE_LIMIT_URL", os.getenv("CACHE_URL", "redis://localhost:6379/0"))
+    RATE_LIMITS = os.getenv("RATE_LIMITS", "/auth/signin=10/60,/auth/forgot-password=5/300,/products/search=30/10") # path=requests/seconds per user or IP
+    RATE_LIMIT_IP_PATHS = os.getenv("RATE_LIMIT_IP_PATHS", "/auth/signin,/auth/forgot-password") # routes anyone can call, limited per IP even with a token attached
+    RATE_LIMIT_MAX_KEYS = int(os.getenv("RATE_LIMIT_MAX_KEYS", 100000)) # buckets kept by the memory backend
+    LOAD_SHED_PATHS = os.getenv("LOAD_SHED_PATHS", "/products,/orders") # low priority GETs (prefixes) answered 503 under overload
+    LOAD_SHED_LOOP_LAG_MS = float(os.getenv("LOAD_SHED_LOOP_LAG_MS", 200)) # event loop lag that counts as overload, 0 disables
+    LOAD_SHED_POOL_WAIT_MS = float(os.getenv("LOAD_SHED_POOL_WAIT_MS", 250)) # average DB connection wait that counts as overload, 0 disables
+    ACCESS_LOG_SAMPLE_RATE = float(os.getenv("ACCESS_LOG_SAMPLE_RATE", 1.0)) # share of requests written to the access log
+    ACCESS_LOG_SAMPLE_RATES = os.getenv("ACCESS_LOG_SAMPLE_RATES", "") # per route overrides, e.g. "/products=0.1,/products/{id}=0.05"
+    METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() == "true" # serve /metrics and record per request stats
     EMAIL_HOST = os.getenv("EMAIL_HOST")
     EMAIL_PORT = int(os.getenv("EMAIL_PORT"))
     EMAIL_USERNAME = os.getenv("EMAIL_USERNAME")
     EMAIL_PASSWORD = os.getenv("EMAIL_PASSWORD")
     EMAIL_FROM = os.getenv("EMAIL_FROM")
+    EMAIL_START_TLS = os.getenv("EMAIL_START_TLS", "true").lower() == "true"
+    EMAIL_SMTP_POOL_SIZE = int(os.getenv("EMAIL_SMTP_POOL_SIZE", 2)) # SMTP connections kept open by the outbox worker
+    EMAIL_OUTBOX_WORKER = os.getenv("EMAIL_OUTBOX_WORKER", "embedded") # "embedded" sends from the API process, "external" leaves it to python -m app.notifications.worker
+    EMAIL_OUTBOX_BATCH_SIZE = int(os.getenv("EMAIL_OUTBOX_BATCH_SIZE", 50))
+    EMAIL_OUTBOX_POLL_SECONDS = float(os.getenv("EMAIL_OUTBOX_POLL_SECONDS", 2))
+    EMAIL_MAX_ATTEMPTS = int(os.getenv("EMAIL_MAX_ATTEMPTS", 8)) # then the email is marked failed
+    EMAIL_RETRY_BASE_SECONDS = float(os.getenv("EMAIL_RETRY_BASE_SECONDS", 30)) # doubles with every attempt, capped at an hour
     BASE_URL = os.getenv("BASE_URL")
 
 settings = Settings()
\ No newline at end of file
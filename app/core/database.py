@@ -1,14 +1,279 @@
-from sqlalchemy import create_engine
+import asyncio
+import time
+import weakref
+import anyio.to_thread
+from contextlib import asynccontextmanager
+from fastapi import HTTPException
+from sqlalchemy import create_engine, event
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
 from sqlalchemy.orm import sessionmaker, declarative_base
-import os
-from dotenv import load_dotenv
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+from starlette.concurrency import run_in_threadpool
+from app.core.config import settings
 
-load_dotenv()
+SQLALCHEMY_DATABASE_URL = settings.DATABASE_URL
 
-SQLALCHEMY_DATABASE_URL = os.getenv("DATABASE_URL")
+class PoolMetrics:
+    """Counters fed by the instrumented pools below, one instance per engine."""
+
+    def __init__(self):
+        self.checkouts = 0
+        self.connects = 0
+        self.timeouts = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+        self.overflow_max = 0
+        self.pool = None
+        self.wait_recent = 0.0 #moving average of checkout waits, read by the load shedder
+        self.wait_recent_at = 0.0
+
+    def record_wait(self, seconds: float):
+        self.checkouts += 1
+        self.wait_seconds_total += seconds
+        if seconds > self.wait_seconds_max:
+            self.wait_seconds_max = seconds
+        self.wait_recent = self.recent_wait() * 0.8 + seconds * 0.2
+        self.wait_recent_at = time.monotonic()
+
+    def recent_wait(self):
+        # halves every second without checkouts, so a quiet (or fully shed) pool reads as healthy again
+        return self.wait_recent * 0.5 ** (time.monotonic() - self.wait_recent_at)
+
+    def snapshot(self):
+        pool = self.pool
+        return {
+            "size": pool.size() if pool is not None else 0,
+            "checked_out": pool.checkedout() if pool is not None else 0,
+            "overflow": max(pool.overflow(), 0) if pool is not None else 0,
+            "overflow_max": self.overflow_max,
+            "checkouts": self.checkouts,
+            "connects": self.connects,
+            "timeouts": self.timeouts,
+            "wait_seconds_total": round(self.wait_seconds_total, 6),
+            "wait_seconds_max": round(self.wait_seconds_max, 6),
+        }
+
+def instrumented_pool(pool_class, metrics: PoolMetrics):
+    # times every checkout, including the wait for a free connection when the pool is exhausted
+    class InstrumentedPool(pool_class):
+        def _do_get(self):
+            started = time.perf_counter()
+            try:
+                connection = super()._do_get()
+            except PoolTimeoutError:
+                metrics.timeouts += 1
+                raise
+            metrics.record_wait(time.perf_counter() - started)
+            metrics.overflow_max = max(metrics.overflow_max, self.overflow())
+            return connection
+
+    return InstrumentedPool
+
+def pool_options(url: str, pool_class, metrics: PoolMetrics):
+    if url.startswith("sqlite") and (":memory:" in url or url.rstrip("/").endswith(":")):
+        return {} # in-memory sqlite keeps its single-connection pool
+    return dict(
+        poolclass=instrumented_pool(pool_class, metrics),
+        pool_size=settings.DB_POOL_SIZE,
+        max_overflow=settings.DB_MAX_OVERFLOW,
+        pool_timeout=settings.DB_POOL_TIMEOUT,
+        pool_recycle=settings.DB_POOL_RECYCLE,
+        pool_pre_ping=settings.DB_POOL_PRE_PING,
+    )
+
+def tune_sqlite(engine, metrics: PoolMetrics):
+    @event.listens_for(engine, "connect")
+    def on_connect(dbapi_connection, connection_record):
+        metrics.connects += 1
+        if engine.dialect.name != "sqlite":
+            return
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA journal_mode=WAL") #readers no longer block the writer
+        cursor.execute("PRAGMA synchronous=NORMAL") #safe with WAL, fsync only at checkpoints
+        cursor.execute(f"PRAGMA busy_timeout={settings.SQLITE_BUSY_TIMEOUT_MS}")
+        cursor.execute(f"PRAGMA mmap_size={settings.SQLITE_MMAP_SIZE}")
+        cursor.close()
+
+pool_metrics = PoolMetrics()
 
 # print("DB URL:", SQLALCHEMY_DATABASE_URL)
-engine = create_engine(SQLALCHEMY_DATABASE_URL)
+engine = create_engine(SQLALCHEMY_DATABASE_URL, **pool_options(SQLALCHEMY_DATABASE_URL, QueuePool, pool_metrics))
+pool_metrics.pool = engine.pool
+tune_sqlite(engine, pool_metrics)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 Base = declarative_base()
+
+def get_async_database_url(url: str):
+    # swap the blocking driver for its asyncio counterpart (sqlite -> aiosqlite, postgres -> asyncpg)
+    if settings.ASYNC_DATABASE_URL:
+        return settings.ASYNC_DATABASE_URL
+    scheme, _, rest = url.partition("://")
+    backend = scheme.split("+")[0]
+    drivers = {"sqlite": "sqlite+aiosqlite", "postgresql": "postgresql+asyncpg", "postgres": "postgresql+asyncpg"}
+    if backend not in drivers:
+        raise ValueError(f"No async driver known for database '{backend}', set ASYNC_DATABASE_URL")
+    return f"{drivers[backend]}://{rest}"
+
+async_engine = None
+async_pool_metrics = None
+AsyncSessionLocal = None
+if settings.DB_ASYNC:
+    from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+
+    async_pool_metrics = PoolMetrics()
+    async_url = get_async_database_url(SQLALCHEMY_DATABASE_URL)
+    async_engine = create_async_engine(async_url, **pool_options(async_url, AsyncAdaptedQueuePool, async_pool_metrics))
+    async_pool_metrics.pool = async_engine.sync_engine.pool
+    tune_sqlite(async_engine.sync_engine, async_pool_metrics)
+    # expire_on_commit=False so returned objects can be serialized without lazy IO after commit
+    AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
+class SyncSessionAdapter:
+    """Exposes a blocking Session through the AsyncSession API.
+
+    Used when DB_ASYNC is off so the same async handlers run on the sync engine,
+    every DB call is pushed to the threadpool instead of blocking the event loop.
+    """
+
+    def __init__(self, session):
+        self.sync_session = session
+
+    def add(self, instance):
+        self.sync_session.add(instance)
+
+    def add_all(self, instances):
+        self.sync_session.add_all(instances)
+
+    async def execute(self, statement, params=None, **kw):
+        def _execute():
+            result = self.sync_session.execute(statement, params, **kw)
+            if not getattr(result, "returns_rows", True):
+                return result
+            # buffer rows inside the worker thread, like AsyncSession does
+            try:
+                return result.freeze()()
+            except NotImplementedError: # ORM bulk DML results carry no rows to buffer
+                return result
+        return await run_in_threadpool(_execute)
+
+    async def scalar(self, statement, params=None, **kw):
+        return await run_in_threadpool(self.sync_session.scalar, statement, params, **kw)
+
+    async def scalars(self, statement, params=None, **kw):
+        result = await self.execute(statement, params, **kw)
+        return result.scalars()
+
+    async def get(self, entity, ident, **kw):
+        return await run_in_threadpool(self.sync_session.get, entity, ident, **kw)
+
+    async def delete(self, instance):
+        await run_in_threadpool(self.sync_session.delete, instance)
+
+    async def refresh(self, instance, attribute_names=None):
+        await run_in_threadpool(self.sync_session.refresh, instance, attribute_names)
+
+    async def flush(self, objects=None):
+        await run_in_threadpool(self.sync_session.flush, objects)
+
+    async def commit(self):
+        await run_in_threadpool(self.sync_session.commit)
+
+    async def rollback(self):
+        await run_in_threadpool(self.sync_session.rollback)
+
+    async def close(self):
+        await run_in_threadpool(self.sync_session.close)
+
+    async def run_sync(self, fn, *args, **kw):
+        return await run_in_threadpool(fn, self.sync_session, *args, **kw)
+
+    async def stream(self, statement, params=None, **kw):
+        # server side cursor, each partition is fetched in the threadpool
+        result = await run_in_threadpool(self.sync_session.execute, statement, params, **kw)
+        return SyncStreamResult(result)
+
+class SyncStreamResult:
+    """The `partitions()` part of AsyncResult over a blocking result."""
+
+    def __init__(self, result):
+        self.result = result
+
+    async def partitions(self, size=None):
+        chunks = self.result.partitions(size)
+        while True:
+            chunk = await run_in_threadpool(next, chunks, None)
+            if chunk is None:
+                return
+            yield chunk
+
+class SessionSlots:
+    """Caps how many sync sessions are open at once to what the pool can hand out.
+
+    A SyncSessionAdapter keeps its connection between threadpool calls. With more sessions than
+    connections every thread can end up blocked on a pool checkout while the sessions that hold
+    the connections wait for a thread to finish on, so the extra requests wait here, on the event
+    loop, instead. Nested sessions of one task (the route's session plus a session_scope inside it)
+    share the task's slot, otherwise a full house of tasks would each wait for a second one.
+    The cap is also kept under the threadpool size: a session holding a database lock (SQLite's
+    write lock) needs a thread to commit while the others' threads wait on that lock.
+    Slots belong to tasks, so code running in another task (a streamed response body) has to use
+    the request's session rather than open one. A wait past DB_POOL_TIMEOUT answers 503.
+    """
+
+    def __init__(self, limit: int | None):
+        self.limit = limit
+        self.semaphores = weakref.WeakKeyDictionary() #one per event loop, tests run the app on several
+        self.holders = weakref.WeakKeyDictionary() #task -> sessions it has open
+
+    @asynccontextmanager
+    async def hold(self):
+        task = asyncio.current_task()
+        if self.limit is None or task is None:
+            yield
+            return
+        semaphore = None
+        if not self.holders.get(task):
+            loop = asyncio.get_running_loop()
+            semaphore = self.semaphores.get(loop)
+            if semaphore is None:
+                threads = anyio.to_thread.current_default_thread_limiter().total_tokens
+                semaphore = self.semaphores[loop] = asyncio.Semaphore(min(self.limit, int(threads)))
+            try:
+                await asyncio.wait_for(semaphore.acquire(), settings.DB_POOL_TIMEOUT) #the wait a pool checkout would have had
+            except asyncio.TimeoutError:
+                pool_metrics.timeouts += 1
+                raise HTTPException(status_code=503, detail="Server busy, please try again", headers={"Retry-After": "1"})
+        self.holders[task] = self.holders.get(task, 0) + 1
+        try:
+            yield
+        finally:
+            self.holders[task] -= 1
+            if semaphore is not None:
+                del self.holders[task]
+                semaphore.release()
+
+# no cap for pools that never make a checkout wait (in-memory sqlite, unlimited overflow)
+sync_session_slots = SessionSlots(
+    settings.DB_POOL_SIZE + settings.DB_MAX_OVERFLOW if isinstance(engine.pool, QueuePool) and settings.DB_MAX_OVERFLOW >= 0 else None
+)
+
+async def get_db():
+    if AsyncSessionLocal is not None:
+        async with AsyncSessionLocal() as db:
+            yield db #this will yield the async session
+    else:
+        async with sync_session_slots.hold():
+            db = SyncSessionAdapter(SessionLocal())
+            try:
+                yield db
+            finally:
+                await db.close()
+
+session_scope = asynccontextmanager(get_db) #the request dependency, usable outside a request (workers, streaming bodies)
+
+def pool_stats():
+    stats = {"sync": pool_metrics.snapshot()}
+    if async_pool_metrics is not None:
+        stats["async"] = async_pool_metrics.snapshot()
+    return stats
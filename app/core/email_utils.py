@@ -1,19 +1,50 @@
+import asyncio
 from email.message import EmailMessage
 import aiosmtplib
 from app.core.config import settings
 
-async def send_email(subject: str, recipient: str, body: str):
+def build_message(subject: str, recipient: str, body: str):
     message = EmailMessage()
     message["From"] = settings.EMAIL_FROM
     message["To"] = recipient
     message["Subject"] = subject
     message.set_content(body)
+    return message
 
-    await aiosmtplib.send(
-        message,
-        hostname=settings.EMAIL_HOST,
-        port=settings.EMAIL_PORT,
-        username=settings.EMAIL_USERNAME,
-        password=settings.EMAIL_PASSWORD,
-        start_tls=True,
-    )
+class SMTPPool:
+    """Up to `size` logged in SMTP connections, reused across sends instead of a new STARTTLS handshake per mail."""
+
+    def __init__(self, size: int | None = None):
+        self.size = size or settings.EMAIL_SMTP_POOL_SIZE
+        self._slots = asyncio.Semaphore(self.size)
+        self._idle = [] #connected clients nobody is using
+
+    async def _connect(self):
+        client = aiosmtplib.SMTP(
+            hostname=settings.EMAIL_HOST,
+            port=settings.EMAIL_PORT,
+            username=settings.EMAIL_USERNAME,
+            password=settings.EMAIL_PASSWORD,
+            start_tls=settings.EMAIL_START_TLS,
+        )
+        await client.connect() #also does STARTTLS and login
+        return client
+
+    async def send(self, message: EmailMessage):
+        async with self._slots:
+            client = self._idle.pop() if self._idle else None
+            if client is None or not client.is_connected:
+                client = await self._connect()
+            try:
+                await client.send_message(message)
+            finally:
+                if client.is_connected: #a rejected recipient leaves the connection usable, a dropped one is discarded
+                    self._idle.append(client)
+
+    async def close(self):
+        while self._idle:
+            client = self._idle.pop()
+            try:
+                await client.quit()
+            except aiosmtplib.SMTPException:
+                client.close()
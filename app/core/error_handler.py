@@ -26,5 +26,6 @@ def register_exception_handlers(app: FastAPI):
                 "error": True,
                 "message": exc.detail,
                 "code": exc.status_code
-            }
+            },
+            headers=getattr(exc, "headers", None) # keeps Retry-After / WWW-Authenticate
         )
@@ -0,0 +1,65 @@
+import hashlib
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from fastapi import Request, Response
+from app.core.config import settings
+
+# Conditional GET for the public catalog. Endpoints work out a weak ETag from the versions of
+# the rows they would send (and a Last-Modified where one row is all there is), a request whose
+# If-None-Match / If-Modified-Since still matches gets a bare 304 before anything is serialized.
+
+def cache_control():
+    parts = ["public", f"max-age={settings.HTTP_CACHE_MAX_AGE}"]
+    if settings.HTTP_CACHE_STALE_WHILE_REVALIDATE:
+        parts.append(f"stale-while-revalidate={settings.HTTP_CACHE_STALE_WHILE_REVALIDATE}")
+    if settings.HTTP_CACHE_STALE_IF_ERROR:
+        parts.append(f"stale-if-error={settings.HTTP_CACHE_STALE_IF_ERROR}")
+    return ", ".join(parts)
+
+def weak_etag(*parts):
+    # weak: same data, not necessarily the same bytes (key order, gzip...)
+    digest = hashlib.blake2b(":".join(map(str, parts)).encode(), digest_size=12).hexdigest()
+    return f'W/"{digest}"'
+
+def rows_etag(rows):
+    # rows: (id, version, updated_at) in response order, so adds, deletes, edits and reorders all change it.
+    # updated_at tells apart a new row that reused a deleted row's id (sqlite does) and starts at version 1 again
+    return weak_etag(*(".".join(map(str, row)) for row in rows))
+
+def http_date(value: datetime | None):
+    return format_datetime(value.replace(microsecond=0, tzinfo=timezone.utc), usegmt=True) if value else None #stored as naive UTC
+
+def etag_matches(header: str, etag: str):
+    if header.strip() == "*":
+        return True
+    opaque = etag.removeprefix("W/") #If-None-Match uses the weak comparison
+    return any(candidate.strip().removeprefix("W/") == opaque for candidate in header.split(","))
+
+def not_modified(request: Request, etag: str, last_modified: datetime | None = None):
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None: #takes precedence, If-Modified-Since is then ignored
+        return etag_matches(if_none_match, etag)
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since and last_modified:
+        try:
+            since = parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+        if since.tzinfo:
+            since = since.astimezone(timezone.utc).replace(tzinfo=None)
+        return last_modified.replace(microsecond=0) <= since
+    return False
+
+def cache_headers(etag: str, last_modified: datetime | None = None, extra: dict | None = None):
+    headers = {"ETag": etag, "Cache-Control": cache_control(), **(extra or {})}
+    if last_modified:
+        headers["Last-Modified"] = http_date(last_modified)
+    return headers
+
+def conditional(request: Request, response: Response, etag: str, last_modified: datetime | None = None, extra: dict | None = None):
+    """Sets the validators on response, returns a 304 to send instead when the client's copy is current."""
+    headers = cache_headers(etag, last_modified, extra)
+    if not_modified(request, etag, last_modified):
+        return Response(status_code=304, headers=headers)
+    response.headers.update(headers)
+    return None
@@ -0,0 +1,84 @@
+import asyncio
+import time
+from app.core.config import settings
+from app.core.database import pool_metrics, async_pool_metrics
+from app.core.logging_utils import logger
+from app.core.metrics import metrics
+from app.core.rate_limit import rejection
+
+# Adaptive load shedding: when the process is saturated (the event loop is late waking up
+# timers, or requests queue for a DB connection) low priority reads answer 503 right away
+# instead of queueing behind checkout and signin. Catalog responses carry stale-if-error,
+# so a CDN or browser keeps serving its copy while we shed them.
+
+SAMPLE_SECONDS = 0.05
+LAG_DECAY = 0.8 #per sample, a spike is seen at once and forgotten within about a second
+
+def parse_paths(raw: str | None):
+    return tuple(path.strip().rstrip("/") for path in (raw or "").split(",") if path.strip())
+
+class LoopLagMonitor:
+    """Sleeps SAMPLE_SECONDS in a loop and records how late it wakes up."""
+
+    def __init__(self):
+        self.lag = 0.0
+        self.task = None
+
+    def start(self):
+        if self.task is None:
+            self.task = asyncio.get_running_loop().create_task(self.run())
+
+    async def stop(self):
+        if self.task is not None:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+            self.task = None
+        self.lag = 0.0
+
+    async def run(self):
+        while True:
+            started = time.perf_counter()
+            await asyncio.sleep(SAMPLE_SECONDS)
+            late = time.perf_counter() - started - SAMPLE_SECONDS
+            self.lag = max(late, self.lag * LAG_DECAY)
+
+loop_lag = LoopLagMonitor()
+
+def pool_wait():
+    return max(pool.recent_wait() for pool in (pool_metrics, async_pool_metrics) if pool is not None)
+
+class LoadSheddingMiddleware:
+    def __init__(self, app, paths: tuple | None = None, max_loop_lag: float | None = None, max_pool_wait: float | None = None):
+        self.app = app
+        self.paths = parse_paths(settings.LOAD_SHED_PATHS) if paths is None else paths
+        self.max_loop_lag = settings.LOAD_SHED_LOOP_LAG_MS / 1000 if max_loop_lag is None else max_loop_lag
+        self.max_pool_wait = settings.LOAD_SHED_POOL_WAIT_MS / 1000 if max_pool_wait is None else max_pool_wait
+        self.shedding = False
+
+    def low_priority(self, scope):
+        # only reads, a client retries them (or a cache serves them stale) without losing anything
+        if scope["method"] not in ("GET", "HEAD"):
+            return None
+        path = scope["path"]
+        for prefix in self.paths:
+            if path == prefix or path.startswith(prefix + "/"):
+                return prefix
+        return None
+
+    def overloaded(self):
+        overloaded = (0 < self.max_loop_lag < loop_lag.lag) or (0 < self.max_pool_wait < pool_wait())
+        if overloaded != self.shedding: #log the edges, not every shed request
+            self.shedding = overloaded
+            logger.warning(f"Load shedding {'on' if overloaded else 'off'} - loop lag {loop_lag.lag * 1000:.0f}ms, pool wait {pool_wait() * 1000:.0f}ms")
+        return overloaded
+
+    async def __call__(self, scope, receive, send):
+        prefix = self.low_priority(scope) if scope["type"] == "http" else None
+        if prefix is not None and self.overloaded():
+            metrics.record_rejection("shed", prefix)
+            await rejection(503, "Server busy, try again shortly", 1)(scope, receive, send)
+            return
+        await self.app(scope, receive, send)
@@ -1,9 +1,52 @@
+import atexit
+import json
 import logging
+import queue
+import sys
+from logging.handlers import QueueHandler, QueueListener
+
+# Records are only queued on the calling thread (the event loop), a background
+# listener thread formats them and does the actual write.
+
+TEXT_FORMAT = "%(asctime)s - %(levelname)s - %(message)s"
+
+class LogFormatter(logging.Formatter):
+    """Plain text for application messages, one JSON object per line for records carrying `fields`."""
+
+    def format(self, record):
+        fields = getattr(record, "fields", None)
+        if fields is None:
+            return super().format(record)
+        return json.dumps({"time": self.formatTime(record), "level": record.levelname, "event": record.getMessage(), **fields}, default=str)
+
+class DeferredQueueHandler(QueueHandler):
+    # the stock QueueHandler formats before enqueueing, we leave that to the listener thread
+    def prepare(self, record):
+        return record
+
+log_queue = queue.SimpleQueue()
+log_handler = logging.StreamHandler(sys.stderr)
+log_handler.setFormatter(LogFormatter(TEXT_FORMAT))
+log_listener = QueueListener(log_queue, log_handler)
 
 # Configure logger
 logging.basicConfig(
     level=logging.INFO,
-    format="%(asctime)s - %(levelname)s - %(message)s"
+    handlers=[DeferredQueueHandler(log_queue)]
 )
 
+def start_logging():
+    if log_listener._thread is None:
+        log_listener.start()
+
+def stop_logging():
+    # drains whatever is still queued, records logged after this wait for the next start_logging
+    if log_listener._thread is not None:
+        log_listener.stop()
+
+start_logging()
+
+atexit.register(stop_logging)
+
 logger = logging.getLogger("app")
+access_logger = logging.getLogger("app.access")
@@ -0,0 +1,166 @@
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+from sqlalchemy import event
+
+# In-process Prometheus metrics, rendered in the text exposition format at /metrics.
+# Everything is recorded from the event loop thread, so plain dict/int updates need no
+# locks. The only off-loop writer is the SQL hook, which bumps a counter owned by a single request.
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+STATEMENT_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 34, 55)
+HASH_BUCKETS = (0.05, 0.1, 0.2, 0.3, 0.5, 1.0, 2.0)
+
+CACHE_SERIES = (
+    ("size", "cache_entries", "gauge"),
+    ("hits", "cache_hits_total", "counter"),
+    ("misses", "cache_misses_total", "counter"),
+    ("evictions", "cache_evictions_total", "counter"),
+    ("errors", "cache_errors_total", "counter"),
+)
+POOL_SERIES = (
+    ("checked_out", "db_pool_checked_out", "gauge"),
+    ("overflow", "db_pool_overflow", "gauge"),
+    ("checkouts", "db_pool_checkouts_total", "counter"),
+    ("timeouts", "db_pool_timeouts_total", "counter"),
+    ("wait_seconds_total", "db_pool_wait_seconds_total", "counter"),
+)
+
+class Histogram:
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1) # last slot is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def lines(self, name, labels):
+        cumulative = 0
+        for bound, count in zip((*self.buckets, "+Inf"), self.counts):
+            cumulative += count
+            yield f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}'
+        yield f"{name}_sum{{{labels}}} {self.sum}"
+        yield f"{name}_count{{{labels}}} {self.count}"
+
+class RouteMetrics:
+    __slots__ = ("statuses", "latency", "statements")
+
+    def __init__(self):
+        self.statuses = {}
+        self.latency = Histogram(LATENCY_BUCKETS)
+        self.statements = Histogram(STATEMENT_BUCKETS)
+
+# statements issued by the current request, a one item list so threadpool copies of the context share it
+request_statements: ContextVar[list | None] = ContextVar("request_statements", default=None)
+
+def label(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+class Metrics:
+    def __init__(self):
+        self.routes = {} # (method, route template) -> RouteMetrics
+        self.password_hash = {} # operation -> Histogram
+        self.emails = {} # outcome -> count
+        self.rejections = {} # (reason, path) -> count, paths come from the rate limit / shedding config
+
+    def record_request(self, method, route, status, duration, statements):
+        route_metrics = self.routes.get((method, route))
+        if route_metrics is None:
+            route_metrics = self.routes[(method, route)] = RouteMetrics()
+        route_metrics.statuses[status] = route_metrics.statuses.get(status, 0) + 1
+        route_metrics.latency.observe(duration)
+        route_metrics.statements.observe(statements)
+
+    def record_password_hash(self, operation, seconds):
+        histogram = self.password_hash.get(operation)
+        if histogram is None:
+            histogram = self.password_hash[operation] = Histogram(HASH_BUCKETS)
+        histogram.observe(seconds)
+
+    def record_email(self, outcome):
+        self.emails[outcome] = self.emails.get(outcome, 0) + 1
+
+    def record_rejection(self, reason, path):
+        self.rejections[(reason, path)] = self.rejections.get((reason, path), 0) + 1
+
+    def render(self, caches: dict | None = None, pools: dict | None = None):
+        """Text exposition of everything recorded, plus point in time cache and pool stats."""
+        out = [
+            "# HELP http_requests_total Requests by route template, method and status code.",
+            "# TYPE http_requests_total counter",
+        ]
+        routes = list(self.routes.items())
+        for (method, route), route_metrics in routes:
+            for status, count in list(route_metrics.statuses.items()):
+                out.append(f'http_requests_total{{method="{method}",route="{label(route)}",status="{status}"}} {count}')
+        out += ["# HELP http_request_duration_seconds Request latency by route template.", "# TYPE http_request_duration_seconds histogram"]
+        for (method, route), route_metrics in routes:
+            out.extend(route_metrics.latency.lines("http_request_duration_seconds", f'method="{method}",route="{label(route)}"'))
+        out += ["# HELP db_statements_per_request SQL statements executed per request.", "# TYPE db_statements_per_request histogram"]
+        for (method, route), route_metrics in routes:
+            out.extend(route_metrics.statements.lines("db_statements_per_request", f'method="{method}",route="{label(route)}"'))
+
+        out += ["# HELP password_hash_duration_seconds Time spent in bcrypt per call, excluding queueing.", "# TYPE password_hash_duration_seconds histogram"]
+        for operation, histogram in list(self.password_hash.items()):
+            out.extend(histogram.lines("password_hash_duration_seconds", f'operation="{operation}"'))
+
+        out += ["# HELP emails_total Emails handed to the SMTP server by outcome.", "# TYPE emails_total counter"]
+        for outcome, count in list(self.emails.items()):
+            out.append(f'emails_total{{outcome="{outcome}"}} {count}')
+
+        out += ["# HELP http_requests_rejected_total Requests answered 429 (rate_limited) or 503 (shed) before reaching a route.", "# TYPE http_requests_rejected_total counter"]
+        for (reason, path), count in list(self.rejections.items()):
+            out.append(f'http_requests_rejected_total{{reason="{reason}",path="{label(path)}"}} {count}')
+
+        for stats_by_name, key, series in ((caches, "cache", CACHE_SERIES), (pools, "engine", POOL_SERIES)):
+            for stat, name, kind in series:
+                out.append(f"# TYPE {name} {kind}")
+                out.extend(f'{name}{{{key}="{label(source)}"}} {stats[stat]}' for source, stats in (stats_by_name or {}).items() if stat in stats)
+        return "\n".join(out) + "\n"
+
+metrics = Metrics()
+
+def count_statement(*args):
+    counter = request_statements.get()
+    if counter is not None:
+        counter[0] += 1
+
+def install_sql_hooks(*engines):
+    for engine in engines:
+        event.listen(engine, "before_cursor_execute", count_statement)
+
+class MetricsMiddleware:
+    """Times every http request and records it under its route template."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        counter = [0]
+        token = request_statements.set(counter)
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            request_statements.reset(token)
+            route = scope.get("route")
+            # unmatched paths share one series, raw paths would let scanners blow up the label set
+            metrics.record_request(scope["method"], getattr(route, "path", None) or "unmatched", status, time.perf_counter() - started, counter[0])
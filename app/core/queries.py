@@ -0,0 +1,27 @@
+from sqlalchemy import bindparam, select
+from app.auth.models import User
+from app.cart.models import CartItem
+from app.products.models import Product
+
+# Prebuilt statements for the lookups nearly every request makes. Building a select and walking it
+# for its compiled-cache key costs more Python time than SQLite takes to answer these; a statement
+# object memoizes its cache key, so these are built once here with named bind parameters and each
+# execution goes straight to the engine's compiled cache:
+#
+#     await db.scalar(queries.USER_BY_EMAIL, {"email": email})
+#
+# Statements are immutable, a caller adding .with_for_update() or a filter gets a new one.
+# lambda_stmt would skip the construction too, but ORM execution re-resolves the lambda into a
+# fresh statement on every call, which measured slower than building it (benchmarks/bench_queries.py).
+# Whole rows by primary key go through Session.get instead, answered from the identity map when
+# the session already holds the row.
+
+CART_COLUMNS = [CartItem.id, CartItem.product_id, CartItem.quantity]
+
+USER_BY_EMAIL = select(User).filter(User.email == bindparam("email"))
+PRODUCT_BY_ID = select(Product).filter(Product.id == bindparam("product_id"))
+PRODUCTS_BY_IDS = select(Product).filter(Product.id.in_(bindparam("product_ids", expanding=True)))
+PRODUCT_STOCK = select(Product.stock).filter(Product.id == bindparam("product_id"))
+PRODUCT_STOCKS = select(Product.id, Product.stock).filter(Product.id.in_(bindparam("product_ids", expanding=True)))
+CART_LINES = select(*CART_COLUMNS).filter(CartItem.user_id == bindparam("user_id")).order_by(CartItem.id)
+CART_LINE = select(*CART_COLUMNS).filter(CartItem.user_id == bindparam("user_id"), CartItem.product_id == bindparam("product_id"))
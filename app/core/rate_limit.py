@@ -0,0 +1,150 @@
+import math
+import time
+from collections import OrderedDict
+from threading import Lock
+from starlette.responses import JSONResponse
+from app.auth.utils import decode_access_token
+from app.core.config import settings
+from app.core.logging_utils import logger
+from app.core.metrics import metrics
+
+# Token bucket rate limits for the routes people abuse: credential stuffing on signin,
+# mail bombing through forgot-password and scraping through search. Every client gets a
+# bucket per route holding up to N requests that refills at N per S seconds, a client is the
+# user behind a valid bearer token or else the client IP (run uvicorn with --forwarded-allow-ips
+# behind a proxy so that is the real address). Signin and forgot-password need no token, so
+# there a token would only buy an attacker a fresh bucket per signup: RATE_LIMIT_IP_PATHS are
+# always keyed by IP. Over the limit answers 429 with Retry-After before the request reaches
+# the route, so a flood costs no bcrypt, DB or FTS work.
+
+def parse_rate_limits(raw: str | None):
+    # "/auth/signin=10/60,/products/search=30/10" -> {"/auth/signin": (10, 60.0), ...}
+    limits = {}
+    for entry in (raw or "").split(","):
+        path, sep, limit = entry.strip().rpartition("=")
+        if sep and path:
+            requests, _, seconds = limit.partition("/")
+            limits[path] = (int(requests), float(seconds or 1))
+    return limits
+
+class MemoryRateLimitStore:
+    """Buckets kept in this process, split over shards with their own lock and LRU bound.
+
+    Every worker counts on its own, so the real limit is N times the configured one with N workers.
+    """
+
+    def __init__(self, shards: int = 16, max_keys: int = 100000):
+        self.shards = [(OrderedDict(), Lock()) for _ in range(shards)] #key -> (tokens, updated_at)
+        self.max_keys = max(1, max_keys // shards) #per shard, the least recently seen client is dropped (and starts full again)
+
+    async def hit(self, key: str, rate: float, burst: int, cost: int = 1):
+        """Takes cost tokens, returns 0 when allowed or the seconds until they are available."""
+        buckets, lock = self.shards[hash(key) % len(self.shards)]
+        now = time.monotonic()
+        with lock:
+            tokens, updated_at = buckets.pop(key, (burst, now))
+            tokens = min(burst, tokens + (now - updated_at) * rate)
+            wait = 0.0
+            if tokens >= cost:
+                tokens -= cost
+            else:
+                wait = (cost - tokens) / rate
+            buckets[key] = (tokens, now)
+            if len(buckets) > self.max_keys:
+                buckets.popitem(last=False)
+        return wait
+
+# refill and take in one round trip, atomic on the server. Uses the redis clock so workers with
+# drifting clocks agree, and expires the bucket once it would be full again anyway.
+TOKEN_BUCKET_SCRIPT = """
+local rate = tonumber(ARGV[1])
+local burst = tonumber(ARGV[2])
+local cost = tonumber(ARGV[3])
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(state[1]) or burst
+local ts = tonumber(state[2]) or now
+tokens = math.min(burst, tokens + math.max(0, now - ts) * rate)
+local wait = 0
+if tokens >= cost then
+    tokens = tokens - cost
+else
+    wait = (cost - tokens) / rate
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', tostring(now))
+redis.call('PEXPIRE', KEYS[1], math.ceil(burst / rate * 1000))
+return tostring(wait)
+"""
+
+class RedisRateLimitStore:
+    """Buckets shared by every worker in Redis (or anything speaking its protocol with EVALSHA).
+
+    Redis errors are logged and let the request through, a limiter outage never takes the routes down.
+    """
+
+    def __init__(self, url: str, prefix: str = "ecommerce:", client=None):
+        if client is None:
+            import redis.asyncio as redis #only needed when this backend is configured
+            client = redis.from_url(url)
+        self.client = client
+        self.prefix = prefix
+        self.script = client.register_script(TOKEN_BUCKET_SCRIPT)
+        self.errors = 0
+
+    async def hit(self, key: str, rate: float, burst: int, cost: int = 1):
+        try:
+            return float(await self.script(keys=[f"{self.prefix}ratelimit:{key}"], args=[rate, burst, cost]))
+        except Exception as exc:
+            self.errors += 1
+            logger.warning(f"Redis rate limit check failed - {exc}")
+            return 0.0
+
+def create_rate_limit_store():
+    if settings.RATE_LIMIT_BACKEND == "redis":
+        return RedisRateLimitStore(settings.RATE_LIMIT_URL)
+    return MemoryRateLimitStore(max_keys=settings.RATE_LIMIT_MAX_KEYS)
+
+def client_identity(scope, by_ip: bool = False):
+    if not by_ip:
+        for name, value in scope["headers"]:
+            if name == b"authorization":
+                scheme, _, token = value.decode("latin-1").partition(" ")
+                if scheme.lower() == "bearer" and token:
+                    try:
+                        subject = decode_access_token(token).get("sub")
+                    except Exception: #forged or expired tokens count against the IP, random tokens can't buy fresh buckets
+                        subject = None
+                    if subject:
+                        return f"user:{subject}"
+                break
+    client = scope.get("client")
+    return f"ip:{client[0] if client else 'unknown'}"
+
+def rejection(status: int, message: str, retry_after: float):
+    return JSONResponse(
+        {"error": True, "message": message, "code": status}, #same body as the HTTPException handler
+        status_code=status,
+        headers={"Retry-After": str(max(1, math.ceil(retry_after)))},
+    )
+
+class RateLimitMiddleware:
+    def __init__(self, app, limits: dict | None = None, store=None):
+        self.app = app
+        self.limits = parse_rate_limits(settings.RATE_LIMITS) if limits is None else limits
+        self.store = create_rate_limit_store() if store is None else store
+        self.ip_paths = {path.strip() for path in settings.RATE_LIMIT_IP_PATHS.split(",") if path.strip()}
+
+    async def __call__(self, scope, receive, send):
+        limit = self.limits.get(scope["path"]) if scope["type"] == "http" else None
+        if limit is None:
+            await self.app(scope, receive, send)
+            return
+
+        requests, seconds = limit
+        wait = await self.store.hit(f"{scope['path']}:{client_identity(scope, scope['path'] in self.ip_paths)}", requests / seconds, requests)
+        if wait > 0:
+            metrics.record_rejection("rate_limited", scope["path"])
+            await rejection(429, "Too many requests, slow down", wait)(scope, receive, send)
+            return
+        await self.app(scope, receive, send)
@@ -0,0 +1,71 @@
+import random
+import time
+import uuid
+from app.core.config import settings
+from app.core.logging_utils import access_logger
+
+# Access log as a plain ASGI middleware: one JSON line per request with the route
+# template, status, duration, user and request id. Writing happens on the log
+# listener thread, the request only pays for building the record.
+
+def parse_sample_rates(raw: str | None):
+    # "/products=0.1,/products/{id}=0.05" -> {"/products": 0.1, "/products/{id}": 0.05}
+    rates = {}
+    for entry in (raw or "").split(","):
+        path, sep, rate = entry.strip().rpartition("=")
+        if sep and path:
+            rates[path] = float(rate)
+    return rates
+
+def request_id_from(scope):
+    for name, value in scope["headers"]:
+        if name == b"x-request-id":
+            return value.decode("latin-1")[:64] #client supplied ids are trusted for tracing, but bounded
+    return uuid.uuid4().hex
+
+class RequestLoggingMiddleware:
+    def __init__(self, app, default_rate: float | None = None, sample_rates: dict | None = None):
+        self.app = app
+        self.default_rate = settings.ACCESS_LOG_SAMPLE_RATE if default_rate is None else default_rate
+        self.sample_rates = parse_sample_rates(settings.ACCESS_LOG_SAMPLE_RATES) if sample_rates is None else sample_rates
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        request_id = request_id_from(scope)
+        state = scope.setdefault("state", {}) #get_current_user stores the user id here
+        state["request_id"] = request_id
+        status = 500 #stays 500 if the app raises before answering
+        header = (b"x-request-id", request_id.encode("latin-1"))
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                message["headers"] = [*message.get("headers", ()), header]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            self.log(scope, state, request_id, status, time.perf_counter() - started)
+
+    def log(self, scope, state, request_id, status, duration):
+        route = scope.get("route")
+        path = getattr(route, "path", None) or scope["path"] #template like /products/{id}, raw path when nothing matched
+        rate = self.sample_rates.get(path, self.default_rate)
+        if status < 500 and rate < 1 and random.random() >= rate: #server errors are always kept
+            return
+        client = scope.get("client")
+        access_logger.info("request", extra={"fields": {
+            "method": scope["method"],
+            "path": path,
+            "status": status,
+            "duration_ms": round(duration * 1000, 3),
+            "user_id": state.get("user_id"),
+            "request_id": request_id,
+            "client_ip": client[0] if client else None,
+        }})
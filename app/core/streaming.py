@@ -0,0 +1,24 @@
+import orjson
+from fastapi.responses import StreamingResponse
+
+# Streamed JSON arrays for large listings: rows come off a yield_per cursor in partitions,
+# each partition is serialized with orjson and written as soon as it is ready, so memory
+# stays at one partition however long the list is. The body is the same JSON array the
+# buffered response would have sent.
+
+STREAM_PARTITION_SIZE = 1000
+
+async def json_array(batches):
+    yield b"["
+    first = True
+    async for batch in batches:
+        if not batch:
+            continue
+        body = b",".join(map(orjson.dumps, batch))
+        yield body if first else b"," + body
+        first = False
+    yield b"]"
+
+def streaming_json(batches, headers: dict | None = None):
+    # batches: async iterator of lists of plain dicts
+    return StreamingResponse(json_array(batches), media_type="application/json", headers=headers)
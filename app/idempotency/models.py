@@ -0,0 +1,15 @@
+from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, Index
+from app.core.database import Base
+
+class IdempotencyKey(Base):
+    __tablename__ = "idempotency_keys"
+    # one key per user, the unique index is also what makes the first request the only one to run
+    __table_args__ = (Index("ix_idempotency_keys_user_id_key", "user_id", "key", unique=True),)
+
+    id = Column(Integer, primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    key = Column(String(255), nullable=False)
+    fingerprint = Column(String(64), nullable=False) #sha256 of method, path and body, a reused key must come with the same request
+    status_code = Column(Integer, nullable=True) #NULL while the first request is still running
+    response_body = Column(Text, nullable=True)
+    expires_at = Column(DateTime, nullable=False) #lock expiry while running, replay window once done
@@ -0,0 +1,137 @@
+import asyncio
+import hashlib
+import json
+from datetime import datetime, timedelta
+from functools import lru_cache
+from fastapi import HTTPException, Request
+from fastapi.responses import JSONResponse
+from pydantic import TypeAdapter
+from sqlalchemy import select, insert, update, delete
+from sqlalchemy.exc import IntegrityError
+from app.core.cache import TTLCache
+from app.core.config import settings
+from app.idempotency.models import IdempotencyKey
+
+# Idempotency-Key for mutations clients retry on timeouts (checkout, add to cart).
+# The first request with a key claims it with a row in idempotency_keys and runs, its response
+# is stored on the row in the same transaction as the route's writes (the route calls stage()
+# right before its commit), so a crash can't leave the order placed and the key still open.
+# Finished responses are also kept in a small in-memory cache in front of the table. Retries with
+# the same key get that response back (Idempotent-Replayed: true) without running the route again.
+# Duplicates arriving while the first one runs wait for it in this process and get a 409 from
+# other workers. Failed requests release the key, nothing was committed so a retry runs for real.
+# The key row is written through the request's own session, a second session would hold a second
+# pooled connection and requests could exhaust the pool waiting on each other.
+
+MAX_KEY_LENGTH = 255
+PURGE_EVERY = 1000 #claims between deletes of expired rows
+
+finished = TTLCache(maxsize=settings.IDEMPOTENCY_CACHE_MAX_SIZE, ttl=settings.IDEMPOTENCY_TTL_SECONDS) #"user:key" -> stored response
+in_flight = {} #"user:key" -> asyncio.Event set once the request holding the key is done
+claims = 0
+
+@lru_cache
+def response_adapter(response_model):
+    return TypeAdapter(response_model)
+
+async def request_fingerprint(request: Request):
+    body = await request.body() #already read (and cached) by FastAPI for the body parameter
+    return hashlib.sha256(f"{request.method} {request.url.path}\n".encode() + body).hexdigest()
+
+def replay(stored: dict, fingerprint: str):
+    if stored["fingerprint"] != fingerprint:
+        raise HTTPException(status_code=422, detail="Idempotency-Key was already used for a different request")
+    return JSONResponse(stored["body"], status_code=stored["status_code"], headers={"Idempotent-Replayed": "true"})
+
+async def claim(db, user_id: int, key: str, fingerprint: str):
+    """Takes the key for this request (returns None) or returns the response stored for it."""
+    global claims
+    for _ in range(2):
+        now = datetime.utcnow()
+        try:
+            await db.execute(insert(IdempotencyKey).values(
+                user_id=user_id, key=key, fingerprint=fingerprint, expires_at=now + timedelta(seconds=settings.IDEMPOTENCY_LOCK_SECONDS)
+            ))
+            claims += 1
+            if claims % PURGE_EVERY == 0:
+                await db.execute(delete(IdempotencyKey).filter(IdempotencyKey.expires_at < now))
+            await db.commit()
+            return None
+        except IntegrityError: #the key is taken, see by whom
+            await db.rollback()
+        row = (await db.execute(
+            select(IdempotencyKey.id, IdempotencyKey.fingerprint, IdempotencyKey.status_code, IdempotencyKey.response_body, IdempotencyKey.expires_at)
+            .filter_by(user_id=user_id, key=key)
+        )).first()
+        if row is None: #released in between, try again
+            continue
+        if row.expires_at <= now: #replay window over, or the request holding it died, the key is free again
+            await db.execute(delete(IdempotencyKey).filter_by(id=row.id, expires_at=row.expires_at))
+            await db.commit()
+            continue
+        if row.status_code is None:
+            break
+        return {"fingerprint": row.fingerprint, "status_code": row.status_code, "body": json.loads(row.response_body)}
+    raise HTTPException(status_code=409, detail="A request with this Idempotency-Key is still being processed")
+
+async def store_response(db, user_id: int, key: str, stored: dict):
+    # part of the handler's transaction, its commit finishes the key
+    await db.execute(
+        update(IdempotencyKey)
+        .filter_by(user_id=user_id, key=key)
+        .values(status_code=stored["status_code"], response_body=json.dumps(stored["body"]),
+                expires_at=datetime.utcnow() + timedelta(seconds=settings.IDEMPOTENCY_TTL_SECONDS))
+    )
+
+async def release(db, user_id: int, key: str):
+    await db.rollback() #whatever the failed handler left in the session is not committed
+    await db.execute(delete(IdempotencyKey).filter_by(user_id=user_id, key=key, status_code=None))
+    await db.commit()
+
+async def no_stage(result):
+    pass
+
+async def idempotent(request: Request, db, user_id: int, key: str | None, handler, response_model):
+    """Runs handler(stage) once per (user, Idempotency-Key), repeated keys get the first response back.
+
+    handler awaits stage(result) right before committing its writes and returns result.
+    """
+    if key is None:
+        return await handler(no_stage)
+    if not key or len(key) > MAX_KEY_LENGTH:
+        raise HTTPException(status_code=400, detail=f"Idempotency-Key must be 1 to {MAX_KEY_LENGTH} characters")
+    name = f"{user_id}:{key}"
+    fingerprint = await request_fingerprint(request)
+    while name in in_flight: #a duplicate is running in this process, wait for it rather than answer 409
+        await in_flight[name].wait()
+    stored = finished.get(name)
+    if stored is not None: #replayed from memory, not even the table is read
+        return replay(stored, fingerprint)
+
+    done = in_flight[name] = asyncio.Event() #no await since the checks above, so only one coroutine gets here per key
+    try:
+        stored = await claim(db, user_id, key, fingerprint)
+        if stored is not None:
+            finished.set(name, stored)
+            return replay(stored, fingerprint)
+        staged = {}
+
+        async def stage(result):
+            adapter = response_adapter(response_model)
+            staged.update(
+                fingerprint=fingerprint,
+                status_code=200,
+                body=adapter.dump_python(adapter.validate_python(result, from_attributes=True), mode="json"), #what response_model sends
+            )
+            await store_response(db, user_id, key, staged)
+
+        try:
+            await handler(stage)
+        except BaseException:
+            await release(db, user_id, key) #a no-op once the handler committed, its key is finished
+            raise
+        finished.set(name, staged)
+        return staged["body"] #the handler's commit may have expired result's ORM attributes
+    finally:
+        del in_flight[name]
+        done.set()
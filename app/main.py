@@ -1,36 +1,62 @@
-from fastapi import FastAPI,Request
-from app.core.database import Base,engine
-from app.auth.models import Base as AuthBase
-from app.products.models import Base as ProductBase
-from app.cart.models import Base as CartBase
-from app.orders.models import Base as OrderBase
-from app.core.logging_utils import logger
+from contextlib import asynccontextmanager
+from fastapi import FastAPI,Depends
+from fastapi.responses import PlainTextResponse
+from app.core.database import engine,async_engine,pool_stats,session_scope
+from app.core.config import settings
+from app.core.logging_utils import start_logging, stop_logging, logger
+from app.notifications.utils import stale_email_count
+from app.core.request_logging import RequestLoggingMiddleware
+from app.core.metrics import MetricsMiddleware, install_sql_hooks, metrics
+from app.core.rate_limit import RateLimitMiddleware
+from app.core.load_shedding import LoadSheddingMiddleware, loop_lag
 from app.core.error_handler import register_exception_handlers
+from app.auth.utils import shutdown_hash_executor, token_cache, user_cache
+from app.products.cache import catalog_cache
 
-from app.auth.routes import router as auth_routes
+from app.auth.routes import router as auth_routes, require_admin
 from app.products.routes import router as product_routes
 from app.cart.routes import router as cart_routes
 from app.checkout.routes import router as checkout_routes
 from app.orders.routes import router as order_routes
+from app.analytics.routes import router as analytics_routes
 
-app = FastAPI(title="E-Commerce Backend Python")
-
-# Create all tables for models
-AuthBase.metadata.create_all(bind=engine)
-ProductBase.metadata.create_all(bind=engine)
-CartBase.metadata.create_all(bind=engine)
-OrderBase.metadata.create_all(bind=engine)
-Base.metadata.create_all(bind=engine)
-
-# Log each API request (IP, method, path)
-@app.middleware("http")
-async def log_requests(request: Request, call_next):
-    client_ip = request.client.host #ip address
-    method = request.method #Http methods
-    path = request.url.path #request paths like (/auth,/order...etc)
-    logger.info(f"API Access - IP: {client_ip}, Method: {method}, Path: {path}")
-    response = await call_next(request)
-    return response
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # tables come from `alembic upgrade head`, boot only starts the background pieces
+    start_logging() #restarted when the app is served again after a shutdown (tests)
+    if settings.LOAD_SHED_LOOP_LAG_MS > 0:
+        loop_lag.start()
+    embedded_worker = settings.EMAIL_OUTBOX_WORKER == "embedded" #otherwise run python -m app.notifications.worker
+    if embedded_worker:
+        from app.notifications import worker #SMTP client is only loaded by processes that send
+        worker.start_embedded_worker()
+    else:
+        async with session_scope() as db:
+            stale = await stale_email_count(db)
+        if stale:
+            logger.warning(f"Email outbox - {stale} emails overdue and EMAIL_OUTBOX_WORKER=external, is python -m app.notifications.worker running?")
+    try:
+        yield
+    finally:
+        if embedded_worker:
+            await worker.stop_embedded_worker()
+        await loop_lag.stop()
+        shutdown_hash_executor()
+        stop_logging()
+
+app = FastAPI(title="E-Commerce Backend Python", lifespan=lifespan)
+
+# Rejections happen before the route, still inside logging and metrics (last added runs first)
+if settings.RATE_LIMIT_ENABLED:
+    app.add_middleware(RateLimitMiddleware)
+app.add_middleware(LoadSheddingMiddleware)
+# Log each API request (route, status, latency, user, request id)
+app.add_middleware(RequestLoggingMiddleware)
+if settings.METRICS_ENABLED:
+    app.add_middleware(MetricsMiddleware)
+    install_sql_hooks(engine)
+    if async_engine is not None:
+        install_sql_hooks(async_engine.sync_engine)
 
 register_exception_handlers(app)
 
@@ -40,7 +66,18 @@ app.include_router(product_routes)
 app.include_router(cart_routes)
 app.include_router(checkout_routes)
 app.include_router(order_routes)
+app.include_router(analytics_routes)
 
 @app.get("/")
 def read_root():
-    return {"message": "Welcome to the API!!"}
\ No newline at end of file
+    return {"message": "Welcome to the API!!"}
+
+@app.get("/admin/db-pool") #connection pool usage: checked out, overflow, checkout wait time
+async def db_pool_stats(admin=Depends(require_admin)):
+    return pool_stats()
+
+if settings.METRICS_ENABLED:
+    @app.get("/metrics", response_class=PlainTextResponse, include_in_schema=False) #prometheus scrape endpoint
+    async def prometheus_metrics():
+        caches = {"tokens": token_cache.stats(), "users": user_cache.stats(), "catalog": catalog_cache.stats()}
+        return PlainTextResponse(metrics.render(caches, pool_stats()), media_type="text/plain; version=0.0.4")
@@ -0,0 +1,16 @@
+from datetime import datetime, timedelta
+from sqlalchemy import func, select
+from app.notifications.models import EmailOutbox, EmailStatus
+
+STALE_AFTER = timedelta(minutes=10) #a running worker sends or leases due rows well before this
+
+def queue_email(db, kind: str, recipient: str, subject: str, body: str):
+    # only adds the row, it is committed or rolled back together with the caller's transaction
+    db.add(EmailOutbox(kind=kind, recipient=recipient, subject=subject, body=body))
+
+async def stale_email_count(db):
+    # pending emails that have been due for a while, nobody is draining the outbox if there are any
+    return await db.scalar(
+        select(func.count()).select_from(EmailOutbox)
+        .filter(EmailOutbox.status == EmailStatus.pending, EmailOutbox.next_attempt_at < datetime.utcnow() - STALE_AFTER)
+    )
@@ -0,0 +1,143 @@
+"""Drains the email outbox over pooled SMTP connections.
+
+Runs as its own process next to the API:
+
+    python -m app.notifications.worker          # poll forever
+    python -m app.notifications.worker --once   # send everything that is due, then exit
+
+or inside the API process (EMAIL_OUTBOX_WORKER=embedded, the default).
+"""
+import argparse
+import asyncio
+import random
+from datetime import datetime, timedelta
+import aiosmtplib
+from sqlalchemy import select, update
+from app.core.config import settings
+from app.core.database import session_scope
+from app.core.email_utils import SMTPPool, build_message
+from app.core.logging_utils import logger
+from app.core.metrics import metrics
+from app.notifications.models import EmailOutbox, EmailStatus
+
+LEASE = timedelta(minutes=5) #a claimed row comes back to the queue if its worker dies mid send
+MAX_BACKOFF_SECONDS = 3600
+
+def retry_delay(attempts: int):
+    delay = min(settings.EMAIL_RETRY_BASE_SECONDS * 2 ** (attempts - 1), MAX_BACKOFF_SECONDS)
+    return timedelta(seconds=delay * random.uniform(0.8, 1.2)) #jitter so a burst of failures doesn't retry in lockstep
+
+def is_permanent(exc: Exception):
+    # 5xx answers (unknown mailbox, rejected sender...) won't get better by retrying
+    return isinstance(exc, aiosmtplib.SMTPResponseException) and exc.code >= 500
+
+async def claim_batch(db):
+    now = datetime.utcnow()
+    rows = (await db.scalars(
+        select(EmailOutbox)
+        .filter(EmailOutbox.status == EmailStatus.pending, EmailOutbox.next_attempt_at <= now)
+        .order_by(EmailOutbox.next_attempt_at, EmailOutbox.id)
+        .limit(settings.EMAIL_OUTBOX_BATCH_SIZE)
+        .with_for_update(skip_locked=True) #concurrent workers on postgres take disjoint batches
+    )).all()
+    batch = [(row.id, row.recipient, row.subject, row.body, row.attempts) for row in rows] #plain values, commit expires the rows
+    if batch:
+        # SQLite has no SKIP LOCKED, so two workers can read the same due rows: the lease only
+        # goes to whoever still finds them due, the other one's update misses them and skips them
+        leased = await db.execute(
+            update(EmailOutbox)
+            .filter(EmailOutbox.id.in_([row[0] for row in batch]), EmailOutbox.status == EmailStatus.pending, EmailOutbox.next_attempt_at <= now)
+            .values(next_attempt_at=now + LEASE)
+            .returning(EmailOutbox.id)
+            .execution_options(synchronize_session=False)
+        )
+        leased_ids = {row.id for row in leased.all()}
+        batch = [row for row in batch if row[0] in leased_ids]
+    await db.commit()
+    return batch
+
+async def send_one(pool: SMTPPool, recipient: str, subject: str, body: str):
+    try:
+        await pool.send(build_message(subject, recipient, body))
+    except Exception as exc:
+        return exc
+    return None
+
+async def drain_batch(pool: SMTPPool):
+    """Sends one batch of due emails, returns how many were claimed."""
+    async with session_scope() as db:
+        batch = await claim_batch(db)
+        if not batch:
+            return 0
+        errors = await asyncio.gather(*(send_one(pool, recipient, subject, body) for _, recipient, subject, body, _ in batch))
+
+        now = datetime.utcnow()
+        sent_ids = [row[0] for row, error in zip(batch, errors) if error is None]
+        if sent_ids:
+            await db.execute(
+                update(EmailOutbox)
+                .filter(EmailOutbox.id.in_(sent_ids))
+                .values(status=EmailStatus.sent, sent_at=now, attempts=EmailOutbox.attempts + 1, last_error=None)
+            )
+        for (email_id, recipient, _, _, attempts), error in zip(batch, errors):
+            if error is None:
+                continue
+            attempts += 1
+            failed = is_permanent(error) or attempts >= settings.EMAIL_MAX_ATTEMPTS
+            await db.execute(
+                update(EmailOutbox)
+                .filter(EmailOutbox.id == email_id)
+                .values(
+                    status=EmailStatus.failed if failed else EmailStatus.pending,
+                    attempts=attempts,
+                    last_error=str(error)[:500],
+                    next_attempt_at=now + retry_delay(attempts),
+                )
+            )
+            metrics.record_email("failed" if failed else "retry")
+            logger.warning(f"Email {email_id} to {recipient} {'failed' if failed else 'will be retried'} (attempt {attempts}) - {error}")
+        await db.commit()
+        for _ in sent_ids:
+            metrics.record_email("sent")
+        logger.info(f"Email outbox - sent {len(sent_ids)} of {len(batch)}")
+        return len(batch)
+
+async def run(once: bool = False):
+    pool = SMTPPool()
+    try:
+        while True:
+            try:
+                claimed = await drain_batch(pool)
+            except Exception as exc: #a database hiccup must not kill the worker
+                logger.exception(f"Email outbox worker error - {exc}")
+                claimed = 0
+            if claimed:
+                continue #more may be due right away
+            if once:
+                return
+            await asyncio.sleep(settings.EMAIL_OUTBOX_POLL_SECONDS)
+    finally:
+        await pool.close()
+
+embedded_task = None
+
+def start_embedded_worker():
+    global embedded_task
+    if embedded_task is None:
+        embedded_task = asyncio.get_running_loop().create_task(run())
+
+async def stop_embedded_worker():
+    global embedded_task
+    if embedded_task is not None:
+        embedded_task.cancel()
+        try:
+            await embedded_task
+        except asyncio.CancelledError:
+            pass
+        embedded_task = None
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Send the emails queued in the outbox table")
+    parser.add_argument("--once", action="store_true", help="exit once nothing is due instead of polling")
+    args = parser.parse_args()
+    asyncio.run(run(once=args.once))
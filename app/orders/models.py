@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, ForeignKey, Float, Enum, DateTime
+from sqlalchemy import Column, Integer, String, ForeignKey, Float, Enum, DateTime, Index
 from sqlalchemy.orm import relationship
 from app.core.database import Base
 from datetime import datetime
@@ -11,6 +11,8 @@ class OrderStatus(str, enum.Enum):
 
 class Order(Base):
     __tablename__ = "orders"
+    # a user's history newest first, the (created_at, id) cursor and date filters seek on it
+    __table_args__ = (Index("ix_orders_user_id_created_at", "user_id", "created_at"),)
 
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"))
@@ -27,6 +29,18 @@ class OrderItem(Base):
     product_id = Column(Integer, ForeignKey("products.id",ondelete="SET NULL"),nullable=True)
     quantity = Column(Integer)
     price_at_purchase = Column(Float)
+    # copied from the product at checkout, history pages don't look products up and survive renames/deletes
+    product_name = Column(String, nullable=True)
+    product_image_url = Column(String, nullable=True)
 
     order = relationship("Order", back_populates="items")
     product = relationship("Product")
+
+class OrderSummary(Base):
+    __tablename__ = "order_summaries"
+
+    # one row per user, checkout adds to it in the same transaction as the order
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    order_count = Column(Integer, default=0, nullable=False)
+    total_spent = Column(Float, default=0, nullable=False)
+    last_order_at = Column(DateTime, nullable=True)
@@ -1,51 +1,57 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session, joinedload
-from app.core.database import SessionLocal
+from datetime import datetime
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
+from app.core.database import get_db
 from app.auth.routes import get_current_user
 from app.core.logging_utils import logger
 from app.orders import models, schemas
-from app.products.models import Product
+from app.orders.utils import history_query, next_order_cursor, stream_orders
+from app.core.streaming import streaming_json
 
 router = APIRouter(prefix="/orders", tags=["Orders"])
 
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-
-@router.get("/", response_model=list[schemas.OrderOut])
-def get_user_orders(db: Session = Depends(get_db), current_user=Depends(get_current_user)):
-    orders = db.query(models.Order)\
-        .options(joinedload(models.Order.items))\
-        .filter(models.Order.user_id == current_user.id)\
-        .order_by(models.Order.created_at.desc())\
-        .all()
-
-        # adding names to the item
-    for order in orders:
-        for item in order.items:
-            if item.product_id:
-               product = db.query(Product).filter(Product.id == item.product_id).first()
-               item.product_name = product.name if product else "Product not found!!!"
-            else:
-                item.product_name = "Product not found!!!"
-
+@router.get("/", response_model=list[schemas.OrderOut]) #newest first, page by page, next page cursor is in X-Next-Cursor
+async def get_user_orders(
+    response: Response,
+    db: AsyncSession = Depends(get_db),
+    current_user=Depends(get_current_user),
+    status: schemas.OrderStatus | None = None,
+    created_from: datetime | None = None, #inclusive
+    created_to: datetime | None = None, #exclusive
+    cursor: str | None = None,
+    page_size: int | None = Query(None, ge=1), #default 20, at most 100 unless streamed
+    stream: bool = False, #same body, written order by order instead of built in memory first
+):
+    if stream:
+        logger.info(f"Order history streamed by: {current_user.email}")
+        return streaming_json(stream_orders(db, history_query(current_user.id, status, created_from, created_to, cursor, page_size)))
+    page_size = page_size or 20
+    if page_size > 100:
+        raise HTTPException(status_code=400, detail="page_size above 100 requires stream=true")
+    # names and images are snapshotted on the items at checkout, no product lookups here
+    orders = (await db.scalars(history_query(current_user.id, status, created_from, created_to, cursor, page_size)\
+        .options(selectinload(models.Order.items)))).all()
+    cursor = next_order_cursor(orders, page_size)
+    if cursor:
+        response.headers["X-Next-Cursor"] = cursor
     logger.info(f"Order history viewed by: {current_user.email}")
     return orders
 
+@router.get("/summary", response_model=schemas.OrderSummaryOut) #kept up to date by checkout, no scan over the orders
+async def get_order_summary(db: AsyncSession = Depends(get_db), current_user=Depends(get_current_user)):
+    summary = await db.get(models.OrderSummary, current_user.id)
+    if not summary:
+        return {"order_count": 0, "total_spent": 0, "last_order_at": None}
+    return summary
+
 @router.get("/{order_id}", response_model=schemas.OrderOut)
-def get_order_detail(order_id: int, db: Session = Depends(get_db), current_user=Depends(get_current_user)):
-    order = db.query(models.Order)\
-        .options(joinedload(models.Order.items))\
-        .filter(models.Order.id == order_id, models.Order.user_id == current_user.id)\
-        .first()
+async def get_order_detail(order_id: int, db: AsyncSession = Depends(get_db), current_user=Depends(get_current_user)):
+    order = await db.scalar(select(models.Order)\
+        .options(selectinload(models.Order.items))\
+        .filter(models.Order.id == order_id, models.Order.user_id == current_user.id))
     if not order:
         raise HTTPException(status_code=404, detail="Order not found")
-
-    for item in order.items:
-            product = db.query(Product).filter(Product.id == item.product_id).first()
-            item.product_name = product.name if product else "Product not found!!!"
     logger.info(f"Order detail viewed - order_id: {order_id}, user: {current_user.email}")
     return order
@@ -1,4 +1,4 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, field_validator
 from typing import List, Optional
 from datetime import datetime
 from enum import Enum
@@ -13,9 +13,17 @@ class OrderItemBase(BaseModel):
     quantity: int
     price_at_purchase: float
 
+MISSING_PRODUCT_NAME = "Product not found!!!"
+
 class OrderItemOut(OrderItemBase):
     id: int
     product_name: str
+    product_image_url: Optional[str] = None
+
+    @field_validator("product_name", mode="before")
+    def default_product_name(cls, value): #rows older than the snapshot whose product was deleted before the backfill
+        return value or MISSING_PRODUCT_NAME
+
     class Config:
         from_attributes = True
         extra = "allow"
@@ -30,6 +38,14 @@ class OrderOut(BaseModel):
     class Config:
         from_attributes = True
 
+class OrderSummaryOut(BaseModel):
+    order_count: int
+    total_spent: float
+    last_order_at: Optional[datetime]
+
+    class Config:
+        from_attributes = True
+
 class PaymentMethod(str, Enum):
     cod = "COD",
     online = "Online"
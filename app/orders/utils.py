@@ -0,0 +1,94 @@
+import base64
+import binascii
+import json
+from datetime import datetime
+from fastapi import HTTPException
+from sqlalchemy import select, insert, update, tuple_
+from app.core.database import engine
+from app.core.streaming import STREAM_PARTITION_SIZE
+from app.orders.models import Order, OrderItem, OrderSummary
+from app.orders.schemas import MISSING_PRODUCT_NAME
+
+DIALECT = engine.dialect.name
+ORDER_COLUMNS = [Order.id, Order.total_amount, Order.status, Order.created_at]
+ITEM_COLUMNS = [OrderItem.order_id, OrderItem.product_id, OrderItem.quantity, OrderItem.price_at_purchase, OrderItem.id,
+                OrderItem.product_name, OrderItem.product_image_url]
+
+# history cursors are opaque to clients too: base64 of the (created_at, id) of the last order seen
+def encode_order_cursor(order):
+    raw = json.dumps([order.created_at.isoformat(), order.id]).encode()
+    return base64.urlsafe_b64encode(raw).decode()
+
+def decode_order_cursor(cursor: str):
+    try:
+        created_at, last_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return datetime.fromisoformat(created_at), int(last_id)
+    except (binascii.Error, ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+def history_query(user_id: int, status=None, created_from: datetime | None = None, created_to: datetime | None = None,
+                  cursor: str | None = None, page_size: int | None = None):
+    # newest first, every filter and the cursor seek on ix_orders_user_id_created_at
+    query = select(Order).filter(Order.user_id == user_id)
+    if status:
+        query = query.filter(Order.status == status)
+    if created_from:
+        query = query.filter(Order.created_at >= created_from)
+    if created_to:
+        query = query.filter(Order.created_at < created_to)
+    if cursor:
+        created_at, last_id = decode_order_cursor(cursor)
+        query = query.filter(tuple_(Order.created_at, Order.id) < tuple_(created_at, last_id))
+    return query.order_by(Order.created_at.desc(), Order.id.desc()).limit(page_size) #None (streamed history) means every order
+
+def next_order_cursor(orders, page_size: int):
+    if len(orders) < page_size:
+        return None
+    return encode_order_cursor(orders[-1])
+
+async def add_to_summary(db, user_id: int, total_amount: float, ordered_at: datetime):
+    # runs in the checkout transaction, so the summary can't drift from the orders table
+    if DIALECT in ("sqlite", "postgresql"):
+        if DIALECT == "sqlite":
+            from sqlalchemy.dialects.sqlite import insert as dialect_insert
+        else:
+            from sqlalchemy.dialects.postgresql import insert as dialect_insert
+        statement = dialect_insert(OrderSummary).values(user_id=user_id, order_count=1, total_spent=total_amount, last_order_at=ordered_at)
+        statement = statement.on_conflict_do_update(
+            index_elements=[OrderSummary.user_id],
+            set_={
+                "order_count": OrderSummary.order_count + 1,
+                "total_spent": OrderSummary.total_spent + statement.excluded.total_spent,
+                "last_order_at": statement.excluded.last_order_at,
+            },
+        )
+        await db.execute(statement)
+        return
+    updated = await db.execute(
+        update(OrderSummary)
+        .filter(OrderSummary.user_id == user_id)
+        .values(order_count=OrderSummary.order_count + 1, total_spent=OrderSummary.total_spent + total_amount, last_order_at=ordered_at)
+    )
+    if not updated.rowcount:
+        await db.execute(insert(OrderSummary).values(user_id=user_id, order_count=1, total_spent=total_amount, last_order_at=ordered_at))
+
+async def stream_orders(db, query):
+    # OrderOut shaped dicts, one list per partition of orders; the items of a partition
+    # come from one query, like selectinload would, names are the checkout snapshot.
+    # db is the request's session, it stays open until the body is sent
+    query = query.with_only_columns(*ORDER_COLUMNS).execution_options(yield_per=STREAM_PARTITION_SIZE)
+    result = await db.stream(query)
+    async for rows in result.partitions(STREAM_PARTITION_SIZE):
+        orders = {row.id: {**row._asdict(), "items": []} for row in rows}
+        items = (await db.execute(select(*ITEM_COLUMNS).filter(OrderItem.order_id.in_(orders)).order_by(OrderItem.id))).all()
+        for item in items:
+            order_id, product_id, quantity, price_at_purchase, item_id, product_name, product_image_url = item
+            orders[order_id]["items"].append({
+                "product_id": product_id,
+                "quantity": quantity,
+                "price_at_purchase": price_at_purchase,
+                "id": item_id,
+                "product_name": product_name or MISSING_PRODUCT_NAME,
+                "product_image_url": product_image_url,
+            })
+        yield list(orders.values())
@@ -0,0 +1,172 @@
+import csv
+import io
+import json
+import orjson
+from pydantic import ValidationError
+from sqlalchemy import bindparam, insert, select, text, update
+from app.products.models import Product
+from app.products.schemas import ProductImport
+from app.products.search import DIALECT, sync_search_index
+from app.products.cache import invalidate_products
+from app.products.facets import refresh_facets
+from app.products.utils import stream_products
+
+# Bulk catalog import/export. Uploads are parsed line by line as they arrive and written
+# in chunks (one executemany / INSERT .. ON CONFLICT per chunk, one commit per chunk),
+# exports stream rows from a server side cursor (utils.stream_products).
+
+IMPORT_CHUNK_SIZE = 1000
+MAX_REPORTED_ERRORS = 1000
+COLUMNS = ["id", "name", "description", "price", "stock", "category", "image_url"]
+
+products = Product.__table__
+
+async def read_lines(chunks):
+    # bytes chunks from the request body -> decoded lines, nothing but the current partial line is buffered
+    pending = b""
+    async for chunk in chunks:
+        pending += chunk
+        *lines, pending = pending.split(b"\n")
+        for line in lines:
+            yield line.decode("utf-8").rstrip("\r")
+    if pending:
+        yield pending.decode("utf-8").rstrip("\r")
+
+async def ndjson_records(lines):
+    number = 0
+    async for line in lines:
+        number += 1
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError as exc:
+            yield number, None, f"Invalid JSON - {exc}"
+            continue
+        if not isinstance(record, dict):
+            yield number, None, "Expected a JSON object"
+            continue
+        yield number, record, None
+
+async def csv_records(lines):
+    header = None
+    number = 0
+    record_lines = []
+    quotes = 0
+    async for line in lines:
+        number += 1
+        record_lines.append(line)
+        quotes += line.count('"')
+        if quotes % 2: #odd quote count: a quoted field continues on the next line
+            continue
+        values = next(csv.reader(["\n".join(record_lines)]), [])
+        record_lines = []
+        quotes = 0
+        if header is None:
+            header = [name.strip() for name in values]
+            continue
+        if not any(values):
+            continue
+        # empty cells mean "not given", so optional columns fall back to their defaults
+        yield number, {name: value for name, value in zip(header, values) if value != ""}, None
+    if record_lines:
+        yield number, None, "Unterminated quoted field"
+
+async def upsert_chunk(db, rows):
+    """Writes one chunk of validated rows, returns (created, upserted, product ids touched)."""
+    new_rows = [row for row in rows if row.get("id") is None]
+    keyed_rows = [row for row in rows if row.get("id") is not None]
+    ids = []
+    categories = {row["category"] for row in rows}
+    if keyed_rows: #an upsert can move a product out of its old category, that facet changes too
+        categories.update((await db.scalars(
+            select(products.c.category).distinct().filter(products.c.id.in_([row["id"] for row in keyed_rows]))
+        )).all())
+    if new_rows:
+        for row in new_rows:
+            row.pop("id", None)
+        result = await db.execute(insert(products).returning(products.c.id), new_rows)
+        ids += result.scalars().all()
+    if keyed_rows:
+        ids += [row["id"] for row in keyed_rows]
+        if DIALECT in ("sqlite", "postgresql"):
+            if DIALECT == "sqlite":
+                from sqlalchemy.dialects.sqlite import insert as dialect_insert
+            else:
+                from sqlalchemy.dialects.postgresql import insert as dialect_insert
+            statement = dialect_insert(products)
+            statement = statement.on_conflict_do_update(
+                index_elements=[products.c.id],
+                set_={
+                    **{name: statement.excluded[name] for name in COLUMNS if name != "id"},
+                    "version": products.c.version + 1, #onupdate defaults don't apply to ON CONFLICT DO UPDATE
+                    "updated_at": statement.excluded.updated_at,
+                },
+            )
+            await db.execute(statement, keyed_rows)
+        else:
+            existing = set((await db.scalars(select(products.c.id).filter(products.c.id.in_([row["id"] for row in keyed_rows])))).all())
+            updates = [{"b_id": row["id"], **{k: v for k, v in row.items() if k != "id"}} for row in keyed_rows if row["id"] in existing]
+            if updates:
+                await db.execute(update(products).where(products.c.id == bindparam("b_id")), updates)
+            inserts = [row for row in keyed_rows if row["id"] not in existing]
+            if inserts:
+                await db.execute(insert(products), inserts)
+    await sync_search_index(db, ids)
+    await refresh_facets(db, categories)
+    await db.commit()
+    await invalidate_products(ids)
+    return len(new_rows), len(keyed_rows), ids
+
+async def import_products(db, chunks, content_type: str):
+    records = csv_records(read_lines(chunks)) if "csv" in content_type else ndjson_records(read_lines(chunks))
+    report = {"rows": 0, "created": 0, "upserted": 0, "failed": 0, "errors": []}
+    batch = []
+    explicit_ids = False
+
+    def reject(number, message):
+        report["failed"] += 1
+        if len(report["errors"]) < MAX_REPORTED_ERRORS:
+            report["errors"].append({"row": number, "error": message})
+
+    async def flush():
+        created, upserted, _ = await upsert_chunk(db, batch)
+        report["created"] += created
+        report["upserted"] += upserted
+        batch.clear()
+
+    async for number, record, error in records:
+        report["rows"] += 1
+        if error:
+            reject(number, error)
+            continue
+        try:
+            product = ProductImport.model_validate(record)
+        except ValidationError as exc:
+            reject(number, "; ".join(f"{'.'.join(map(str, e['loc']))}: {e['msg']}" for e in exc.errors()))
+            continue
+        row = product.model_dump()
+        explicit_ids = explicit_ids or row["id"] is not None
+        batch.append(row)
+        if len(batch) >= IMPORT_CHUNK_SIZE:
+            await flush()
+    if batch:
+        await flush()
+    if explicit_ids and DIALECT == "postgresql": #explicit ids bypass the sequence, move it past them
+        await db.execute(text("SELECT setval(pg_get_serial_sequence('products', 'id'), (SELECT max(id) FROM products))"))
+        await db.commit()
+    return report
+
+def export_csv(rows, header=False):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    if header:
+        writer.writerow(COLUMNS)
+    writer.writerows(row.values() for row in rows)
+    return buffer.getvalue()
+
+async def export_products(db, fmt: str):
+    if fmt == "csv":
+        yield export_csv([], header=True)
+    async for rows in stream_products(db, select(Product).order_by(Product.id)):
+        yield export_csv(rows) if fmt == "csv" else b"".join(orjson.dumps(row) + b"\n" for row in rows)
@@ -0,0 +1,87 @@
+import uuid
+from app.core import queries
+from app.core.cache import create_cache_backend
+from app.core.config import settings
+from app.products import schemas
+from app.products.models import Product
+
+# Read-through cache for catalog reads.
+# product:{id} holds one ProductOut dict (plus version/updated_at) and is deleted whenever that product changes.
+# Listing pages are keyed by a catalog version token, any product write swaps the token so
+# every cached page becomes unreachable at once and simply ages out.
+# Stock in cached entries is for display only, cart and checkout always validate against the DB.
+
+catalog_cache = create_cache_backend(maxsize=settings.CATALOG_CACHE_MAX_SIZE, ttl=settings.CATALOG_CACHE_TTL_SECONDS)
+
+VERSION_KEY = "catalog:version"
+VERSION_TTL = 24 * 3600
+
+def serialize_product(product: Product):
+    return schemas.ProductOut.model_validate(product, from_attributes=True).model_dump()
+
+def cache_entry(product: Product):
+    # product:{id} entries also carry the validators for conditional GETs, response_model drops them
+    updated_at = product.updated_at.isoformat() if product.updated_at else None
+    return {**serialize_product(product), "version": product.version, "updated_at": updated_at}
+
+async def get_product(db, product_id: int):
+    cached = await catalog_cache.get(f"product:{product_id}")
+    if cached is not None:
+        return cached
+    product = await db.scalar(queries.PRODUCT_BY_ID, {"product_id": product_id})
+    if product is None:
+        return None
+    data = cache_entry(product)
+    await catalog_cache.set(f"product:{product_id}", data)
+    return data
+
+async def get_products(db, product_ids):
+    # cached multi-get, the misses are loaded with one IN query
+    ids = {product_id for product_id in product_ids if product_id is not None}
+    found = {}
+    for product_id in ids:
+        cached = await catalog_cache.get(f"product:{product_id}")
+        if cached is not None:
+            found[product_id] = cached
+    missing = ids - found.keys()
+    if missing:
+        for product in (await db.scalars(queries.PRODUCTS_BY_IDS, {"product_ids": list(missing)})).all():
+            found[product.id] = cache_entry(product)
+            await catalog_cache.set(f"product:{product.id}", found[product.id])
+    return found
+
+async def catalog_version():
+    version = await catalog_cache.get(VERSION_KEY)
+    if version is None: #first use or the token was evicted, a fresh random token can't collide with old pages
+        version = uuid.uuid4().hex
+        await catalog_cache.set(VERSION_KEY, version, ttl=VERSION_TTL)
+    return version
+
+async def get_listing(params: tuple, loader):
+    # loader() runs the real query and returns a JSON-able page, cached under the current catalog version
+    key = f"listing:{await catalog_version()}:" + ":".join(str(param) for param in params)
+    cached = await catalog_cache.get(key)
+    if cached is not None:
+        return cached
+    page = await loader()
+    await catalog_cache.set(key, page)
+    return page
+
+async def invalidate_products(product_ids):
+    # admin writes: drop the exact product entries and retire every cached listing page
+    await catalog_cache.delete(*(f"product:{product_id}" for product_id in product_ids))
+    await catalog_cache.set(VERSION_KEY, uuid.uuid4().hex, ttl=VERSION_TTL)
+
+async def forget_stock(product_ids):
+    # checkout only moves stock, refresh the detail entries and let listings catch up within the TTL
+    await catalog_cache.delete(*(f"product:{product_id}" for product_id in product_ids))
+
+async def get_facets(loader):
+    # under the catalog version like listing pages: admin writes retire it, checkout stock moves catch up within the TTL
+    key = f"facets:{await catalog_version()}"
+    cached = await catalog_cache.get(key)
+    if cached is not None:
+        return cached
+    facets = await loader()
+    await catalog_cache.set(key, facets)
+    return facets
@@ -0,0 +1,75 @@
+from datetime import datetime
+from sqlalchemy import case, delete, func, insert, select, update
+from app.products.models import Product, CategoryFacet
+from app.products.search import DIALECT
+
+# Precomputed catalog facets: per category the product count, how many are in stock and
+# the price range. Every write that changes them refreshes the touched categories inside its
+# own transaction, so GET /products/facets reads a handful of rows instead of scanning the catalog.
+# Min/max can't be maintained by deltas (deleting the cheapest product needs the next one),
+# so admin writes re-aggregate just their categories (ix_products_category_price covers it);
+# checkout only ever takes stock, which moves in_stock_count and nothing else.
+
+facets = CategoryFacet.__table__
+
+def facet_query():
+    # products without a category can't be filtered on, they get no facet
+    return (
+        select(
+            Product.category,
+            func.count().label("product_count"),
+            func.coalesce(func.sum(case((Product.stock > 0, 1), else_=0)), 0).label("in_stock_count"),
+            func.min(Product.price).label("min_price"),
+            func.max(Product.price).label("max_price"),
+        )
+        .filter(Product.category.isnot(None))
+        .group_by(Product.category)
+    )
+
+async def refresh_facets(db, categories):
+    """Re-aggregates the given categories from products, call it before the commit of the write that touched them."""
+    categories = {category for category in categories if category is not None}
+    if not categories:
+        return
+    await db.flush() #the products table has to reflect this transaction's changes first
+    now = datetime.utcnow()
+    rows = [{**row._asdict(), "updated_at": now}
+            for row in (await db.execute(facet_query().filter(Product.category.in_(categories)))).all()]
+    emptied = categories - {row["category"] for row in rows}
+    if emptied:
+        await db.execute(delete(facets).filter(facets.c.category.in_(emptied)))
+    if not rows:
+        return
+    if DIALECT in ("sqlite", "postgresql"):
+        if DIALECT == "sqlite":
+            from sqlalchemy.dialects.sqlite import insert as dialect_insert
+        else:
+            from sqlalchemy.dialects.postgresql import insert as dialect_insert
+        statement = dialect_insert(facets)
+        statement = statement.on_conflict_do_update(
+            index_elements=[facets.c.category],
+            set_={name: statement.excluded[name] for name in ("product_count", "in_stock_count", "min_price", "max_price", "updated_at")},
+        )
+        await db.execute(statement, rows)
+        return
+    await db.execute(delete(facets).filter(facets.c.category.in_([row["category"] for row in rows])))
+    await db.execute(insert(facets), rows)
+
+async def sold_out(db, categories):
+    # checkout: one entry per product its stock update took to 0
+    counts = {}
+    for category in categories:
+        if category is not None:
+            counts[category] = counts.get(category, 0) + 1
+    if counts:
+        await db.execute(
+            update(facets)
+            .filter(facets.c.category.in_(counts))
+            .values(in_stock_count=facets.c.in_stock_count - case(counts, value=facets.c.category), updated_at=datetime.utcnow())
+        )
+
+async def load_facets(db):
+    return [row._asdict() for row in (await db.execute(
+        select(facets.c.category, facets.c.product_count, facets.c.in_stock_count, facets.c.min_price, facets.c.max_price)
+        .order_by(facets.c.category)
+    )).all()]
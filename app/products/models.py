@@ -1,5 +1,6 @@
-from sqlalchemy import Column, Integer, String, Float
+from sqlalchemy import Column, Integer, String, Float, DateTime, Index, text
 from app.core.database import Base
+from datetime import datetime
 
 class Product(Base):
     __tablename__ = "products"
@@ -11,3 +12,23 @@ class Product(Base):
     stock = Column(Integer, default=0)
     category = Column(String)
     image_url = Column(String)
+    # bumped by every UPDATE (ORM or Core, checkout's stock update included), ETags are built from it
+    version = Column(Integer, nullable=False, default=1, server_default="1", onupdate=text("version + 1"))
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow) #Last-Modified
+
+    __table_args__ = (
+        Index("ix_products_price_id", "price", "id"), #keyset pagination when sorting by price
+        Index("ix_products_name_id", "name", "id"), #keyset pagination when sorting by name
+        Index("ix_products_category_price", "category", "price"), #category filter + price range
+    )
+
+class CategoryFacet(Base):
+    # one row per category, kept current by every write that moves products or stock (app/products/facets.py)
+    __tablename__ = "category_facets"
+
+    category = Column(String, primary_key=True)
+    product_count = Column(Integer, nullable=False, default=0)
+    in_stock_count = Column(Integer, nullable=False, default=0)
+    min_price = Column(Float)
+    max_price = Column(Float)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
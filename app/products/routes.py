@@ -1,99 +1,204 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy.orm import Session
+from datetime import datetime
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from fastapi.responses import StreamingResponse
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from app.auth.models import User,UserRole
-from app.core.database import SessionLocal
+from app.core.database import get_db
 from app.products import models, schemas
-from app.cart.models import CartItem
+from app.products.utils import PRODUCT_COLUMNS, paginate, next_cursor, stream_products
+from app.core.streaming import streaming_json
+from app.core.http_cache import conditional, rows_etag, weak_etag
+from app.products.search import search_statement, sync_search_index
+from app.products.bulk import import_products, export_products
+from app.products.cache import catalog_cache, get_product, get_listing, get_facets, invalidate_products, serialize_product
+from app.products.facets import refresh_facets, load_facets
+from app.cart.store import cart_store
 from app.core.logging_utils import logger
 from app.auth.routes import get_current_user, require_admin
 
 router = APIRouter(tags=["Products"])
 
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-
-def require_admin(user: User = Depends(get_current_user)):
+async def require_admin(user: User = Depends(get_current_user)):
     if user.role != UserRole.admin:
         raise HTTPException(status_code=403, detail="Admin access required")
     return user
 
 @router.post("/admin/products", response_model=schemas.ProductOut) #creation of new product by admin
-def create_product(product: schemas.ProductCreate, db: Session = Depends(get_db), admin=Depends(require_admin)):
+async def create_product(product: schemas.ProductCreate, db: AsyncSession = Depends(get_db), admin=Depends(require_admin)):
     db_product = models.Product(**product.dict())
     db.add(db_product)
-    db.commit()
-    db.refresh(db_product)
+    await db.flush()
+    await sync_search_index(db, [db_product.id])
+    await refresh_facets(db, [db_product.category])
+    await db.commit()
+    await db.refresh(db_product)
+    await invalidate_products([db_product.id])
     logger.info(f"Product created: {product.name} by Admin")
     return db_product
 
-@router.get("/admin/products", response_model=list[schemas.ProductOut]) #fetch all the products
-def list_all_products_admin(db: Session = Depends(get_db), admin=Depends(require_admin)):
-    return db.query(models.Product).all()
+@router.get("/admin/products", response_model=list[schemas.ProductOut]) #fetch the products page by page, next page cursor is in X-Next-Cursor
+async def list_all_products_admin(
+    response: Response,
+    db: AsyncSession = Depends(get_db),
+    admin=Depends(require_admin),
+    sort_by: str = Query("id", enum=["id", "price", "name"]),
+    cursor: str | None = None,
+    page: int = Query(1, ge=1),
+    page_size: int | None = Query(None, ge=1), #default 100, at most 1000 unless streamed
+    stream: bool = False, #stream rows as they are read, every row after the cursor when no page_size is given
+):
+    if stream:
+        query = paginate(select(models.Product), sort_by, page_size, cursor, page if page_size else 1)
+        return streaming_json(stream_products(db, query))
+    page_size = page_size or 100
+    if page_size > 1000:
+        raise HTTPException(status_code=400, detail="page_size above 1000 requires stream=true")
+    products = (await db.scalars(paginate(select(models.Product), sort_by, page_size, cursor, page))).all()
+    cursor = next_cursor(products, sort_by, page_size)
+    if cursor:
+        response.headers["X-Next-Cursor"] = cursor
+    return products
+
+@router.post("/admin/products/import") #bulk upsert from an NDJSON (default) or CSV (Content-Type: text/csv) body, one product per line
+async def import_products_admin(request: Request, db: AsyncSession = Depends(get_db), admin=Depends(require_admin)):
+    report = await import_products(db, request.stream(), request.headers.get("content-type", ""))
+    logger.info(f"Product import by {admin.email} - {report['created']} created, {report['upserted']} upserted, {report['failed']} failed")
+    return report
+
+@router.get("/admin/products/export") #whole catalog streamed as NDJSON or CSV
+async def export_products_admin(format: str = Query("ndjson", enum=["ndjson", "csv"]), db: AsyncSession = Depends(get_db), admin=Depends(require_admin)):
+    media_type = "text/csv" if format == "csv" else "application/x-ndjson"
+    return StreamingResponse(export_products(db, format), media_type=media_type,
+                             headers={"Content-Disposition": f"attachment; filename=products.{format}"})
+
+@router.get("/admin/cache-stats") #hit/miss/eviction counters of the catalog cache
+async def catalog_cache_stats(admin=Depends(require_admin)):
+    return {"catalog": catalog_cache.stats()}
 
 @router.get("/admin/products/{id}", response_model=schemas.ProductOut) #get the product by it's id for admin only
-def get_product_admin(id: int, db: Session = Depends(get_db), admin=Depends(require_admin)):
-    product = db.query(models.Product).filter(models.Product.id == id).first()
+async def get_product_admin(id: int, db: AsyncSession = Depends(get_db), admin=Depends(require_admin)):
+    product = await db.get(models.Product, id)
     if not product:
         raise HTTPException(status_code=404, detail="Product not found")
     return product
 
 @router.put("/admin/products/{id}", response_model=schemas.ProductOut)
-def update_product(id: int, data: schemas.ProductUpdate, db: Session = Depends(get_db), admin=Depends(require_admin)):
-    product = db.query(models.Product).filter(models.Product.id == id).first()
+async def update_product(id: int, data: schemas.ProductUpdate, db: AsyncSession = Depends(get_db), admin=Depends(require_admin)):
+    product = await db.get(models.Product, id)
     if not product:
         raise HTTPException(status_code=404, detail="Product not found")
+    old_category = product.category
     for key, value in data.dict().items():
         setattr(product, key, value)
-    db.commit()
-    db.refresh(product)
+    await sync_search_index(db, [id])
+    await refresh_facets(db, [old_category, product.category]) #a product moving category changes both
+    await db.commit()
+    await db.refresh(product)
+    await invalidate_products([id])
     logger.info(f"{product.name} updated: ID {id}")
     return product
 
 @router.delete("/admin/products/{id}")
-def delete_product(id: int, db: Session = Depends(get_db), admin=Depends(require_admin)):
-    product = db.query(models.Product).filter(models.Product.id == id).first()
+async def delete_product(id: int, db: AsyncSession = Depends(get_db), admin=Depends(require_admin)):
+    product = await db.get(models.Product, id)
     if not product:
         raise HTTPException(status_code=404, detail="Product not found")
 
-    db.query(CartItem).filter(CartItem.product_id == id).delete() # delete the product from all the carts
+    await cart_store.remove_product(db, id) # delete the product from all the carts
 
-    db.delete(product) #delete the product from database
-    db.commit()
+    category = product.category
+    await db.delete(product) #delete the product from database
+    await sync_search_index(db, [id])
+    await refresh_facets(db, [category])
+    await db.commit()
+    await invalidate_products([id])
     logger.info(f"Cart delete - user: {admin.email}, product_id: {id}")
     return {"message": f"{product.name} deleted from all carts."}
 
 #Public routes or User routes
-@router.get("/products", response_model=list[schemas.ProductOut])
-def public_product_listing(
-    db: Session = Depends(get_db), #parameters to list the products
+@router.get("/products", response_model=list[schemas.ProductOut]) #ETag + Cache-Control, If-None-Match gets a 304 when the page hasn't changed
+async def public_product_listing(
+    request: Request,
+    response: Response,
+    db: AsyncSession = Depends(get_db), #parameters to list the products
     category: str | None = None,
     min_price: float = 0,
     max_price: float = 1e6,
     sort_by: str = Query("price", enum=["price", "name"]),
-    page: int = 1,
-    page_size: int = 10,
+    cursor: str | None = None, #keyset paging, take it from the X-Next-Cursor header of the previous page
+    page: int = Query(1, ge=1), #offset paging, ignored when a cursor is given
+    page_size: int = Query(10, ge=1, le=1000),
 ):
-    query = db.query(models.Product).filter(models.Product.price >= min_price, models.Product.price <= max_price)
-    if category:
-        query = query.filter(models.Product.category == category)
-    if sort_by == "price":
-        query = query.order_by(models.Product.price)
-    elif sort_by == "name":
-        query = query.order_by(models.Product.name)
-    products = query.offset((page - 1) * page_size).limit(page_size).all()
-    return products
+    async def load_page():
+        query = select(models.Product).filter(models.Product.price >= min_price, models.Product.price <= max_price)
+        if category:
+            query = query.filter(models.Product.category == category)
+        products = (await db.scalars(paginate(query, sort_by, page_size, cursor, page))).all()
+        return {
+            "items": [serialize_product(product) for product in products],
+            "next_cursor": next_cursor(products, sort_by, page_size),
+            "etag": rows_etag((product.id, product.version, product.updated_at) for product in products), #cached with the page
+        }
+
+    listing = await get_listing((category, min_price, max_price, sort_by, cursor, page, page_size), load_page)
+    extra = {"X-Next-Cursor": listing["next_cursor"]} if listing["next_cursor"] else None
+    unchanged = conditional(request, response, listing["etag"], extra=extra)
+    if unchanged:
+        return unchanged
+    return listing["items"]
+
+@router.get("/products/search", response_model=list[schemas.ProductOut]) #ranked full text search over name, description and category
+async def search_products(
+    request: Request,
+    response: Response,
+    keyword: str,
+    db: AsyncSession = Depends(get_db),
+    category: str | None = None,
+    min_price: float = 0,
+    max_price: float = 1e6,
+    page: int = Query(1, ge=1),
+    page_size: int | None = Query(None, ge=1), #default 20, at most 100 unless streamed
+    stream: bool = False, #stream every match (or page_size of them) as it is read
+):
+    query = search_statement(keyword, category, min_price, max_price)
+    if query is None: #nothing searchable in the keyword
+        return []
+    if stream:
+        if page_size:
+            query = query.offset((page - 1) * page_size).limit(page_size)
+        return streaming_json(stream_products(db, query))
+    page_size = page_size or 20
+    if page_size > 100:
+        raise HTTPException(status_code=400, detail="page_size above 100 requires stream=true")
+    # plain rows: the ETag comes from their versions and a 304 skips building ProductOut altogether
+    query = query.with_only_columns(*PRODUCT_COLUMNS, models.Product.version, models.Product.updated_at)
+    rows = (await db.execute(query.offset((page - 1) * page_size).limit(page_size))).all()
+    unchanged = conditional(request, response, rows_etag((row.id, row.version, row.updated_at) for row in rows))
+    if unchanged:
+        return unchanged
+    return [row._asdict() for row in rows]
+
+@router.get("/products/facets", response_model=list[schemas.CategoryFacetOut]) #categories with product count, in stock count and price range
+async def catalog_facets(request: Request, response: Response, db: AsyncSession = Depends(get_db)):
+    async def load():
+        rows = await load_facets(db)
+        etag = weak_etag(*(f"{row['category']}.{row['product_count']}.{row['in_stock_count']}.{row['min_price']}.{row['max_price']}" for row in rows))
+        return {"items": rows, "etag": etag}
 
-@router.get("/products/search", response_model=list[schemas.ProductOut])
-def search_products(keyword: str, db: Session = Depends(get_db)):
-    return db.query(models.Product).filter(models.Product.name.ilike(f"%{keyword}%")).all()
+    facets = await get_facets(load)
+    unchanged = conditional(request, response, facets["etag"])
+    if unchanged:
+        return unchanged
+    return facets["items"]
 
-@router.get("/products/{id}", response_model=schemas.ProductOut)
-def get_product_details(id: int, db: Session = Depends(get_db)):
-    product = db.query(models.Product).filter(models.Product.id == id).first()
+@router.get("/products/{id}", response_model=schemas.ProductOut) #ETag + Last-Modified, conditional requests get a 304
+async def get_product_details(id: int, request: Request, response: Response, db: AsyncSession = Depends(get_db)):
+    product = await get_product(db, id)
     if not product:
         raise HTTPException(status_code=404, detail="Product not found")
+    updated_at = datetime.fromisoformat(product["updated_at"]) if product["updated_at"] else None
+    unchanged = conditional(request, response, rows_etag([(product["id"], product["version"], updated_at)]), updated_at)
+    if unchanged:
+        return unchanged
     return product
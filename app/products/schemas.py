@@ -11,6 +11,9 @@ class ProductBase(BaseModel):
 class ProductCreate(ProductBase):
     pass
 
+class ProductImport(ProductCreate):
+    id: int | None = None #rows with an id update that product (or create it with that id)
+
 class ProductUpdate(ProductBase):
     pass
 
@@ -19,3 +22,10 @@ class ProductOut(ProductBase):
 
     class Config:
         orm_mode = True
+
+class CategoryFacetOut(BaseModel):
+    category: str
+    product_count: int
+    in_stock_count: int
+    min_price: float | None = None
+    max_price: float | None = None
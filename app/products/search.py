@@ -0,0 +1,63 @@
+import re
+from sqlalchemy import Column, Integer, MetaData, String, Table, delete, func, insert, literal_column, select
+from app.core.database import engine
+from app.products.models import Product
+
+# Full text index over name, description and category.
+# SQLite: an FTS5 table keyed by product id, kept in sync by the admin product routes.
+# Postgres: a generated tsvector column with a GIN index, maintained by the database itself.
+# Anything else falls back to a bounded ILIKE on the name.
+
+FTS_TABLE = "products_fts"
+DIALECT = engine.dialect.name
+
+# not part of Base.metadata, the virtual table is created by the migrations
+products_fts = Table(
+    FTS_TABLE, MetaData(),
+    Column("rowid", Integer, primary_key=True),
+    Column("name", String),
+    Column("description", String),
+    Column("category", String),
+)
+
+SEARCH_WEIGHTS = (10.0, 2.0, 1.0) #bm25 weights for name, description, category
+
+def search_terms(keyword: str):
+    # only word characters survive, so user input can never inject MATCH / tsquery syntax
+    return re.findall(r"\w+", keyword.lower())[:10]
+
+def search_statement(keyword: str, category: str | None, min_price: float, max_price: float):
+    terms = search_terms(keyword)
+    if not terms:
+        return None
+    if DIALECT == "sqlite":
+        match = " ".join(f'"{term}"*' for term in terms) #every term, each as a prefix
+        query = select(Product)\
+            .join(products_fts, products_fts.c.rowid == Product.id)\
+            .filter(literal_column(FTS_TABLE).op("MATCH")(match))\
+            .order_by(func.bm25(literal_column(FTS_TABLE), *SEARCH_WEIGHTS), Product.id)
+    elif DIALECT == "postgresql":
+        tsquery = func.to_tsquery("simple", " & ".join(f"{term}:*" for term in terms))
+        vector = literal_column("products.search_vector")
+        query = select(Product)\
+            .filter(vector.op("@@")(tsquery))\
+            .order_by(func.ts_rank(vector, tsquery).desc(), Product.id)
+    else:
+        query = select(Product).filter(Product.name.ilike(f"%{keyword}%")).order_by(Product.id)
+    query = query.filter(Product.price >= min_price, Product.price <= max_price)
+    if category:
+        query = query.filter(Product.category == category)
+    return query
+
+async def sync_search_index(db, product_ids):
+    # re-copy the given products into the FTS table, rows whose product is gone are simply dropped
+    if DIALECT != "sqlite" or not product_ids:
+        return
+    ids = list(product_ids)
+    await db.flush() #the products table has to reflect this transaction's changes first
+    await db.execute(delete(products_fts).filter(products_fts.c.rowid.in_(ids)))
+    await db.execute(insert(products_fts).from_select(
+        ["rowid", "name", "description", "category"],
+        select(Product.id, Product.name, func.coalesce(Product.description, ""), func.coalesce(Product.category, ""))
+        .filter(Product.id.in_(ids)),
+    ))
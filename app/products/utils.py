@@ -0,0 +1,62 @@
+import base64
+import binascii
+import json
+from fastapi import HTTPException
+from sqlalchemy import tuple_
+from app.core import queries
+from app.core.streaming import STREAM_PARTITION_SIZE
+from app.products.models import Product
+
+SORT_COLUMNS = {"id": Product.id, "price": Product.price, "name": Product.name}
+PRODUCT_COLUMNS = [Product.id, Product.name, Product.description, Product.price, Product.stock, Product.category, Product.image_url]
+
+async def load_products(db, product_ids):
+    # one IN query for every product a cart/order needs instead of a lookup per line item
+    ids = {product_id for product_id in product_ids if product_id is not None}
+    if not ids:
+        return {}
+    products = (await db.scalars(queries.PRODUCTS_BY_IDS, {"product_ids": list(ids)})).all()
+    return {product.id: product for product in products}
+
+# cursors are opaque to clients: base64 of the sort key and the (sort value, id) of the last row seen
+def encode_cursor(sort_by: str, product):
+    raw = json.dumps([sort_by, getattr(product, sort_by), product.id]).encode()
+    return base64.urlsafe_b64encode(raw).decode()
+
+def decode_cursor(cursor: str, sort_by: str):
+    try:
+        cursor_sort, value, last_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except (binascii.Error, ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if cursor_sort != sort_by:
+        raise HTTPException(status_code=400, detail="Cursor was issued for a different sort order")
+    return value, last_id
+
+def paginate(query, sort_by: str, page_size: int, cursor: str | None = None, page: int = 1):
+    # keyset mode seeks straight to the row after the cursor, offset mode is kept for old clients
+    column = SORT_COLUMNS[sort_by]
+    query = query.order_by(column, Product.id) if column is not Product.id else query.order_by(Product.id)
+    if cursor:
+        value, last_id = decode_cursor(cursor, sort_by)
+        if column is Product.id:
+            query = query.filter(Product.id > last_id)
+        else:
+            query = query.filter(tuple_(column, Product.id) > tuple_(value, last_id))
+    elif page > 1:
+        query = query.offset((page - 1) * page_size)
+    return query.limit(page_size) #None (streamed listings) means every row
+
+def next_cursor(products, sort_by: str, page_size: int):
+    # a short page means we reached the end
+    if len(products) < page_size:
+        return None
+    return encode_cursor(sort_by, products[-1])
+
+async def stream_products(db, query):
+    # plain column rows off a server side cursor, one list of dicts per partition.
+    # db is the request's session: it stays open until the body is sent, and a second session
+    # would need a second pooled connection while the request holds the first
+    query = query.with_only_columns(*PRODUCT_COLUMNS).execution_options(yield_per=STREAM_PARTITION_SIZE)
+    result = await db.stream(query)
+    async for rows in result.partitions(STREAM_PARTITION_SIZE):
+        yield [row._asdict() for row in rows]
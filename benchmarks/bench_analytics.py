@@ -0,0 +1,108 @@
+"""Sales report latency as the order table grows: rollup backed endpoints versus ad-hoc GROUP BYs.
+
+Grows one catalog's orders (three line items each, spread over a year) to every
+size in --orders, rebuilds the rollups with app.analytics.rebuild and times the
+three /admin/analytics endpoints against the queries a report needed before:
+aggregating order_items (joined to orders or products) on every request.
+Rebuild time is reported too, it is the one part that grows with the orders.
+
+    python -m benchmarks.bench_analytics --orders 1000 10000 100000
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import time
+from datetime import date, datetime, timedelta
+
+from benchmarks.common import setup_env, seed, auth_header, asgi_client
+
+PRODUCTS = 1000
+YEAR = {"date_from": "2020-01-01", "date_to": "2020-12-31"}
+
+
+def add_orders(first_id, count, user_id):
+    from sqlalchemy import insert
+    from app.core.database import engine
+    from app.orders.models import Order, OrderItem
+
+    start = datetime(2020, 1, 1)
+    ids = range(first_id, first_id + count)
+    with engine.begin() as connection:
+        connection.execute(insert(Order), [
+            {"id": i, "user_id": user_id, "total_amount": 30, "status": "paid", "created_at": start + timedelta(days=i % 365, seconds=i % 86400)}
+            for i in ids
+        ])
+        connection.execute(insert(OrderItem), [
+            {"order_id": i, "product_id": 1 + (i * 7 + n) % PRODUCTS, "quantity": 1 + n, "price_at_purchase": 10,
+             "product_name": f"Product {(i * 7 + n) % PRODUCTS}"}
+            for i in ids for n in range(3)
+        ])
+
+
+async def adhoc(report):
+    # what answering the same question cost before the rollups
+    from sqlalchemy import func, select
+    from app.core.database import session_scope
+    from app.orders.models import Order, OrderItem
+    from app.products.models import Product
+
+    revenue = func.sum(OrderItem.quantity * OrderItem.price_at_purchase)
+    queries = {
+        "revenue": select(func.date(Order.created_at), func.count(Order.id.distinct()), func.sum(OrderItem.quantity), revenue)
+        .join(OrderItem, OrderItem.order_id == Order.id)
+        .filter(Order.created_at >= date(2020, 1, 1), Order.created_at < date(2021, 1, 1))
+        .group_by(func.date(Order.created_at)),
+        "top_products": select(OrderItem.product_id, revenue.label("revenue")).group_by(OrderItem.product_id)
+        .order_by(revenue.desc()).limit(10),
+        "categories": select(Product.category, revenue.label("revenue")).join(Product, Product.id == OrderItem.product_id)
+        .group_by(Product.category).order_by(revenue.desc()),
+    }
+    async with session_scope() as db:
+        return (await db.execute(queries[report])).all()
+
+
+async def median_ms(call, rounds):
+    samples = []
+    for _ in range(rounds):
+        started = time.perf_counter()
+        await call()
+        samples.append(time.perf_counter() - started)
+    return round(statistics.median(samples) * 1000, 2)
+
+
+async def main(args):
+    from app.main import app
+    from app.analytics.rebuild import rebuild
+
+    tokens = seed(products=PRODUCTS, users=1)
+    headers = auth_header(tokens["admin@bench.com"])
+    endpoints = {
+        "revenue": ("/admin/analytics/revenue", YEAR),
+        "top_products": ("/admin/analytics/top-products", {"limit": 10}),
+        "categories": ("/admin/analytics/categories", {}),
+    }
+    report = {}
+    total = 0
+    async with asgi_client(app) as client:
+        for size in sorted(args.orders):
+            add_orders(total + 1, size - total, user_id=2)
+            total = size
+            started = time.perf_counter()
+            await rebuild(args.chunk_size)
+            result = {"rebuild_s": round(time.perf_counter() - started, 2)}
+            for name, (path, params) in endpoints.items():
+                result[f"{name}_rollup_ms"] = await median_ms(lambda: client.get(path, params=params, headers=headers), args.rounds)
+                result[f"{name}_adhoc_ms"] = await median_ms(lambda: adhoc(name), args.rounds)
+            report[size] = result
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--orders", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--rounds", type=int, default=10)
+    parser.add_argument("--chunk-size", type=int, default=5000)
+    args = parser.parse_args()
+    setup_env(ACCESS_LOG_SAMPLE_RATE=0)
+    asyncio.run(main(args))
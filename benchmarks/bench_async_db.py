@@ -0,0 +1,85 @@
+"""Concurrency of the async DB path versus the sync engine behind the threadpool.
+
+Runs the same read-heavy mix (catalog listing, product detail, cart view) once
+with DB_ASYNC=true and once with DB_ASYNC=false, each in its own interpreter so
+the engine is built from a clean config. `--threads` caps the anyio threadpool
+to mimic a worker that is already short on threads.
+
+--concurrency defaults well above the pool capacity (pool_size + max_overflow,
+15 by default) and above --threads, so the run also checks that requests queue
+for a session instead of stalling the threadpool: any failed request aborts it,
+and the report carries the slowest request (a stall shows up as a pool timeout).
+
+On the default throwaway SQLite file both drivers execute in worker threads, so
+the two modes land close together. The gap shows up once queries pay a network
+round trip, point DATABASE_URL at a Postgres instance to measure that.
+
+    python -m benchmarks.bench_async_db --requests 2000 --concurrency 100 --threads 4
+"""
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+
+
+def run_worker(args):
+    from benchmarks.common import setup_env, seed, auth_header, run_load, asgi_client
+
+    setup_env(LOAD_SHED_LOOP_LAG_MS=0, LOAD_SHED_POOL_WAIT_MS=0)  # measuring the queueing itself, not shedding it
+    import anyio.to_thread
+    from app.main import app
+
+    tokens = seed(products=args.products, users=args.users, cart_items=5)
+    headers = [auth_header(token) for email, token in tokens.items() if email.startswith("user")]
+
+    async def main():
+        anyio.to_thread.current_default_thread_limiter().total_tokens = args.threads
+        async with asgi_client(app) as client:
+            async def send(i):
+                kind = i % 3
+                if kind == 0:
+                    response = await client.get("/products", params={"page": 1 + i % 10})
+                elif kind == 1:
+                    response = await client.get(f"/products/{1 + i % args.products}")
+                else:
+                    response = await client.get("/cart/", headers=headers[i % len(headers)])
+                response.raise_for_status()
+
+            return await run_load(send, args.requests, args.concurrency)
+
+    result = asyncio.run(main())
+    if result["max_ms"] > args.max_ms:
+        raise SystemExit(f"slowest request took {result['max_ms']}ms, sessions stalled on the pool")
+    result["mode"] = "async" if os.environ["DB_ASYNC"] == "true" else "sync"
+    print(json.dumps(result))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=1500)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--threads", type=int, default=4, help="anyio threadpool size")
+    parser.add_argument("--max-ms", type=float, default=5000, help="fail when any request takes longer")
+    parser.add_argument("--products", type=int, default=500)
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        return run_worker(args)
+
+    results = []
+    for mode in ("false", "true"):
+        env = {**os.environ, "DB_ASYNC": mode, "LOG_LEVEL": "WARNING"}
+        output = subprocess.run(
+            [sys.executable, "-m", "benchmarks.bench_async_db", "--worker", *sys.argv[1:]],
+            env=env, check=True, stdout=subprocess.PIPE, text=True,  # stderr passes through, a failed run shows why
+        ).stdout
+        results.append(json.loads(output.strip().splitlines()[-1]))
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
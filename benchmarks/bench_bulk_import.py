@@ -0,0 +1,69 @@
+"""Catalog load speed: POST /admin/products per row versus the streaming bulk import.
+
+The per-row path is timed on a small sample (it commits and refreshes every
+product), the bulk path uploads the full catalog as a streamed NDJSON body.
+The export is then streamed back (httpx's ASGI transport buffers the body, so
+only time and size are reported here).
+
+    python -m benchmarks.bench_bulk_import --products 100000 --single 500
+"""
+import argparse
+import asyncio
+import json
+import logging
+import time
+
+from benchmarks.common import setup_env, seed, auth_header, asgi_client
+
+
+def product(i):
+    return {"name": f"Bulk product {i}", "description": f"Imported item {i}", "price": 1 + i % 500,
+            "stock": 100, "category": f"category-{i % 20}"}
+
+
+async def main(args):
+    from app.main import app
+
+    tokens = seed(products=0, users=0)
+    headers = auth_header(tokens["admin@bench.com"])
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    report = {}
+
+    async with asgi_client(app) as client:
+        started = time.perf_counter()
+        for i in range(args.single):
+            await client.post("/admin/products", json=product(i), headers=headers)
+        elapsed = time.perf_counter() - started
+        report["single_create"] = {"products": args.single, "seconds": round(elapsed, 2),
+                                   "products_per_second": round(args.single / elapsed, 1)}
+
+        async def body():
+            for start in range(0, args.products, 1000):
+                yield "".join(json.dumps(product(i)) + "\n" for i in range(start, min(start + 1000, args.products))).encode()
+
+        started = time.perf_counter()
+        response = await client.post("/admin/products/import", content=body(),
+                                     headers={**headers, "Content-Type": "application/x-ndjson"})
+        elapsed = time.perf_counter() - started
+        result = response.json()
+        report["bulk_import"] = {"products": result["created"], "failed": result["failed"], "seconds": round(elapsed, 2),
+                                 "products_per_second": round(result["created"] / elapsed, 1)}
+
+        started = time.perf_counter()
+        size = lines = 0
+        async with client.stream("GET", "/admin/products/export", headers=headers) as response:
+            async for chunk in response.aiter_bytes():
+                size += len(chunk)
+                lines += chunk.count(b"\n")
+        elapsed = time.perf_counter() - started
+        report["export"] = {"rows": lines, "megabytes": round(size / 2**20, 1), "seconds": round(elapsed, 2)}
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--products", type=int, default=100000)
+    parser.add_argument("--single", type=int, default=500)
+    args = parser.parse_args()
+    setup_env(ACCESS_LOG_SAMPLE_RATE=0)
+    asyncio.run(main(args))
@@ -0,0 +1,82 @@
+"""Cart throughput per CART_BACKEND: sql (cart table) versus memory and redis (hash per user).
+
+Each backend runs in a fresh interpreter. Users fire a mix of cart calls through
+the ASGI app (add, view, change quantity, remove) and the script reports ops/sec
+and latency percentiles. The redis backend talks to --redis-url when given,
+otherwise to an in-process fakeredis server (pinned in requirements.txt for the
+benchmarks), which leaves out the network round trip.
+
+    python -m benchmarks.bench_cart_store --ops 4000 --concurrency 20
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import subprocess
+import sys
+
+from benchmarks.common import setup_env, seed, auth_header, asgi_client, run_load
+
+
+def run_worker(args):
+    setup_env(ACCESS_LOG_SAMPLE_RATE=0, CART_BACKEND=args.backend, **({"CART_URL": args.redis_url} if args.redis_url else {}))
+    if args.backend == "redis" and not args.redis_url:
+        import fakeredis
+        import redis.asyncio
+
+        server = fakeredis.FakeAsyncRedis()
+        redis.asyncio.from_url = lambda url, **kwargs: server
+    from app.main import app
+
+    tokens = seed(products=200, users=args.concurrency)
+    headers = [auth_header(token) for email, token in tokens.items() if email != "admin@bench.com"]
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+
+    async def main():
+        async with asgi_client(app) as client:
+            async def send(i):
+                user = headers[i % len(headers)]
+                product_id = 1 + (i // len(headers)) % 50
+                step = i // (len(headers) * 50) % 4  # every user adds 50 products, views, updates, removes them
+                if step == 0:
+                    response = await client.post("/cart/", json={"product_id": product_id, "quantity": 1}, headers=user)
+                elif step == 1:
+                    response = await client.get("/cart/", headers=user)
+                elif step == 2:
+                    response = await client.put(f"/cart/{product_id}", json={"product_id": product_id, "quantity": 2}, headers=user)
+                else:
+                    response = await client.delete(f"/cart/{product_id}", headers=user)
+                assert response.status_code == 200, response.text
+
+            return await run_load(send, args.ops, args.concurrency)
+
+    print(json.dumps({"backend": args.backend, **asyncio.run(main())}))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--ops", type=int, default=4000)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--backends", nargs="+", default=["sql", "memory", "redis"])
+    parser.add_argument("--redis-url")
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--backend", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        return run_worker(args)
+
+    results = []
+    for backend in args.backends:
+        command = [sys.executable, "-m", "benchmarks.bench_cart_store", "--worker", "--backend", backend,
+                   "--ops", str(args.ops), "--concurrency", str(args.concurrency)]
+        if args.redis_url:
+            command += ["--redis-url", args.redis_url]
+        output = subprocess.run(command, env=dict(os.environ), check=True, capture_output=True, text=True).stdout
+        results.append(json.loads(output.strip().splitlines()[-1]))
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+"""Hundreds of parallel checkouts racing for one product.
+
+Every user has the same product in their cart and all checkouts are fired at
+once. The run verifies that stock never goes negative, that exactly as many
+orders exist as units were sold, and reports checkout throughput. Exits
+non-zero on any overselling.
+
+    python -m benchmarks.bench_checkout_concurrency --users 300 --stock 100
+"""
+import argparse
+import asyncio
+import json
+import sys
+
+from benchmarks.common import setup_env, seed, auth_header, asgi_client, run_load
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=300)
+    parser.add_argument("--stock", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=300)
+    args = parser.parse_args()
+
+    setup_env()
+    from sqlalchemy import func, select
+    from app.main import app
+    from app.core.database import SessionLocal
+    from app.products.models import Product
+    from app.orders.models import Order, OrderItem
+
+    tokens = seed(products=1, users=args.users, cart_items=1)
+    with SessionLocal() as db:
+        db.get(Product, 1).stock = args.stock
+        db.commit()
+    headers = [auth_header(tokens[f"user{i}@bench.com"]) for i in range(args.users)]
+    statuses = {}
+
+    async def run():
+        async with asgi_client(app) as client:
+            async def send(i):
+                response = await client.post("/checkout/", json={"payment_method": "COD"}, headers=headers[i])
+                statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+
+            return await run_load(send, args.users, args.concurrency)
+
+    result = asyncio.run(run())
+    with SessionLocal() as db:
+        stock = db.get(Product, 1).stock
+        orders = db.scalar(select(func.count(Order.id)))
+        sold = db.scalar(select(func.coalesce(func.sum(OrderItem.quantity), 0)))
+
+    result.update(statuses=statuses, initial_stock=args.stock, final_stock=stock, orders=orders, units_sold=sold)
+    result["oversold"] = stock < 0 or sold != args.stock - stock or sold > args.stock
+    print(json.dumps(result, indent=2))
+    if result["oversold"]:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
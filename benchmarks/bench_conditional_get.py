@@ -0,0 +1,56 @@
+"""Catalog revalidation cost: a full 200 response versus a 304 for a client or CDN holding the ETag.
+
+Times GET /products (100 per page), GET /products/search and GET /products/{id}
+with and without If-None-Match and reports the median latency and the bytes
+sent each way.
+
+    python -m benchmarks.bench_conditional_get --products 20000 --rounds 200
+"""
+import argparse
+import asyncio
+import json
+import logging
+import statistics
+import time
+
+from benchmarks.common import setup_env, seed, asgi_client
+
+
+async def measure(client, url, params, headers, rounds):
+    samples = []
+    size = status = None
+    for _ in range(rounds):
+        started = time.perf_counter()
+        response = await client.get(url, params=params, headers=headers)
+        samples.append(time.perf_counter() - started)
+        size, status = len(response.content), response.status_code
+    return {"status": status, "bytes": size, "median_ms": round(statistics.median(samples) * 1000, 3)}
+
+
+async def main(args):
+    from app.main import app
+
+    seed(products=args.products, users=0, search_index=True)
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    report = {}
+    async with asgi_client(app) as client:
+        for name, url, params in (
+            ("listing", "/products", {"page_size": 100}),
+            ("search", "/products/search", {"keyword": "description 42", "page_size": 100}),
+            ("detail", "/products/42", {}),
+        ):
+            etag = (await client.get(url, params=params)).headers["etag"]
+            report[name] = {
+                "full": await measure(client, url, params, {}, args.rounds),
+                "revalidated": await measure(client, url, params, {"If-None-Match": etag}, args.rounds),
+            }
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--products", type=int, default=20000)
+    parser.add_argument("--rounds", type=int, default=200)
+    args = parser.parse_args()
+    setup_env(ACCESS_LOG_SAMPLE_RATE=0)
+    asyncio.run(main(args))
@@ -0,0 +1,92 @@
+"""Email throughput: one SMTP connection per mail versus the pooled outbox worker.
+
+Both sides talk to a local aiosmtpd server (pinned in requirements.txt for the
+benchmarks) that can add a fixed delay per connection to mimic the TCP + STARTTLS +
+login cost of a real relay. The per-mail path is what forgot-password used to
+do with aiosmtplib.send; the outbox path queues rows and drains them with
+app.notifications.worker.
+
+    python -m benchmarks.bench_email_outbox --emails 200 --connect-delay-ms 50
+"""
+import argparse
+import asyncio
+import json
+import time
+
+from benchmarks.common import setup_env
+
+PORT = 8025
+
+
+def start_smtp_server(connect_delay):
+    from aiosmtpd.controller import Controller
+
+    class Handler:
+        received = 0
+        connections = 0
+
+        async def handle_EHLO(self, server, session, envelope, hostname, responses):
+            Handler.connections += 1
+            await asyncio.sleep(connect_delay)  # handshake cost of a real relay
+            session.host_name = hostname
+            return responses
+
+        async def handle_DATA(self, server, session, envelope):
+            Handler.received += 1
+            return "250 OK"
+
+    controller = Controller(Handler(), hostname="127.0.0.1", port=PORT)
+    controller.start()
+    return controller, Handler
+
+
+async def per_mail(count):
+    import aiosmtplib
+    from app.core.email_utils import build_message
+
+    for i in range(count):
+        await aiosmtplib.send(build_message("Bench", f"user{i}@bench.com", "body"),
+                              hostname="127.0.0.1", port=PORT, start_tls=False)
+
+
+async def outbox(count):
+    from app.core.database import SessionLocal
+    from app.notifications.utils import queue_email
+    from app.notifications.worker import run
+
+    with SessionLocal() as db:
+        for i in range(count):
+            queue_email(db, kind="bench", recipient=f"user{i}@bench.com", subject="Bench", body="body")
+        db.commit()
+    await run(once=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--emails", type=int, default=200)
+    parser.add_argument("--connect-delay-ms", type=float, default=50)
+    args = parser.parse_args()
+
+    setup_env(EMAIL_HOST="127.0.0.1", EMAIL_PORT=PORT, EMAIL_START_TLS="false", ACCESS_LOG_SAMPLE_RATE=0)
+
+    controller, handler = start_smtp_server(args.connect_delay_ms / 1000)
+    report = {}
+    try:
+        for name, send in (("per_mail_connection", per_mail), ("outbox_pooled", outbox)):
+            handler.received = handler.connections = 0
+            started = time.perf_counter()
+            asyncio.run(send(args.emails))
+            elapsed = time.perf_counter() - started
+            report[name] = {
+                "emails": handler.received,
+                "smtp_connections": handler.connections,
+                "seconds": round(elapsed, 3),
+                "emails_per_second": round(handler.received / elapsed, 1),
+            }
+    finally:
+        controller.stop()
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
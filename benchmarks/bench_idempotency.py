@@ -0,0 +1,87 @@
+"""Checkout under client retries: plain requests versus the same retries carrying an Idempotency-Key.
+
+Every user fills a cart and fires one checkout plus --retries concurrent copies
+of it (what a mobile client timing out does). Without a key every copy redoes
+the cart and stock work and all but one fail with an empty cart or a 409, so the
+client never sees its order; with a key one runs and the rest are coalesced onto
+it and get the same OrderOut. Reports statuses, orders created per user, replay
+latency and the cost of the key on a single checkout.
+
+    python -m benchmarks.bench_idempotency --users 50 --retries 4
+"""
+import argparse
+import asyncio
+import json
+import logging
+import statistics
+import time
+
+from benchmarks.common import setup_env, seed, auth_header, asgi_client
+
+
+async def main(args):
+    from sqlalchemy import func, select
+    from app.main import app
+    from app.core.database import SessionLocal
+    from app.orders.models import Order
+
+    tokens = seed(products=100, users=args.users)
+    users = [auth_header(token) for email, token in tokens.items() if email != "admin@bench.com"]
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    report = {}
+
+    async with asgi_client(app) as client:
+        async def fill(headers):
+            for product_id in range(1, 4):
+                await client.post("/cart/", json={"product_id": product_id, "quantity": 1}, headers=headers)
+
+        async def timed_checkout(headers):
+            started = time.perf_counter()
+            response = await client.post("/checkout/", json={"payment_method": "COD"}, headers=headers)
+            return response, time.perf_counter() - started
+
+        for mode in ("no_key", "idempotency_key"):
+            with SessionLocal() as db:
+                before = db.scalar(select(func.count(Order.id)))
+            latencies = {"executed": [], "replayed": []}
+            statuses = {}
+            for i, headers in enumerate(users):
+                await fill(headers)
+                if mode == "idempotency_key":
+                    headers = {**headers, "Idempotency-Key": f"checkout-{i}"}
+                results = await asyncio.gather(*(timed_checkout(headers) for _ in range(args.retries + 1)))
+                for response, elapsed in results:
+                    replayed = response.headers.get("idempotent-replayed") == "true"
+                    statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+                    if response.status_code == 200:
+                        latencies["replayed" if replayed else "executed"].append(elapsed)
+            with SessionLocal() as db:
+                created = db.scalar(select(func.count(Order.id))) - before
+            report[mode] = {
+                "checkouts_sent": len(users) * (args.retries + 1),
+                "statuses": statuses,  # without a key the copies fail (empty cart / 409) and never see the order
+                "orders_per_user": round(created / len(users), 2),
+                "executed_p50_ms": round(statistics.median(latencies["executed"]) * 1000, 2) if latencies["executed"] else None,
+                "replayed": len(latencies["replayed"]),
+                "replayed_p50_ms": round(statistics.median(latencies["replayed"]) * 1000, 2) if latencies["replayed"] else None,
+            }
+
+        # sequential single checkouts, with and without a fresh key
+        for mode in ("no_key", "idempotency_key"):
+            samples = []
+            for i, headers in enumerate(users):
+                await fill(headers)
+                if mode == "idempotency_key":
+                    headers = {**headers, "Idempotency-Key": f"single-{i}"}
+                samples.append((await timed_checkout(headers))[1])
+            report[f"single_checkout_{mode}_p50_ms"] = round(statistics.median(samples) * 1000, 2)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--retries", type=int, default=4)
+    args = parser.parse_args()
+    setup_env(ACCESS_LOG_SAMPLE_RATE=0)
+    asyncio.run(main(args))
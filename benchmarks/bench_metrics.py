@@ -0,0 +1,82 @@
+"""Throughput cost of request metrics (METRICS_ENABLED) on real endpoints.
+
+Each setting runs in its own interpreter, since the middleware and SQL hooks are
+installed when app.main is imported. The cached product detail is the worst case
+(almost no work besides the middleware); the cart view issues SQL on every call.
+Runs alternate between the two settings and the median of each is compared, a
+single pair of runs is dominated by process to process noise.
+
+    python -m benchmarks.bench_metrics --requests 3000 --concurrency 10 --rounds 3
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import statistics
+import subprocess
+import sys
+
+
+def run_worker(args):
+    from benchmarks.common import setup_env, seed, auth_header, run_load, asgi_client
+
+    setup_env(ACCESS_LOG_SAMPLE_RATE=0)  # keep the access log out of the comparison
+    from app.main import app
+
+    tokens = seed(products=100, users=10, cart_items=5)
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+
+    async def main():
+        results = {}
+        async with asgi_client(app) as client:
+            for name, url, auth in (("product_detail", "/products/{}", False), ("view_cart", "/cart/", True)):
+                async def send(i):
+                    headers = auth_header(tokens[f"user{i % 10}@bench.com"]) if auth else None
+                    await client.get(url.format(1 + i % 100), headers=headers)
+
+                await run_load(send, 300, args.concurrency)  # warm caches
+                results[name] = await run_load(send, args.requests, args.concurrency)
+        return results
+
+    print(json.dumps(asyncio.run(main())))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=3000)
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--rounds", type=int, default=3)
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    args, _ = parser.parse_known_args()
+
+    if args.worker:
+        return run_worker(args)
+
+    runs = {"false": [], "true": []}
+    for _ in range(args.rounds):
+        for enabled in runs:
+            output = subprocess.run(
+                [sys.executable, "-m", "benchmarks.bench_metrics", "--worker", *sys.argv[1:]],
+                env={**os.environ, "METRICS_ENABLED": enabled}, check=True, capture_output=True, text=True,
+            ).stdout
+            runs[enabled].append(json.loads(output.strip().splitlines()[-1]))
+
+    def median(enabled, endpoint, field):
+        return statistics.median(run[endpoint][field] for run in runs[enabled])
+
+    report = {}
+    for endpoint in runs["false"][0]:
+        off, on = median("false", endpoint, "throughput_rps"), median("true", endpoint, "throughput_rps")
+        report[endpoint] = {
+            "rps_without_metrics": off,
+            "rps_with_metrics": on,
+            "throughput_change_pct": round((on / off - 1) * 100, 1),
+            "p95_ms_without_metrics": median("false", endpoint, "p95_ms"),
+            "p95_ms_with_metrics": median("true", endpoint, "p95_ms"),
+        }
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
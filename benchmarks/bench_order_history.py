@@ -0,0 +1,104 @@
+"""Order history latency as a user's history grows: the old load-everything query versus one cursor page.
+
+Seeds one user per history size with that many orders (three line items each),
+then times GET /orders/ (the first page and a later cursor page) and
+GET /orders/summary against what the endpoint did before: every order with its
+items plus a product lookup for the names.
+
+    python -m benchmarks.bench_order_history --histories 100 1000 10000
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import time
+from datetime import datetime, timedelta
+
+from benchmarks.common import setup_env, seed, auth_header, asgi_client
+
+
+def seed_history(user_id, size, products):
+    from sqlalchemy import insert, select
+    from app.core.database import engine
+    from app.orders.models import Order, OrderItem, OrderSummary
+
+    start = datetime(2020, 1, 1)
+    with engine.begin() as connection:
+        first_id = (connection.execute(select(Order.id).order_by(Order.id.desc()).limit(1)).scalar() or 0) + 1
+        connection.execute(insert(Order), [
+            {"id": first_id + i, "user_id": user_id, "total_amount": 30, "status": "paid", "created_at": start + timedelta(minutes=i)}
+            for i in range(size)
+        ])
+        connection.execute(insert(OrderItem), [
+            {"order_id": first_id + i, "product_id": 1 + (i + n) % products, "quantity": 1, "price_at_purchase": 10,
+             "product_name": f"Product {(i + n) % products}"}
+            for i in range(size) for n in range(3)
+        ])
+        connection.execute(insert(OrderSummary).values(user_id=user_id, order_count=size, total_spent=30 * size,
+                                                       last_order_at=start + timedelta(minutes=size - 1)))
+
+
+async def load_everything(user_id):
+    # GET /orders/ before the snapshot columns and paging
+    from sqlalchemy import select
+    from sqlalchemy.orm import selectinload
+    from app.core.database import session_scope
+    from app.orders.models import Order
+    from app.orders.schemas import OrderOut
+    from app.products.utils import load_products
+
+    async with session_scope() as db:
+        orders = (await db.scalars(select(Order).options(selectinload(Order.items))
+                                   .filter(Order.user_id == user_id).order_by(Order.created_at.desc()))).all()
+        products = await load_products(db, [item.product_id for order in orders for item in order.items])
+        for order in orders:
+            for item in order.items:
+                item.product_name = products[item.product_id].name
+        return len([OrderOut.model_validate(order).model_dump_json() for order in orders])
+
+
+async def median_ms(call, rounds):
+    samples = []
+    for _ in range(rounds):
+        started = time.perf_counter()
+        await call()
+        samples.append(time.perf_counter() - started)
+    return round(statistics.median(samples) * 1000, 2)
+
+
+async def main(args):
+    from app.main import app
+    from app.auth.models import User
+    from app.core.database import SessionLocal
+
+    tokens = seed(products=100, users=len(args.histories))
+    report = {}
+    async with asgi_client(app) as client:
+        for i, size in enumerate(args.histories):
+            email = f"user{i}@bench.com"
+            with SessionLocal() as db:
+                user_id = db.query(User.id).filter(User.email == email).scalar()
+            seed_history(user_id, size, products=100)
+            headers = auth_header(tokens[email])
+
+            response = await client.get("/orders/", headers=headers)
+            for _ in range(min(4, size // 20 - 1)):  # walk to the fifth page, when there is one
+                response = await client.get("/orders/", headers=headers, params={"cursor": response.headers["x-next-cursor"]})
+            deep = {"cursor": response.headers["x-next-cursor"]}
+
+            report[size] = {
+                "load_everything_ms": await median_ms(lambda: load_everything(user_id), args.rounds),
+                "first_page_ms": await median_ms(lambda: client.get("/orders/", headers=headers), args.rounds),
+                "later_page_ms": await median_ms(lambda: client.get("/orders/", headers=headers, params=deep), args.rounds),
+                "summary_ms": await median_ms(lambda: client.get("/orders/summary", headers=headers), args.rounds),
+            }
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--histories", type=int, nargs="+", default=[100, 1000, 10000])
+    parser.add_argument("--rounds", type=int, default=10)
+    args = parser.parse_args()
+    setup_env(ACCESS_LOG_SAMPLE_RATE=0)
+    asyncio.run(main(args))
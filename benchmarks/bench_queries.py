@@ -0,0 +1,100 @@
+"""Python-side cost of the hot lookups: statements built per call versus the prebuilt ones in app.core.queries.
+
+Runs each lookup --rounds times through the app's own session (async, or the
+sync adapter with --sync) against a seeded SQLite file and reports the mean
+microseconds per call for:
+  inline     select(...).filter(...) built on every call, as the routes did
+  registry   the module level statement with bind parameters (cache key memoized)
+  lambda     lambda_stmt(lambda: select(...)), the closure is re-resolved per call
+  get        Session.get, for the primary key lookups (identity map miss and hit)
+The SQL itself is the same, the differences are statement construction and
+compiled-cache key generation. --profile also prints where the time goes.
+
+    python -m benchmarks.bench_queries --rounds 5000
+"""
+import argparse
+import asyncio
+import cProfile
+import json
+import pstats
+import time
+
+from benchmarks.common import setup_env, seed
+
+
+async def timed(call, rounds):
+    for _ in range(min(200, rounds)):  # warm the compiled cache and the lambda cache first
+        await call()
+    started = time.perf_counter()
+    for _ in range(rounds):
+        await call()
+    return round((time.perf_counter() - started) / rounds * 1e6, 1)
+
+
+def lookups(db):
+    from sqlalchemy import lambda_stmt, select
+    from app.core import queries
+    from app.auth.models import User
+    from app.cart.models import CartItem
+    from app.products.models import Product
+
+    email, product_id, user_id = "user0@bench.com", 1, 2
+    cart_columns = [CartItem.id, CartItem.product_id, CartItem.quantity]
+    return {
+        "user_by_email": {
+            "inline": lambda: db.scalar(select(User).filter(User.email == email)),
+            "registry": lambda: db.scalar(queries.USER_BY_EMAIL, {"email": email}),
+            "lambda": lambda: db.scalar(lambda_stmt(lambda: select(User).filter(User.email == email))),
+        },
+        "product_by_id": {
+            "inline": lambda: db.scalar(select(Product).filter(Product.id == product_id)),
+            "registry": lambda: db.scalar(queries.PRODUCT_BY_ID, {"product_id": product_id}),
+            "lambda": lambda: db.scalar(lambda_stmt(lambda: select(Product).filter(Product.id == product_id))),
+            "get_miss": lambda: db.get(Product, product_id),  # the loaded object isn't kept, so it is gone from the identity map
+        },
+        "product_stock": {
+            "inline": lambda: db.scalar(select(Product.stock).filter(Product.id == product_id)),
+            "registry": lambda: db.scalar(queries.PRODUCT_STOCK, {"product_id": product_id}),
+            "lambda": lambda: db.scalar(lambda_stmt(lambda: select(Product.stock).filter(Product.id == product_id))),
+        },
+        "cart_lines": {
+            "inline": lambda: db.execute(select(*cart_columns).filter(CartItem.user_id == user_id).order_by(CartItem.id)),
+            "registry": lambda: db.execute(queries.CART_LINES, {"user_id": user_id}),
+            "lambda": lambda: db.execute(lambda_stmt(lambda: select(*cart_columns).filter(CartItem.user_id == user_id).order_by(CartItem.id))),
+        },
+    }
+
+
+async def main(args):
+    from app.core.database import session_scope
+    from app.products.models import Product
+
+    seed(products=100, users=10, cart_items=5)
+    report = {}
+    async with session_scope() as db:
+        for name, variants in lookups(db).items():
+            report[name] = {variant: await timed(call, args.rounds) for variant, call in variants.items()}
+        held = await db.get(Product, 1)  # referenced, so later gets are answered from the identity map
+        report["product_by_id"]["get_hit"] = await timed(lambda: db.get(Product, 1), args.rounds)
+        del held
+        if args.profile:
+            for variant in ("inline", "registry"):
+                call = lookups(db)["user_by_email"][variant]
+                profile = cProfile.Profile()
+                profile.enable()
+                for _ in range(args.rounds):
+                    await call()
+                profile.disable()
+                print(f"--- user_by_email {variant}")
+                pstats.Stats(profile).sort_stats("tottime").print_stats(10)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rounds", type=int, default=5000)
+    parser.add_argument("--sync", action="store_true", help="DB_ASYNC=false, the blocking session behind the adapter")
+    parser.add_argument("--profile", action="store_true")
+    args = parser.parse_args()
+    setup_env(ACCESS_LOG_SAMPLE_RATE=0, DB_ASYNC=str(not args.sync).lower())
+    asyncio.run(main(args))
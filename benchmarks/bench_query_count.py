@@ -0,0 +1,76 @@
+"""SQL statements per request for cart, order and checkout endpoints versus line items.
+
+Guards against N+1 regressions: each endpoint has to issue the same number of
+statements whether the cart or order holds one product or many. Exits non-zero
+when the count changes with size.
+
+    python -m benchmarks.bench_query_count --sizes 1 5 25
+"""
+import argparse
+import asyncio
+import json
+import sys
+
+from benchmarks.common import setup_env, seed, auth_header, asgi_client, StatementCounter
+
+
+async def measure(app, counter, tokens, sizes):
+    from app.core.database import SessionLocal
+    from app.auth.models import User
+    from app.cart.models import CartItem
+
+    results = {}
+    async with asgi_client(app) as client:
+        for n, size in enumerate(sizes):
+            email = f"user{n}@bench.com"
+            headers = auth_header(tokens[email])
+            await client.get("/cart/", headers=headers)  # warm the auth caches so only route work is counted
+
+            with SessionLocal() as db:
+                user_id = db.query(User.id).filter(User.email == email).scalar()
+                db.add_all([CartItem(user_id=user_id, product_id=p + 1, quantity=1) for p in range(size)])
+                db.commit()
+
+            counts = {}
+            for name, method, url in (
+                ("view_cart", "GET", "/cart/"),
+                ("checkout", "POST", "/checkout/"),
+                ("get_user_orders", "GET", "/orders/"),
+                ("get_order_detail", "GET", None),
+            ):
+                if url is None:
+                    order_id = (await client.get("/orders/", headers=headers)).json()[0]["id"]
+                    url = f"/orders/{order_id}"
+                counter.reset()
+                kwargs = {"json": {"payment_method": "COD"}} if method == "POST" else {}
+                response = await client.request(method, url, headers=headers, **kwargs)
+                response.raise_for_status()
+                counts[name] = counter.count
+            results[size] = counts
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1, 5, 25])
+    args = parser.parse_args()
+
+    setup_env()
+    from app.main import app
+
+    tokens = seed(products=max(args.sizes), users=len(args.sizes))
+    counter = StatementCounter()
+    results = asyncio.run(measure(app, counter, tokens, args.sizes))
+    print(json.dumps(results, indent=2))
+
+    regressions = [
+        name for name in results[args.sizes[0]]
+        if len({counts[name] for counts in results.values()}) > 1
+    ]
+    if regressions:
+        print(f"statement count grows with line items for: {', '.join(regressions)}", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
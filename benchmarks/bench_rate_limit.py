@@ -0,0 +1,129 @@
+"""Latency of a well behaved client while another one floods signin and search, with and without rate limits.
+
+Each mode serves the app with uvicorn on a fresh database. An attacker process
+(source address 127.0.0.2) keeps --concurrency requests in flight against
+/auth/signin with wrong passwords and against /products/search for --seconds;
+meanwhile the legitimate client (127.0.0.3) signs in and searches at a human
+pace once --warmup has passed. Without limits every attack signin queues for
+bcrypt and every attack search runs FTS, so the legitimate client waits behind
+them (or gets the bcrypt queue's 503); with limits the flood is answered 429
+before reaching the routes. The burst the limiter does let through (10 signins)
+still queues for bcrypt, so keep --warmup above the time that takes to drain.
+
+    python -m benchmarks.bench_rate_limit --seconds 20 --concurrency 50
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import subprocess
+import sys
+import time
+
+from benchmarks.common import setup_env, seed, percentile
+
+
+def http_client(port, source):
+    import httpx
+
+    transport = httpx.AsyncHTTPTransport(local_address=source)  # the limiter tells clients apart by address
+    return httpx.AsyncClient(transport=transport, base_url=f"http://127.0.0.1:{port}", timeout=60)
+
+
+async def attack(args):
+    statuses = {}
+    deadline = time.perf_counter() + args.seconds
+    async with http_client(args.port, "127.0.0.2") as client:
+        async def flood(i):
+            while time.perf_counter() < deadline:
+                if i % 2:
+                    response = await client.post("/auth/signin", data={"username": "user0@bench.com", "password": f"guess-{i}"})
+                else:
+                    response = await client.get("/products/search", params={"keyword": "product"})
+                statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+
+        await asyncio.gather(*(flood(i) for i in range(args.concurrency)))
+    print(json.dumps(statuses))
+
+
+async def behave(args):
+    latencies = {"signin": [], "search": []}
+    statuses = {}
+    deadline = time.perf_counter() + args.seconds
+    async with http_client(args.port, "127.0.0.3") as client:
+        await asyncio.sleep(args.warmup)  # let the flood build up (and the burst the limiter lets through drain)
+        while time.perf_counter() < deadline:
+            for name, call in (
+                ("signin", lambda: client.post("/auth/signin", data={"username": "user0@bench.com", "password": "password"})),
+                ("search", lambda: client.get("/products/search", params={"keyword": "product 1"})),
+            ):
+                started = time.perf_counter()
+                response = await call()
+                latencies[name].append(time.perf_counter() - started)
+                statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+            await asyncio.sleep(args.pause)
+    return {
+        "legit_statuses": statuses,
+        **{f"legit_{name}_{stat}_ms": round(percentile(samples, pct) * 1000, 2)
+           for name, samples in latencies.items() for stat, pct in (("p50", 50), ("p99", 99))},
+    }
+
+
+def run_worker(args):
+    setup_env(ACCESS_LOG_SAMPLE_RATE=0, RATE_LIMIT_ENABLED=str(args.mode == "limited").lower())
+    import httpx
+
+    seed(products=2000, users=1, search_index=True)
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+
+    server = subprocess.Popen([sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(args.port), "--log-level", "warning"],
+                              env=dict(os.environ))
+    try:
+        for _ in range(100):
+            try:
+                httpx.get(f"http://127.0.0.1:{args.port}/")
+                break
+            except httpx.TransportError:
+                time.sleep(0.1)
+        attacker = subprocess.Popen([sys.executable, "-m", "benchmarks.bench_rate_limit", "--attacker", "--port", str(args.port),
+                                     "--seconds", str(args.seconds), "--concurrency", str(args.concurrency)],
+                                    env=dict(os.environ), stdout=subprocess.PIPE, text=True)
+        legit = asyncio.run(behave(args))
+        attack_statuses = json.loads(attacker.communicate()[0].strip().splitlines()[-1])
+    finally:
+        server.terminate()
+        server.wait()
+    print(json.dumps({"mode": args.mode, "attack_statuses": attack_statuses, **legit}))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--seconds", type=float, default=20)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--pause", type=float, default=1.5, help="seconds between the legitimate client's signin+search rounds")
+    parser.add_argument("--warmup", type=float, default=3, help="seconds of flood before the legitimate client starts")
+    parser.add_argument("--modes", nargs="+", default=["unlimited", "limited"])
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--attacker", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--mode", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.attacker:
+        return asyncio.run(attack(args))
+    if args.worker:
+        return run_worker(args)
+
+    results = []
+    for mode in args.modes:
+        command = [sys.executable, "-m", "benchmarks.bench_rate_limit", "--worker", "--mode", mode,
+                   "--seconds", str(args.seconds), "--concurrency", str(args.concurrency), "--pause", str(args.pause), "--warmup", str(args.warmup),
+                   "--port", str(args.port)]
+        output = subprocess.run(command, env=dict(os.environ), check=True, capture_output=True, text=True).stdout
+        results.append(json.loads(output.strip().splitlines()[-1]))
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""Per-request cost of the access log middleware.
+
+Runs the same trivial endpoint behind no middleware, the previous
+`@app.middleware("http")` f-string logger (synchronous handler writing to a file)
+and the queued JSON RequestLoggingMiddleware, at full and reduced sampling.
+Both loggers write to a temp file so the terminal never skews the numbers.
+Overhead is the mean latency difference against the bare app.
+
+    python -m benchmarks.bench_request_logging --requests 5000
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import tempfile
+
+from benchmarks.common import setup_env, run_load, asgi_client
+
+
+def build_app(variant, log_dir):
+    from fastapi import FastAPI, Request
+    from app.core.request_logging import RequestLoggingMiddleware
+
+    app = FastAPI()
+
+    @app.get("/items/{item_id}")
+    async def read_item(item_id: int):
+        return {"id": item_id}
+
+    if variant == "legacy":
+        # the middleware as it was: BaseHTTPMiddleware plus a blocking handler on the event loop
+        legacy = logging.getLogger("bench.legacy")
+        legacy.propagate = False
+        handler = logging.FileHandler(os.path.join(log_dir, "legacy.log"))
+        handler.setFormatter(logging.Formatter("%(asctime)s - %(levelname)s - %(message)s"))
+        legacy.addHandler(handler)
+        legacy.setLevel(logging.INFO)
+
+        @app.middleware("http")
+        async def log_requests(request: Request, call_next):
+            client_ip = request.client.host
+            legacy.info(f"API Access - IP: {client_ip}, Method: {request.method}, Path: {request.url.path}")
+            return await call_next(request)
+    elif variant == "structured":
+        app.add_middleware(RequestLoggingMiddleware, default_rate=1.0, sample_rates={})
+    elif variant == "structured-sampled":
+        app.add_middleware(RequestLoggingMiddleware, default_rate=1.0, sample_rates={"/items/{item_id}": 0.1})
+    return app
+
+
+async def measure(app, total, concurrency):
+    async with asgi_client(app) as client:
+        async def send(i):
+            await client.get(f"/items/{i}")
+
+        await run_load(send, 200, concurrency)  # warm up
+        return await run_load(send, total, concurrency)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=1)
+    args = parser.parse_args()
+
+    setup_env()
+    from app.core import logging_utils
+
+    log_dir = tempfile.mkdtemp(prefix="ecommerce-bench-logs-")
+    logging_utils.log_handler.setStream(open(os.path.join(log_dir, "structured.log"), "a"))
+    logging.getLogger("httpx").setLevel(logging.WARNING)  # the client's own request log is not under test
+
+    results = {}
+    for variant in ("none", "legacy", "structured", "structured-sampled"):
+        result = asyncio.run(measure(build_app(variant, log_dir), args.requests, args.concurrency))
+        result["mean_us"] = round(args.concurrency / result["throughput_rps"] * 1_000_000, 1)
+        results[variant] = result
+    logging_utils.stop_logging()
+
+    baseline = results["none"]["mean_us"]
+    for result in results.values():
+        result["overhead_us"] = round(result["mean_us"] - baseline, 1)
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""Full text product search versus the old unbounded ILIKE scan.
+
+Seeds a synthetic catalog of each requested size, builds the search index and
+times a set of keyword queries both ways on the sync engine: the previous
+`name ILIKE '%kw%'` returning every match, and the ranked, paged search
+statement used by GET /products/search.
+
+    python -m benchmarks.bench_search --sizes 100000 1000000
+"""
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+
+WORDS = (
+    "laptop phone tablet charger cable wireless mouse keyboard monitor desk lamp chair bottle "
+    "shoe jacket shirt running travel kitchen knife pan coffee tea organic steel cotton leather "
+    "gaming audio speaker headphone camera lens bag backpack watch smart mini pro ultra classic"
+).split()
+KEYWORDS = ["laptop", "wire", "coffee pan", "smart watch", "leath", "pro gaming mouse"]
+
+
+def run_worker(args):
+    from benchmarks.common import setup_env, percentile
+
+    setup_env()
+    from sqlalchemy import insert, select, text
+    from app.core.database import engine
+    from app.products.models import Product
+    from app.products.search import search_statement
+
+    rng = random.Random(7)
+    started = time.perf_counter()
+    with engine.begin() as connection:
+        for offset in range(0, args.size, 50_000):
+            connection.execute(insert(Product), [
+                {
+                    "name": " ".join(rng.choices(WORDS, k=3)).title(),
+                    "description": " ".join(rng.choices(WORDS, k=12)),
+                    "price": round(rng.uniform(1, 2000), 2),
+                    "stock": rng.randint(0, 500),
+                    "category": f"category-{rng.randint(0, 40)}",
+                }
+                for _ in range(min(50_000, args.size - offset))
+            ])
+    seeded = time.perf_counter() - started
+
+    started = time.perf_counter()
+    with engine.begin() as connection:
+        connection.execute(text(
+            "INSERT INTO products_fts (rowid, name, description, category) "
+            "SELECT id, name, coalesce(description, ''), coalesce(category, '') FROM products"
+        ))
+    indexed = time.perf_counter() - started
+
+    def timed(build):
+        samples = []
+        with engine.connect() as connection:
+            for _ in range(args.repeat):
+                for keyword in KEYWORDS:
+                    began = time.perf_counter()
+                    connection.execute(build(keyword)).fetchall()
+                    samples.append(time.perf_counter() - began)
+        return {"p50_ms": round(percentile(samples, 50) * 1000, 2), "p95_ms": round(percentile(samples, 95) * 1000, 2)}
+
+    result = {
+        "products": args.size,
+        "seed_s": round(seeded, 1),
+        "index_build_s": round(indexed, 1),
+        "ilike_scan": timed(lambda kw: select(Product).filter(Product.name.ilike(f"%{kw}%"))),
+        "fts_page": timed(lambda kw: search_statement(kw, None, 0, 1e6).limit(20)),
+        "fts_page_filtered": timed(lambda kw: search_statement(kw, "category-3", 100, 900).limit(20)),
+    }
+    print(json.dumps(result))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100_000, 1_000_000])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--size", type=int, help=argparse.SUPPRESS)
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        return run_worker(args)
+
+    results = []
+    for size in args.sizes:
+        output = subprocess.run(
+            [sys.executable, "-m", "benchmarks.bench_search", "--worker", "--size", str(size), "--repeat", str(args.repeat)],
+            env={**os.environ}, check=True, capture_output=True, text=True,
+        ).stdout
+        results.append(json.loads(output.strip().splitlines()[-1]))
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
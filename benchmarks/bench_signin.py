@@ -0,0 +1,68 @@
+"""Signin throughput versus the size of the password hashing pool.
+
+Each pool size runs in its own interpreter (the pool is sized from settings at
+first use) and fires concurrent /auth/signin requests. Requests shed with 503
+by the hashing backpressure are counted separately from successful logins.
+
+    python -m benchmarks.bench_signin --sizes 1 2 4 8 --requests 200 --concurrency 32
+"""
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+
+
+def run_worker(args):
+    from benchmarks.common import setup_env, seed, run_load, asgi_client
+
+    setup_env(RATE_LIMIT_ENABLED="false", LOAD_SHED_LOOP_LAG_MS=0, LOAD_SHED_POOL_WAIT_MS=0)  # the hashing pool is measured, not the limiter in front of it
+    from app.main import app
+
+    seed(products=1, users=args.users)
+    statuses = {}
+
+    async def main():
+        async with asgi_client(app) as client:
+            async def send(i):
+                response = await client.post(
+                    "/auth/signin", data={"username": f"user{i % args.users}@bench.com", "password": "password"}
+                )
+                statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+
+            return await run_load(send, args.requests, args.concurrency)
+
+    result = asyncio.run(main())
+    result["pool_size"] = int(os.environ["PASSWORD_HASH_WORKERS"])
+    result["executor"] = os.environ.get("PASSWORD_HASH_EXECUTOR", "thread")
+    result["statuses"] = statuses
+    print(json.dumps(result))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--executor", choices=["thread", "process"], default="thread")
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    args, _ = parser.parse_known_args()
+
+    if args.worker:
+        return run_worker(args)
+
+    results = []
+    for size in args.sizes:
+        env = {**os.environ, "PASSWORD_HASH_WORKERS": str(size), "PASSWORD_HASH_EXECUTOR": args.executor}
+        output = subprocess.run(
+            [sys.executable, "-m", "benchmarks.bench_signin", "--worker", *sys.argv[1:]],
+            env=env, check=True, capture_output=True, text=True,
+        ).stdout
+        results.append(json.loads(output.strip().splitlines()[-1]))
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""Cold start: time to import the app, and time from launching uvicorn to the first answered requests.
+
+Every sample is a fresh interpreter, so nothing is warm but the OS file cache.
+Reports the median over --runs of:
+  import_ms         `import app.main` alone
+  ready_ms          uvicorn launched -> first 200 from GET /
+  first_auth_ms     the first authenticated request after that (loads the JWT library)
+  first_signin_ms   the first signin (loads passlib, starts the bcrypt pool)
+plus the slowest modules from `python -X importtime`.
+
+    python -m benchmarks.bench_startup --runs 5
+"""
+import argparse
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+import time
+
+from benchmarks.common import setup_env, seed, auth_header
+
+IMPORT_SNIPPET = "import time; started = time.perf_counter(); import app.main; print(time.perf_counter() - started)"
+
+
+def import_ms():
+    output = subprocess.run([sys.executable, "-c", IMPORT_SNIPPET], env=dict(os.environ), check=True, capture_output=True, text=True).stdout
+    return float(output.strip().splitlines()[-1]) * 1000
+
+
+def slowest_imports(top):
+    # "import time: self | cumulative | name", nested modules are indented
+    stderr = subprocess.run([sys.executable, "-X", "importtime", "-c", "import app.main"], env=dict(os.environ),
+                            check=True, capture_output=True, text=True).stderr
+    rows = []
+    for line in stderr.splitlines():
+        match = re.match(r"import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)", line)
+        if match and len(match.group(3)) <= 3:  # the app's own imports and what they pull in directly
+            rows.append((int(match.group(2)), match.group(4)))
+    return [{"module": name, "cumulative_ms": round(us / 1000, 1)} for us, name in sorted(rows, reverse=True)[:top]]
+
+
+def serve_once(port, token):
+    import httpx
+
+    base_url = f"http://127.0.0.1:{port}"
+    started = time.perf_counter()
+    server = subprocess.Popen([sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--log-level", "warning"],
+                              env=dict(os.environ))
+    try:
+        while True:
+            try:
+                if httpx.get(base_url + "/").status_code == 200:
+                    break
+            except httpx.TransportError:
+                if server.poll() is not None:
+                    raise RuntimeError("uvicorn exited during startup")
+                time.sleep(0.005)
+        ready = time.perf_counter() - started
+
+        started = time.perf_counter()
+        httpx.get(base_url + "/cart/", headers=auth_header(token)).raise_for_status()
+        first_auth = time.perf_counter() - started
+
+        started = time.perf_counter()
+        httpx.post(base_url + "/auth/signin", data={"username": "user0@bench.com", "password": "password"}).raise_for_status()
+        first_signin = time.perf_counter() - started
+        return ready * 1000, first_auth * 1000, first_signin * 1000
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--port", type=int, default=8767)
+    parser.add_argument("--top", type=int, default=10, help="slowest imports to list")
+    args = parser.parse_args()
+
+    setup_env(ACCESS_LOG_SAMPLE_RATE=0)
+    token = seed(products=10, users=1)["user0@bench.com"]
+
+    imports = [import_ms() for _ in range(args.runs)]
+    served = [serve_once(args.port, token) for _ in range(args.runs)]
+    report = {
+        "runs": args.runs,
+        "import_ms": round(statistics.median(imports), 1),
+        "ready_ms": round(statistics.median(run[0] for run in served), 1),
+        "first_auth_ms": round(statistics.median(run[1] for run in served), 1),
+        "first_signin_ms": round(statistics.median(run[2] for run in served), 1),
+        "slowest_imports": slowest_imports(args.top),
+    }
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+"""Peak memory of a large product listing: buffered response_model body versus stream=true.
+
+The catalog is seeded once, then every (mode, size) pair runs in a fresh
+interpreter and reports how far its peak RSS rose while producing the body.
+"buffered" is what a response_model endpoint does with a list: load every ORM
+row, validate it into ProductOut, dump one JSON document. "streamed" drives
+GET /admin/products?stream=true through the ASGI app and drops each chunk as
+it arrives.
+
+    python -m benchmarks.bench_stream_memory --sizes 10000 100000 1000000
+"""
+import argparse
+import asyncio
+import json
+import os
+import resource
+import subprocess
+import sys
+import time
+
+from benchmarks.common import setup_env, seed, auth_header
+
+
+def peak_rss_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024  # kilobytes on linux
+
+
+def seed_catalog(size):
+    from sqlalchemy import insert
+    from app.core.database import engine
+    from app.products.models import Product
+
+    tokens = seed(products=0, users=0)
+    with engine.begin() as connection:
+        for start in range(0, size, 10000):
+            connection.execute(insert(Product), [
+                {"name": f"Product {i}", "description": f"Description {i}", "price": 1 + i % 500,
+                 "stock": 100, "category": f"category-{i % 20}"}
+                for i in range(start, min(start + 10000, size))
+            ])
+    return tokens["admin@bench.com"]
+
+
+async def buffered(limit):
+    from pydantic import TypeAdapter
+    from sqlalchemy import select
+    from app.core.database import session_scope
+    from app.products.models import Product
+    from app.products.schemas import ProductOut
+
+    adapter = TypeAdapter(list[ProductOut])
+    async with session_scope() as db:
+        products = (await db.scalars(select(Product).order_by(Product.id).limit(limit))).all()
+        body = adapter.dump_json(adapter.validate_python(products, from_attributes=True))
+    return len(body)
+
+
+async def streamed(app, token, limit):
+    size = 0
+    requested = False
+    finished = asyncio.Event()
+
+    async def receive():
+        nonlocal requested
+        if not requested:
+            requested = True
+            return {"type": "http.request", "body": b"", "more_body": False}
+        await finished.wait()  # the response watches for a disconnect while it streams
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        nonlocal size
+        if message["type"] == "http.response.body":
+            size += len(message.get("body", b""))
+            if not message.get("more_body"):
+                finished.set()
+
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET", "scheme": "http",
+        "path": "/admin/products", "raw_path": b"/admin/products", "root_path": "",
+        "query_string": f"stream=true&page_size={limit}".encode(), "client": ("127.0.0.1", 1), "server": ("bench", 80),
+        "headers": [(b"host", b"bench"), *((k.lower().encode(), v.encode()) for k, v in auth_header(token).items())],
+    }
+    await app(scope, receive, send)
+    return size
+
+
+def run_worker(args):
+    setup_env(ACCESS_LOG_SAMPLE_RATE=0)
+    from app.main import app
+
+    async def main():
+        await streamed(app, args.token, 10)  # warm imports, pools and caches before the baseline
+        await buffered(10)
+        before = peak_rss_mb()
+        started = time.perf_counter()
+        size = await (buffered(args.size) if args.mode == "buffered" else streamed(app, args.token, args.size))
+        return {"mode": args.mode, "rows": args.size, "body_mb": round(size / 2**20, 1),
+                "seconds": round(time.perf_counter() - started, 2), "peak_rss_growth_mb": round(peak_rss_mb() - before, 1)}
+
+    print(json.dumps(asyncio.run(main())))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000, 1000000])
+    parser.add_argument("--modes", nargs="+", default=["buffered", "streamed"])
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--mode", help=argparse.SUPPRESS)
+    parser.add_argument("--size", type=int, help=argparse.SUPPRESS)
+    parser.add_argument("--token", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        return run_worker(args)
+
+    setup_env(ACCESS_LOG_SAMPLE_RATE=0)
+    token = seed_catalog(max(args.sizes))
+    results = []
+    for size in args.sizes:
+        for mode in args.modes:
+            output = subprocess.run(
+                [sys.executable, "-m", "benchmarks.bench_stream_memory", "--worker",
+                 "--mode", mode, "--size", str(size), "--token", token],
+                env=dict(os.environ), check=True, capture_output=True, text=True,
+            ).stdout
+            results.append(json.loads(output.strip().splitlines()[-1]))
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,179 @@
+"""Shared helpers for the benchmark scripts.
+
+Every benchmark runs the app in-process against a throwaway SQLite database,
+so `setup_env` has to be called before anything under app/ is imported. It also
+builds the schema with the Alembic migrations, the app no longer creates tables.
+"""
+import asyncio
+import os
+import tempfile
+import time
+
+
+def setup_env(**overrides):
+    workdir = tempfile.mkdtemp(prefix="ecommerce-bench-")
+    defaults = {
+        "DATABASE_URL": f"sqlite:///{os.path.join(workdir, 'bench.db')}",
+        "SECRET_KEY": "benchmark-secret-key",
+        "ALGORITHM": "HS256",
+        "EMAIL_HOST": "localhost",
+        "EMAIL_PORT": "1025",
+        "EMAIL_FROM": "bench@example.com",
+        "EMAIL_OUTBOX_WORKER": "external",  # no SMTP server here, a sender in the measured process would only retry
+    }
+    for key, value in {**defaults, **overrides}.items():
+        os.environ.setdefault(key, str(value))
+    migrate()
+    return workdir
+
+
+def migrate():
+    from alembic import command
+    from alembic.config import Config
+
+    config = Config()  # no ini file, so alembic leaves the logging setup alone
+    config.set_main_option("script_location", os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "alembic"))
+    command.upgrade(config, "head")
+
+
+def seed(products=100, users=10, cart_items=0, orders=0, search_index=False):
+    """Insert a catalog and users straight through the sync engine, returns user tokens.
+
+    `orders` gives every user that many paid orders of three items (with their
+    order summary and sales rollups), `search_index` fills the SQLite FTS table the
+    routes keep in sync. Category facets are always built.
+    """
+    from datetime import datetime, timedelta
+    from sqlalchemy import func, insert, text
+    from app.core.database import SessionLocal, engine
+    from app.auth.models import User, UserRole
+    from app.auth.utils import hash_password, create_access_token
+    from app.products.models import Product, CategoryFacet
+    from app.products.facets import facet_query
+    from app.cart.models import CartItem
+    from app.orders.models import Order, OrderItem, OrderSummary
+    from app.analytics.models import DailySales, ProductSales, CategorySales
+    from app.analytics.utils import SalesTotals
+
+    hashed = hash_password("password")  # one bcrypt round for every seeded user
+    db = SessionLocal()
+    try:
+        db.add_all([
+            Product(name=f"Product {i}", description=f"Description {i}", price=1 + i % 500,
+                    stock=1_000_000, category=f"category-{i % 20}")
+            for i in range(products)
+        ])
+        accounts = [User(name="Admin", email="admin@bench.com", hashed_password=hashed, role=UserRole.admin)]
+        accounts += [User(name=f"User {i}", email=f"user{i}@bench.com", hashed_password=hashed) for i in range(users)]
+        db.add_all(accounts)
+        db.flush()
+        for user in accounts[1:]:
+            db.add_all([CartItem(user_id=user.id, product_id=1 + n % products, quantity=1) for n in range(cart_items)])
+        db.commit()
+        tokens = {user.email: create_access_token(data={"sub": user.email}) for user in accounts}
+        user_ids = [user.id for user in accounts[1:]]
+    finally:
+        db.close()
+
+    with engine.begin() as connection:
+        connection.execute(insert(CategoryFacet).from_select(
+            ["category", "product_count", "in_stock_count", "min_price", "max_price", "updated_at"],
+            facet_query().add_columns(func.current_timestamp()),
+        ))
+        if orders:
+            start = datetime(2020, 1, 1)
+            rows = [(order_id, user_id, start + timedelta(minutes=order_id))
+                    for order_id, user_id in enumerate((user_id for user_id in user_ids for _ in range(orders)), start=1)]
+            connection.execute(insert(Order), [
+                {"id": order_id, "user_id": user_id, "total_amount": 30, "status": "paid", "created_at": created_at}
+                for order_id, user_id, created_at in rows
+            ])
+            items = [
+                {"order_id": order_id, "product_id": 1 + (order_id + n) % products, "quantity": 1, "price_at_purchase": 10,
+                 "product_name": f"Product {(order_id + n) % products}"}
+                for order_id, _, _ in rows for n in range(3)
+            ]
+            connection.execute(insert(OrderItem), items)
+            totals = SalesTotals()
+            for (_, _, created_at), n in zip(rows, range(0, len(items), 3)):
+                totals.add_order(created_at, [
+                    (item["product_id"], item["product_name"], f"category-{(item['product_id'] - 1) % 20}", 1, 10) for item in items[n:n + 3]
+                ])
+            for table, values in ((DailySales, totals.days), (ProductSales, totals.products), (CategorySales, totals.categories)):
+                connection.execute(insert(table), list(values.values()))
+            connection.execute(insert(OrderSummary), [
+                {"user_id": user_id, "order_count": orders, "total_spent": 30 * orders, "last_order_at": rows[-1][2]}
+                for user_id in user_ids
+            ])
+        if search_index and connection.dialect.name == "sqlite":  # postgres keeps its search_vector column itself
+            connection.execute(text(
+                "INSERT INTO products_fts (rowid, name, description, category) "
+                "SELECT id, name, coalesce(description, ''), coalesce(category, '') FROM products"
+            ))
+    return tokens
+
+
+def auth_header(token):
+    return {"Authorization": f"Bearer {token}"}
+
+
+def percentile(samples, pct):
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def summarize(latencies, elapsed):
+    return {
+        "requests": len(latencies),
+        "throughput_rps": round(len(latencies) / elapsed, 1) if elapsed else 0.0,
+        "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 2),
+        "max_ms": round(max(latencies, default=0) * 1000, 2),
+    }
+
+
+async def run_load(send, total, concurrency):
+    """Call `send(i)` `total` times with at most `concurrency` in flight, returns a summary dict."""
+    latencies = []
+    queue = iter(range(total))
+
+    async def worker():
+        for i in queue:
+            started = time.perf_counter()
+            await send(i)
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return summarize(latencies, time.perf_counter() - started)
+
+
+def asgi_client(app):
+    import httpx
+
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench")
+
+
+class StatementCounter:
+    """Counts SQL statements sent through the app's sync and async engines."""
+
+    def __init__(self):
+        from sqlalchemy import event
+        from app.core import database
+
+        self.count = 0
+        engines = [database.engine]
+        if database.async_engine is not None:
+            engines.append(database.async_engine.sync_engine)
+        for engine in engines:
+            event.listen(engine, "before_cursor_execute", self._on_execute)
+
+    def _on_execute(self, *args):
+        self.count += 1
+
+    def reset(self):
+        self.count = 0
@@ -0,0 +1,331 @@
+"""Benchmark suite: every router under load, reported as JSON and checked against a stored baseline.
+
+Seeds a fresh database (SQLite in a temp dir, or --database-url pointing at an
+empty Postgres) with --products, --users and --orders per user, then drives
+each scenario below with --ops requests, --concurrency in flight, and reports
+throughput, p50/p95/p99 latency, non-2xx responses and SQL statements per
+request (read from the app's /metrics histograms).
+
+--mode asgi runs the app in this process through httpx's ASGI transport, which
+leaves out the network and server. --mode uvicorn serves it with
+`uvicorn --workers N` over real sockets; statements per request then come from
+whichever worker answers the /metrics scrape.
+
+Rate limits and load shedding are switched off, the suite is the abuse here.
+
+    python -m benchmarks.suite --ops 500 --concurrency 20
+    python -m benchmarks.suite --mode uvicorn --workers 4 --only products orders
+    python -m benchmarks.suite --tolerance 0.3  # exits 1 on regressions against benchmarks/baseline.json
+    python -m benchmarks.suite --save-baseline benchmarks/baseline.json
+    python -m benchmarks.suite --widen-baseline benchmarks/baseline.json  # repeat, keeps the worst of each number
+    python -m benchmarks.suite --no-baseline  # report only
+
+benchmarks/baseline.json is committed, the worst of three runs with the default
+options on a single core machine (p99 of the cart writes alone moves by half
+between identical runs). Latency and throughput depend on the hardware, so a CI
+box should record its own the same way and pass it with --baseline; a baseline
+file that doesn't exist is an error, not a pass.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import re
+import subprocess
+import sys
+import time
+
+from benchmarks.common import setup_env, seed, auth_header, asgi_client, summarize
+
+CART_PRODUCTS = 25  # products each user cycles through in the cart scenarios
+BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+
+
+class Context:
+    def __init__(self, args, tokens):
+        self.products = args.products
+        self.users = [auth_header(token) for email, token in tokens.items() if email != "admin@bench.com"]
+        self.emails = [email for email in tokens if email != "admin@bench.com"]
+        self.admin = auth_header(tokens["admin@bench.com"])
+        self.orders = args.orders
+
+    def user(self, i):
+        return self.users[i % len(self.users)]
+
+    def cart_product(self, i):
+        # the same i adds, updates and removes the same line
+        return 1 + (i // len(self.users)) % CART_PRODUCTS
+
+    def order_id(self, i):
+        # seed() numbers every user's orders consecutively
+        return (i % len(self.users)) * self.orders + 1 + (i // len(self.users)) % max(1, self.orders)
+
+
+# name -> (router, method, route template, request builder, share of --ops)
+# a builder may send untimed setup requests first, only the request it returns is timed
+async def signin(client, ctx, i):
+    return client.build_request("POST", "/auth/signin", data={"username": ctx.emails[i % len(ctx.emails)], "password": "password"})
+
+async def product_list(client, ctx, i):
+    return client.build_request("GET", "/products", params={"page": 1 + i % 10, "page_size": 20})
+
+async def product_detail(client, ctx, i):
+    return client.build_request("GET", f"/products/{1 + i % ctx.products}")
+
+async def product_search(client, ctx, i):
+    return client.build_request("GET", "/products/search", params={"keyword": f"product {i % 100}"})
+
+async def product_facets(client, ctx, i):
+    return client.build_request("GET", "/products/facets")
+
+async def admin_product_list(client, ctx, i):
+    return client.build_request("GET", "/admin/products", params={"page": 1 + i % 10, "page_size": 20}, headers=ctx.admin)
+
+async def cart_add(client, ctx, i):
+    return client.build_request("POST", "/cart/", json={"product_id": ctx.cart_product(i), "quantity": 1}, headers=ctx.user(i))
+
+async def cart_view(client, ctx, i):
+    return client.build_request("GET", "/cart/", headers=ctx.user(i))
+
+async def cart_update(client, ctx, i):
+    product_id = ctx.cart_product(i)
+    return client.build_request("PUT", f"/cart/{product_id}", json={"product_id": product_id, "quantity": 2}, headers=ctx.user(i))
+
+async def cart_batch(client, ctx, i):
+    items = [{"product_id": 1 + (i + n) % CART_PRODUCTS, "quantity": 1 + n % 3} for n in range(10)]  # a 10 line cart sync
+    return client.build_request("PATCH", "/cart/", json={"items": items}, headers=ctx.user(i))
+
+async def cart_remove(client, ctx, i):
+    return client.build_request("DELETE", f"/cart/{ctx.cart_product(i)}", headers=ctx.user(i))
+
+async def checkout(client, ctx, i):
+    await client.post("/cart/", json={"product_id": 1 + i % ctx.products, "quantity": 1}, headers=ctx.user(i))
+    return client.build_request("POST", "/checkout/", json={"payment_method": "COD"}, headers=ctx.user(i))
+
+async def order_history(client, ctx, i):
+    return client.build_request("GET", "/orders/", headers=ctx.user(i))
+
+async def order_detail(client, ctx, i):
+    return client.build_request("GET", f"/orders/{ctx.order_id(i)}", headers=ctx.user(i))
+
+async def order_summary(client, ctx, i):
+    return client.build_request("GET", "/orders/summary", headers=ctx.user(i))
+
+async def analytics_revenue(client, ctx, i):
+    # seed() dates its orders from 2020-01-01
+    return client.build_request("GET", "/admin/analytics/revenue", params={"date_from": "2020-01-01", "date_to": "2020-01-31"}, headers=ctx.admin)
+
+async def analytics_top_products(client, ctx, i):
+    return client.build_request("GET", "/admin/analytics/top-products", params={"limit": 10}, headers=ctx.admin)
+
+async def analytics_categories(client, ctx, i):
+    return client.build_request("GET", "/admin/analytics/categories", headers=ctx.admin)
+
+SCENARIOS = {
+    "auth.signin": ("auth", "POST", "/auth/signin", signin, 0.1),  # bcrypt bound
+    "products.list": ("products", "GET", "/products", product_list, 1),
+    "products.detail": ("products", "GET", "/products/{id}", product_detail, 1),
+    "products.search": ("products", "GET", "/products/search", product_search, 1),
+    "products.facets": ("products", "GET", "/products/facets", product_facets, 1),
+    "products.admin_list": ("products", "GET", "/admin/products", admin_product_list, 1),
+    "cart.add": ("cart", "POST", "/cart/", cart_add, 1),
+    "cart.view": ("cart", "GET", "/cart/", cart_view, 1),
+    "cart.update": ("cart", "PUT", "/cart/{product_id}", cart_update, 1),
+    "cart.remove": ("cart", "DELETE", "/cart/{product_id}", cart_remove, 1),
+    "cart.batch": ("cart", "PATCH", "/cart/", cart_batch, 1),
+    "checkout.checkout": ("checkout", "POST", "/checkout/", checkout, 0.5),
+    "orders.history": ("orders", "GET", "/orders/", order_history, 1),
+    "orders.detail": ("orders", "GET", "/orders/{order_id}", order_detail, 1),
+    "orders.summary": ("orders", "GET", "/orders/summary", order_summary, 1),
+    "analytics.revenue": ("analytics", "GET", "/admin/analytics/revenue", analytics_revenue, 1),
+    "analytics.top_products": ("analytics", "GET", "/admin/analytics/top-products", analytics_top_products, 1),
+    "analytics.categories": ("analytics", "GET", "/admin/analytics/categories", analytics_categories, 1),
+}
+
+
+async def run_scenario(client, ctx, build, total, concurrency, start=0):
+    latencies = []
+    statuses = {}
+    queue = iter(range(start, start + total))
+
+    async def worker():
+        for i in queue:
+            request = await build(client, ctx, i)
+            started = time.perf_counter()
+            response = await client.send(request)
+            latencies.append(time.perf_counter() - started)
+            statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    result = summarize(latencies, time.perf_counter() - started)
+    result["errors"] = sum(count for status, count in statuses.items() if status >= 300)
+    return result
+
+
+METRIC_LINE = re.compile(r'^db_statements_per_request_(sum|count)\{method="([^"]+)",route="([^"]+)"\} (\S+)$')
+
+def statements_per_request(metrics_text):
+    totals = {}
+    for line in metrics_text.splitlines():
+        match = METRIC_LINE.match(line)
+        if match:
+            kind, method, route, value = match.groups()
+            totals.setdefault((method, route), {})[kind] = float(value)
+    return {key: round(value["sum"] / value["count"], 2) for key, value in totals.items() if value.get("count")}
+
+
+async def run_suite(args, client, ctx):
+    names = [name for name, scenario in SCENARIOS.items()
+             if not args.only or name in args.only or scenario[0] in args.only]
+    results = {}
+    for name in names:
+        router, method, route, build, share = SCENARIOS[name]
+        total = max(1, int(args.ops * share))
+        await run_scenario(client, ctx, build, min(args.warmup, total), 1, start=total)  # indices the measured run doesn't use
+        results[name] = {"router": router, **await run_scenario(client, ctx, build, total, args.concurrency)}
+    statements = statements_per_request((await client.get("/metrics")).text)
+    for name in names:
+        router, method, route, build, share = SCENARIOS[name]
+        results[name]["statements_per_request"] = statements.get((method, route))
+    return results
+
+
+def wait_for_server(url):
+    import httpx
+
+    for _ in range(300):
+        try:
+            httpx.get(url)
+            return
+        except httpx.TransportError:
+            time.sleep(0.1)
+    raise RuntimeError(f"uvicorn did not come up at {url}")
+
+
+def run(args):
+    overrides = {"DATABASE_URL": args.database_url} if args.database_url else {}
+    setup_env(ACCESS_LOG_SAMPLE_RATE=0, METRICS_ENABLED="true", RATE_LIMIT_ENABLED="false",
+              LOAD_SHED_LOOP_LAG_MS=0, LOAD_SHED_POOL_WAIT_MS=0, **overrides)
+    from app.main import app
+
+    tokens = seed(products=args.products, users=args.users, orders=args.orders, search_index=True)
+    ctx = Context(args, tokens)
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+
+    if args.mode == "asgi":
+        async def main():
+            async with asgi_client(app) as client:
+                return await run_suite(args, client, ctx)
+        return asyncio.run(main())
+
+    import httpx
+
+    server = subprocess.Popen([sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(args.port),
+                               "--workers", str(args.workers), "--log-level", "warning"], env=dict(os.environ))
+    try:
+        base_url = f"http://127.0.0.1:{args.port}"
+        wait_for_server(base_url + "/")
+
+        async def main():
+            limits = httpx.Limits(max_connections=args.concurrency * 2)
+            async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=60) as client:
+                return await run_suite(args, client, ctx)
+        return asyncio.run(main())
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def regressions(report, baseline, tolerance, slack_ms):
+    found = []
+    for name, base in baseline["scenarios"].items():
+        current = report["scenarios"].get(name)
+        if current is None:
+            continue
+        # a few ms requests jitter by whole scheduler slices, their p99 has to grow by slack_ms as well
+        if current["p99_ms"] > base["p99_ms"] * (1 + tolerance) + slack_ms:
+            found.append(f"{name}: p99 {base['p99_ms']}ms -> {current['p99_ms']}ms")
+        if current["throughput_rps"] < base["throughput_rps"] * (1 - tolerance):
+            found.append(f"{name}: throughput {base['throughput_rps']} -> {current['throughput_rps']} rps")
+        # averages move a little with cache hits and which lines existed, an N+1 adds a whole statement or more
+        if (current["statements_per_request"] or 0) > (base["statements_per_request"] or 0) + 0.5:
+            found.append(f"{name}: statements per request {base['statements_per_request']} -> {current['statements_per_request']}")
+        if current["errors"] > base["errors"] * (1 + tolerance):  # checkout's conflict retries vary run to run, none stays none
+            found.append(f"{name}: errors {base['errors']} -> {current['errors']}")
+    return found
+
+
+def widen(baseline, report):
+    # merges a run into the baseline keeping the worse of each number
+    for name, current in report["scenarios"].items():
+        base = baseline["scenarios"].setdefault(name, current)
+        for key, value in current.items():
+            if key == "throughput_rps":
+                base[key] = min(base[key], value)
+            elif key.endswith("_ms") or key in ("errors", "statements_per_request"):
+                base[key] = max(base[key] or 0, value or 0)
+    return baseline
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--mode", choices=["asgi", "uvicorn"], default="asgi")
+    parser.add_argument("--workers", type=int, default=2, help="uvicorn workers in --mode uvicorn")
+    parser.add_argument("--port", type=int, default=8766)
+    parser.add_argument("--database-url", help="empty database to seed instead of a temporary SQLite file")
+    parser.add_argument("--products", type=int, default=1000)
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--orders", type=int, default=20, help="orders seeded per user")
+    parser.add_argument("--ops", type=int, default=500, help="requests per scenario (signin and checkout run a share of it)")
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--warmup", type=int, default=20, help="sequential requests per scenario before measuring")
+    parser.add_argument("--only", nargs="+", help="routers or scenario names, e.g. cart orders.detail")
+    parser.add_argument("--baseline", default=BASELINE, help="report to compare against, exits 1 on regressions")
+    parser.add_argument("--no-baseline", action="store_true", help="only report, compare against nothing")
+    parser.add_argument("--tolerance", type=float, default=0.3, help="allowed p99 / throughput / error drift against the baseline")
+    parser.add_argument("--slack-ms", type=float, default=100, help="p99 also has to grow by this much to count as a regression")
+    parser.add_argument("--save-baseline", help="write this run's report here")
+    parser.add_argument("--widen-baseline", help="merge this run into an existing baseline, keeping the worst of each number")
+    args = parser.parse_args()
+    if args.concurrency > args.users:
+        parser.error("--concurrency can't exceed --users, concurrent checkouts of one user would empty each other's cart")
+    if args.widen_baseline and not os.path.exists(args.widen_baseline):
+        parser.error(f"baseline {args.widen_baseline} not found, record the first run with --save-baseline")
+    if args.no_baseline or args.save_baseline or args.widen_baseline:
+        args.baseline = None  # recording a baseline compares against nothing
+    elif not os.path.exists(args.baseline):
+        # checked before the run, a missing baseline must fail the job rather than let it pass unchecked
+        parser.error(f"baseline {args.baseline} not found, record one with --save-baseline or pass --no-baseline")
+
+    config = {key: getattr(args, key) for key in ("mode", "workers", "products", "users", "orders", "ops", "concurrency")}
+    if args.mode == "asgi":
+        config.pop("workers")
+    report = {"config": config, "scenarios": run(args)}
+    print(json.dumps(report, indent=2))
+    if args.save_baseline:
+        with open(args.save_baseline, "w") as file:
+            json.dump(report, file, indent=2)
+    if args.widen_baseline:
+        with open(args.widen_baseline) as file:
+            baseline = widen(json.load(file), report)
+        with open(args.widen_baseline, "w") as file:
+            json.dump(baseline, file, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as file:
+            baseline = json.load(file)
+        if baseline.get("config") != config:
+            print(f"baseline was recorded with {baseline.get('config')}, comparing anyway", file=sys.stderr)
+        unchecked = report["scenarios"].keys() - baseline["scenarios"].keys()
+        if unchecked:
+            print(f"not in the baseline, unchecked: {', '.join(sorted(unchecked))}", file=sys.stderr)
+        found = regressions(report, baseline, args.tolerance, args.slack_ms)
+        if found:
+            print("regressions against the baseline:\n  " + "\n  ".join(found), file=sys.stderr)
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()